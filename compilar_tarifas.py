@@ -0,0 +1,43 @@
+"""
+Script de compilación de tarifas
+
+Genera el archivo binario de tarifas compiladas que cargan los procesos de
+cotización al arrancar (ver services/tarifas_compiladas.py).
+
+Uso:
+    python compilar_tarifas.py [ruta]   (por defecto, tarifas_compiladas.bin)
+"""
+
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+from services.tarifas_compiladas import TarifasCompiladas
+
+
+RUTA_POR_DEFECTO = Path(__file__).parent / "tarifas_compiladas.bin"
+
+
+def main():
+    """Compila las tarifas de la base de datos en un archivo binario"""
+    ruta = sys.argv[1] if len(sys.argv) > 1 else str(RUTA_POR_DEFECTO)
+    db_manager = get_db_manager()
+    
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    with db_manager.get_session() as session:
+        compiladas = TarifasCompiladas.compilar(session)
+        compiladas.guardar(ruta)
+    
+    print(f"✓ {len(compiladas)} tarifas compiladas (versión {compiladas.version})")
+    print(f"✓ Archivo generado: {ruta} ({Path(ruta).stat().st_size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
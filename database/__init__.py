@@ -1,4 +1,15 @@
 """Gestor de base de datos"""
 from .db_manager import DatabaseManager, get_session, get_db_manager
+from .versiones import VERSION_TARIFAS, obtener_version, incrementar_version
+from .totales import recalcular_totales_pedidos, rellenar_totales_pendientes
+from .enteros import rellenar_columnas_enteras
+from .claves_provincia import rellenar_claves_provincia
+from .registro_cambios import crear_triggers_cambios, ultima_secuencia, cambios_desde
 
-__all__ = ['DatabaseManager', 'get_session', 'get_db_manager']
+__all__ = [
+    'DatabaseManager', 'get_session', 'get_db_manager',
+    'VERSION_TARIFAS', 'obtener_version', 'incrementar_version',
+    'recalcular_totales_pedidos', 'rellenar_totales_pendientes',
+    'rellenar_columnas_enteras', 'rellenar_claves_provincia',
+    'crear_triggers_cambios', 'ultima_secuencia', 'cambios_desde'
+]
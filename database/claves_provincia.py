@@ -0,0 +1,104 @@
+"""
+Mantenimiento de las claves normalizadas de provincia
+
+Las columnas provincia_clave (tarifas, pedidos, zonas) se calculan con
+clave_provincia(): los eventos del ORM las rellenan al insertar o
+actualizar, y la función SQL clave_provincia() registrada en cada conexión
+SQLite permite calcularlas en sentencias masivas (importaciones, relleno de
+bases de datos existentes).
+
+Los pedidos creados solo con código postal reciben la provincia de entrega
+al guardarse.
+"""
+
+import sqlite3
+
+from sqlalchemy import event, update, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.models import Tarifa, Pedido, ZonaProvincia
+from models.provincias import clave_provincia, provincia_codigo_postal, normalizar_codigo_postal
+
+
+@event.listens_for(Engine, 'connect')
+def _registrar_funcion_clave(dbapi_connection, connection_record):
+    """Registra clave_provincia() como función SQL en las conexiones SQLite"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('clave_provincia', 1, clave_provincia, deterministic=True)
+
+
+def clave_provincia_sql(columna):
+    """
+    Expresión SQL con la clave normalizada de una columna de provincia
+
+    Args:
+        columna: Columna o expresión con el nombre de la provincia
+
+    Returns:
+        Llamada a la función SQL clave_provincia()
+    """
+    return func.clave_provincia(columna)
+
+
+def rellenar_claves_provincia(session: Session, solo_pendientes: bool = True) -> int:
+    """
+    Calcula las claves de provincia de tarifas, pedidos y zonas con SQL
+
+    Args:
+        session: Sesión de base de datos
+        solo_pendientes: Si es True, solo actualiza las filas sin calcular
+
+    Returns:
+        Número de filas actualizadas
+    """
+    tarifas = Tarifa.__table__
+    pedidos = Pedido.__table__
+    zonas = ZonaProvincia.__table__
+    sentencias = [
+        (tarifas, {'provincia_clave': clave_provincia_sql(tarifas.c.provincia)},
+         tarifas.c.provincia_clave.is_(None)),
+        (pedidos, {'provincia_clave': clave_provincia_sql(pedidos.c.provincia_entrega)},
+         pedidos.c.provincia_clave.is_(None)),
+        (zonas, {'provincia_clave': clave_provincia_sql(zonas.c.provincia),
+                 'zona_clave': clave_provincia_sql(zonas.c.zona)},
+         zonas.c.provincia_clave.is_(None) | zonas.c.zona_clave.is_(None)),
+    ]
+
+    conexion = session.connection()
+    total = 0
+    for tabla, valores, pendiente in sentencias:
+        stmt = update(tabla).values(**valores)
+        if solo_pendientes:
+            stmt = stmt.where(pendiente)
+        total += conexion.execute(stmt).rowcount
+    return total
+
+
+@event.listens_for(Tarifa, 'before_insert')
+@event.listens_for(Tarifa, 'before_update')
+def _tarifa_clave(mapper, connection, target):
+    """Calcula la clave de provincia (o zona) de la tarifa"""
+    target.provincia_clave = clave_provincia(target.provincia)
+
+
+@event.listens_for(Pedido, 'before_insert')
+@event.listens_for(Pedido, 'before_update')
+def _pedido_clave(mapper, connection, target):
+    """Calcula la clave de la provincia de entrega (o la obtiene del código postal)"""
+    if target.codigo_postal is not None:
+        target.codigo_postal = normalizar_codigo_postal(target.codigo_postal) or target.codigo_postal
+    if not target.provincia_entrega and target.codigo_postal:
+        provincia = provincia_codigo_postal(target.codigo_postal)
+        if provincia is None:
+            raise ValueError(f"Código postal no válido: {target.codigo_postal}")
+        target.provincia_entrega = provincia
+    target.provincia_clave = clave_provincia(target.provincia_entrega)
+
+
+@event.listens_for(ZonaProvincia, 'before_insert')
+@event.listens_for(ZonaProvincia, 'before_update')
+def _zona_clave(mapper, connection, target):
+    """Calcula las claves de provincia y zona de la asignación"""
+    target.provincia_clave = clave_provincia(target.provincia)
+    target.zona_clave = clave_provincia(target.zona)
@@ -9,6 +9,11 @@ from pathlib import Path
 import os
 
 from models.models import Base
+from database.migraciones import aplicar_migraciones, eliminar_indices_obsoletos
+from database.totales import rellenar_totales_pendientes
+from database.enteros import rellenar_columnas_enteras
+from database.claves_provincia import rellenar_claves_provincia
+from database.registro_cambios import crear_triggers_cambios
 
 
 class DatabaseManager:
@@ -33,6 +38,7 @@ class DatabaseManager:
     def create_tables(self):
         """Crea todas las tablas en la base de datos"""
         Base.metadata.create_all(bind=self.engine)
+        crear_triggers_cambios(self.engine)
         print(f"✓ Base de datos creada: {self.db_path}")
     
     def drop_tables(self):
@@ -46,6 +52,35 @@ class DatabaseManager:
         self.create_tables()
         print(f"✓ Base de datos reiniciada")
     
+    def migrar(self):
+        """
+        Actualiza una base de datos existente al esquema actual
+        
+        Crea las tablas nuevas, añade las columnas e índices que falten,
+        elimina los índices que ya no se usan, calcula las columnas del
+        esquema entero y las claves de provincia, rellena los totales
+        desnormalizados de los pedidos que no los tengan y recrea los
+        triggers del registro de cambios (después de los rellenos, que no
+        son cambios de datos).
+        """
+        Base.metadata.create_all(bind=self.engine)
+        columnas = aplicar_migraciones(self.engine)
+        for columna in columnas:
+            print(f"✓ Añadido: {columna}")
+        for indice in eliminar_indices_obsoletos(self.engine):
+            print(f"✓ Eliminado: {indice}")
+        
+        with self.get_session() as session:
+            filas = rellenar_columnas_enteras(session)
+            claves = rellenar_claves_provincia(session)
+            pedidos = rellenar_totales_pendientes(session)
+        print(f"✓ Columnas enteras calculadas para {filas} tarifas/productos")
+        print(f"✓ Claves de provincia calculadas para {claves} tarifas/pedidos/zonas")
+        print(f"✓ Totales calculados para {pedidos} pedidos")
+        triggers = crear_triggers_cambios(self.engine)
+        print(f"✓ Registro de cambios activo ({triggers} triggers)")
+        print(f"✓ Base de datos migrada: {self.db_path}")
+    
     @contextmanager
     def get_session(self) -> Session:
         """
@@ -0,0 +1,105 @@
+"""
+Mantenimiento de las columnas del esquema entero
+
+Las columnas enteras (céntimos, gramos, cm³) se calculan a partir de las
+columnas decimales: los eventos del ORM las rellenan al insertar o
+actualizar tarifas y productos, y rellenar_columnas_enteras() las calcula
+con SQL para bases de datos existentes o cargas masivas.
+"""
+
+from sqlalchemy import event, select, update, case, cast, func, Integer
+from sqlalchemy.orm import Session
+
+from models.models import Tarifa, Producto, ServicioTransportista
+from models.unidades import (
+    a_entero, FACTORES_METODO, FACTOR_PRECIO, FACTOR_PESO, FACTOR_VOLUMEN
+)
+
+
+def _redondear_entero(expresion):
+    """Expresión SQL que redondea al entero más cercano"""
+    return cast(func.round(expresion), Integer)
+
+
+def factor_metodo_sql(servicio_id):
+    """
+    Expresión SQL con el factor entero del método de cálculo de un servicio
+
+    Args:
+        servicio_id: Columna o expresión con el ID del servicio
+
+    Returns:
+        Expresión CASE con el factor de conversión
+    """
+    metodo = select(ServicioTransportista.metodo_calculo).where(
+        ServicioTransportista.id == servicio_id
+    ).scalar_subquery()
+    # SQLAlchemy guarda los enums por nombre ('PESO', 'VOLUMEN', 'PALETS')
+    return case({m.name: factor for m, factor in FACTORES_METODO.items()}, value=metodo)
+
+
+def rellenar_columnas_enteras(session: Session, solo_pendientes: bool = True) -> int:
+    """
+    Calcula las columnas enteras de tarifas y productos con SQL
+
+    Args:
+        session: Sesión de base de datos
+        solo_pendientes: Si es True, solo actualiza las filas sin calcular
+
+    Returns:
+        Número de filas actualizadas (tarifas + productos)
+    """
+    tarifas = Tarifa.__table__
+    factor = factor_metodo_sql(tarifas.c.servicio_id)
+    stmt_tarifas = update(tarifas).values(
+        rango_min_ent=_redondear_entero(tarifas.c.rango_min * factor),
+        rango_max_ent=case(
+            (tarifas.c.rango_max.is_(None), None),
+            else_=_redondear_entero(tarifas.c.rango_max * factor)
+        ),
+        precio_cent=_redondear_entero(tarifas.c.precio_fijo * FACTOR_PRECIO)
+    )
+
+    productos = Producto.__table__
+    stmt_productos = update(productos).values(
+        peso_g=_redondear_entero(productos.c.peso_kg * FACTOR_PESO),
+        volumen_cm3=_redondear_entero(productos.c.volumen_m3 * FACTOR_VOLUMEN)
+    )
+
+    if solo_pendientes:
+        stmt_tarifas = stmt_tarifas.where(
+            (tarifas.c.rango_min_ent.is_(None)) | (tarifas.c.precio_cent.is_(None))
+        )
+        stmt_productos = stmt_productos.where(
+            (productos.c.peso_g.is_(None)) | (productos.c.volumen_cm3.is_(None))
+        )
+
+    conexion = session.connection()
+    return conexion.execute(stmt_tarifas).rowcount + conexion.execute(stmt_productos).rowcount
+
+
+@event.listens_for(Tarifa, 'before_insert')
+@event.listens_for(Tarifa, 'before_update')
+def _tarifa_a_enteros(mapper, connection, target):
+    """Calcula rangos y precio enteros de la tarifa"""
+    servicio = target.servicio
+    if servicio is not None:
+        metodo = servicio.metodo_calculo
+    else:
+        metodo = connection.execute(
+            select(ServicioTransportista.metodo_calculo).where(
+                ServicioTransportista.id == target.servicio_id
+            )
+        ).scalar()
+    factor = FACTORES_METODO[metodo]
+    target.rango_min_ent = a_entero(target.rango_min, factor)
+    target.rango_max_ent = a_entero(target.rango_max, factor)
+    target.precio_cent = a_entero(target.precio_fijo, FACTOR_PRECIO)
+
+
+@event.listens_for(Producto, 'before_insert')
+@event.listens_for(Producto, 'before_update')
+def _producto_a_enteros(mapper, connection, target):
+    """Calcula peso en gramos y volumen en cm³ del producto"""
+    target.peso_g = a_entero(target.peso_kg, FACTOR_PESO)
+    target.volumen_cm3 = a_entero(target.volumen_m3, FACTOR_VOLUMEN)
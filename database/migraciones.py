@@ -0,0 +1,85 @@
+"""
+Migraciones de esquema para bases de datos existentes
+
+create_all() crea las tablas nuevas pero no añade columnas a tablas ya
+existentes. Este módulo añade con ALTER TABLE las columnas que falten,
+crea los índices nuevos y elimina los que ya no se usan.
+"""
+
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from models.models import Base
+
+
+# Índices de versiones anteriores que ya no se usan: {tabla: [índices]}
+INDICES_OBSOLETOS = {
+    # Sustituido por ix_tarifas_busqueda_clave (las búsquedas filtran por provincia_clave)
+    'tarifas': ['ix_tarifas_busqueda_ent'],
+}
+
+
+def aplicar_migraciones(engine: Engine) -> List[str]:
+    """
+    Añade a las tablas existentes las columnas e índices de los modelos que falten
+
+    Args:
+        engine: Engine de la base de datos
+
+    Returns:
+        Lista de columnas e índices añadidos ("tabla.nombre")
+    """
+    inspector = inspect(engine)
+    tablas_existentes = set(inspector.get_table_names())
+    aplicadas = []
+
+    with engine.begin() as conexion:
+        for tabla in Base.metadata.sorted_tables:
+            if tabla.name not in tablas_existentes:
+                continue
+            columnas_existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in columnas_existentes:
+                    continue
+                definicion = CreateColumn(columna).compile(dialect=engine.dialect)
+                conexion.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN {definicion}'))
+                aplicadas.append(f'{tabla.name}.{columna.name}')
+
+            # Índices definidos en el modelo que aún no existen
+            indices_existentes = {i['name'] for i in inspector.get_indexes(tabla.name)}
+            for indice in tabla.indexes:
+                if indice.name not in indices_existentes:
+                    indice.create(conexion)
+                    aplicadas.append(f'{tabla.name}.{indice.name}')
+
+    return aplicadas
+
+
+def eliminar_indices_obsoletos(engine: Engine) -> List[str]:
+    """
+    Elimina los índices de INDICES_OBSOLETOS que existan
+
+    Args:
+        engine: Engine de la base de datos
+
+    Returns:
+        Lista de índices eliminados ("tabla.nombre")
+    """
+    inspector = inspect(engine)
+    tablas_existentes = set(inspector.get_table_names())
+    eliminados = []
+
+    with engine.begin() as conexion:
+        for tabla, indices in INDICES_OBSOLETOS.items():
+            if tabla not in tablas_existentes:
+                continue
+            indices_existentes = {i['name'] for i in inspector.get_indexes(tabla)}
+            for nombre in indices:
+                if nombre in indices_existentes:
+                    conexion.execute(text(f'DROP INDEX {nombre}'))
+                    eliminados.append(f'{tabla}.{nombre}')
+
+    return eliminados
@@ -0,0 +1,136 @@
+"""
+Registro de cambios (CDC) de transportistas, servicios, tarifas y zonas
+
+Cada inserción, modificación o eliminación en estas tablas añade una fila a
+registro_cambios mediante triggers de SQLite, de modo que quedan registradas
+tanto las escrituras del ORM como las sentencias masivas (importación de
+tarifas, agrupación en zonas). Las modificaciones que no cambian ningún
+valor no se registran.
+
+Las cachés, las cotizaciones materializadas y las exportaciones pueden
+leer los cambios posteriores a la última secuencia procesada en lugar de
+comparar tablas completas:
+
+    secuencia = ultima_secuencia(session)
+    ...
+    for cambio in cambios_desde(session, secuencia):
+        ...
+"""
+
+from typing import List, Optional, Iterable, Dict, Any
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.models import Transportista, ServicioTransportista, Tarifa, ZonaProvincia, RegistroCambio
+
+
+# Tablas con registro de cambios
+TABLAS_REGISTRADAS = tuple(
+    modelo.__table__ for modelo in (Transportista, ServicioTransportista, Tarifa, ZonaProvincia)
+)
+
+_OPERACIONES = ('insert', 'update', 'delete')
+
+
+@dataclass
+class Cambio:
+    """Cambio leído del registro"""
+    secuencia: int
+    tabla: str
+    operacion: str
+    fila_id: int
+    datos: Dict[str, Any]  # Valores de la fila nueva (o de la eliminada)
+    momento: datetime
+
+
+def _sql_trigger(tabla, operacion: str) -> str:
+    """Genera la sentencia CREATE TRIGGER de una tabla y operación"""
+    fila = 'OLD' if operacion == 'delete' else 'NEW'
+    columnas = [columna.name for columna in tabla.columns]
+    datos = ', '.join(f"'{columna}', {fila}.{columna}" for columna in columnas)
+    condicion = ''
+    if operacion == 'update':
+        # Solo si cambia algún valor (IS NOT compara también los NULL)
+        condicion = 'WHEN ' + ' OR '.join(f'NEW.{c} IS NOT OLD.{c}' for c in columnas)
+    return (
+        f"CREATE TRIGGER trg_cambios_{tabla.name}_{operacion} "
+        f"AFTER {operacion.upper()} ON {tabla.name} {condicion} "
+        f"BEGIN "
+        f"INSERT INTO {RegistroCambio.__tablename__} (tabla, operacion, fila_id, datos, momento) "
+        f"VALUES ('{tabla.name}', '{operacion}', {fila}.id, json_object({datos}), "
+        f"strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')); "
+        f"END"
+    )
+
+
+def crear_triggers_cambios(engine: Engine) -> int:
+    """
+    Crea (o recrea) los triggers del registro de cambios
+
+    Se recrean siempre para que incluyan las columnas añadidas por las
+    migraciones.
+
+    Args:
+        engine: Engine de la base de datos
+
+    Returns:
+        Número de triggers creados
+    """
+    with engine.begin() as conexion:
+        for tabla in TABLAS_REGISTRADAS:
+            for operacion in _OPERACIONES:
+                conexion.execute(text(f"DROP TRIGGER IF EXISTS trg_cambios_{tabla.name}_{operacion}"))
+                conexion.execute(text(_sql_trigger(tabla, operacion)))
+    return len(TABLAS_REGISTRADAS) * len(_OPERACIONES)
+
+
+def ultima_secuencia(session: Session) -> int:
+    """
+    Obtiene la secuencia del último cambio registrado
+
+    Args:
+        session: Sesión de base de datos
+
+    Returns:
+        Última secuencia (0 si no hay cambios)
+    """
+    return session.execute(select(func.max(RegistroCambio.secuencia))).scalar() or 0
+
+
+def cambios_desde(
+    session: Session,
+    secuencia: int = 0,
+    tablas: Optional[Iterable[str]] = None,
+    limite: Optional[int] = None,
+    desde: Optional[datetime] = None
+) -> List[Cambio]:
+    """
+    Lee los cambios posteriores a una secuencia, en orden
+
+    Args:
+        session: Sesión de base de datos
+        secuencia: Última secuencia ya procesada (0 = todos los cambios)
+        tablas: Nombres de las tablas a incluir (None = todas)
+        limite: Número máximo de cambios (para leer por bloques)
+        desde: Si se indica, solo los cambios a partir de ese momento
+
+    Returns:
+        Lista de cambios ordenados por secuencia
+    """
+    stmt = select(
+        RegistroCambio.secuencia, RegistroCambio.tabla, RegistroCambio.operacion,
+        RegistroCambio.fila_id, RegistroCambio.datos, RegistroCambio.momento
+    ).where(
+        RegistroCambio.secuencia > secuencia
+    ).order_by(RegistroCambio.secuencia)
+    if tablas is not None:
+        stmt = stmt.where(RegistroCambio.tabla.in_(list(tablas)))
+    if desde is not None:
+        stmt = stmt.where(RegistroCambio.momento >= desde)
+    if limite is not None:
+        stmt = stmt.limit(limite)
+    return [Cambio(*fila) for fila in session.execute(stmt)]
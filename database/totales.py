@@ -0,0 +1,251 @@
+"""
+Totales desnormalizados de los pedidos
+
+Mantiene las columnas peso_total, volumen_total y palets_total de la tabla
+pedidos (y sus equivalentes enteros peso_total_g y volumen_total_cm3). Los
+eventos del ORM sobre PedidoProducto registran los pedidos modificados (y
+los cambios de peso o volumen de un Producto, los pedidos que lo
+contienen) y, al terminar el flush, se recalculan sus totales con una
+única sentencia UPDATE.
+
+Al cambiar las líneas, la provincia, el código postal o el tipo de entrega
+de un pedido, sus cotizaciones materializadas quedan obsoletas (se elimina
+su fila de estado_cotizaciones y se recotizan en la siguiente consulta).
+
+También mantiene hash_contenido: un hash canónico de las líneas del pedido
+(producto y cantidad total, en orden de producto) que es igual para todos
+los pedidos con el mismo contenido, de modo que los procesos por lotes
+pueden calcular una sola vez sus cotizaciones.
+"""
+
+from typing import Iterable, Optional, Set, Tuple, List, Dict
+from hashlib import blake2b
+from itertools import groupby
+
+from sqlalchemy import event, func, select, update, delete, inspect, bindparam
+from sqlalchemy.orm import Session, object_session
+
+from models.models import Pedido, PedidoProducto, Producto, EstadoCotizacion
+
+
+# Clave en session.info con los pedidos pendientes de recalcular
+_CLAVE_PENDIENTES = 'pedidos_totales_pendientes'
+
+# Clave en session.info con los pedidos cuyas cotizaciones materializadas quedan obsoletas
+_CLAVE_OBSOLETOS = 'pedidos_cotizaciones_obsoletas'
+
+# Columnas del producto que cambian los totales de los pedidos que lo contienen
+_COLUMNAS_MEDIDAS = ('peso_kg', 'volumen_m3')
+
+# Columnas del pedido que cambian sus cotizaciones (además de las líneas)
+_COLUMNAS_COTIZACION = ('provincia_entrega', 'codigo_postal', 'tipo_entrega')
+
+# Número de pedidos por sentencia UPDATE (límite de parámetros de SQLite)
+TAMANO_BLOQUE = 500
+
+
+def _subconsulta_suma(columna):
+    """Suma correlacionada de columna * cantidad para las líneas del pedido"""
+    return select(
+        func.coalesce(func.sum(columna * PedidoProducto.cantidad), 0)
+    ).select_from(PedidoProducto).join(
+        Producto, Producto.id == PedidoProducto.producto_id
+    ).where(
+        PedidoProducto.pedido_id == Pedido.id
+    ).scalar_subquery()
+
+
+def hash_contenido(lineas: Iterable[Tuple[int, int]]) -> str:
+    """
+    Calcula el hash canónico del contenido de un pedido
+
+    Las líneas del mismo producto se suman y el orden de las líneas no
+    influye: dos pedidos con el mismo multiconjunto de (producto, cantidad)
+    tienen el mismo hash.
+
+    Args:
+        lineas: Pares (producto_id, cantidad)
+
+    Returns:
+        Hash hexadecimal de 32 caracteres
+    """
+    cantidades: Dict[int, int] = {}
+    for producto_id, cantidad in lineas:
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    texto = ';'.join(f'{producto_id}:{cantidad}' for producto_id, cantidad in sorted(cantidades.items()) if cantidad)
+    return blake2b(texto.encode(), digest_size=16).hexdigest()
+
+
+def _actualizar_hashes(conexion, pedido_ids: List[int]):
+    """Recalcula hash_contenido de los pedidos indicados"""
+    lineas = conexion.execute(
+        select(
+            PedidoProducto.pedido_id, PedidoProducto.producto_id, func.sum(PedidoProducto.cantidad)
+        ).where(
+            PedidoProducto.pedido_id.in_(pedido_ids)
+        ).group_by(
+            PedidoProducto.pedido_id, PedidoProducto.producto_id
+        ).order_by(PedidoProducto.pedido_id)
+    )
+    hashes = {
+        pedido_id: hash_contenido((producto_id, cantidad) for _, producto_id, cantidad in filas)
+        for pedido_id, filas in groupby(lineas, key=lambda fila: fila[0])
+    }
+    vacio = hash_contenido(())  # Pedidos sin líneas
+    pedidos = Pedido.__table__
+    conexion.execute(
+        update(pedidos).where(pedidos.c.id == bindparam('b_id')).values(hash_contenido=bindparam('b_hash')),
+        [{'b_id': pedido_id, 'b_hash': hashes.get(pedido_id, vacio)} for pedido_id in pedido_ids]
+    )
+
+
+def recalcular_totales_pedidos(
+    session: Session,
+    pedido_ids: Optional[Iterable[int]] = None,
+    hashes: bool = True
+) -> int:
+    """
+    Recalcula los totales desnormalizados y el hash de contenido a partir de
+    las líneas del pedido
+
+    Args:
+        session: Sesión de base de datos
+        pedido_ids: Pedidos a recalcular (None = todos)
+        hashes: Si es False, no recalcula hash_contenido (p. ej. si ya se ha
+            guardado al insertar los pedidos)
+
+    Returns:
+        Número de pedidos actualizados
+    """
+    volumen = _subconsulta_suma(Producto.volumen_m3)
+    stmt = update(Pedido.__table__).values(
+        peso_total=_subconsulta_suma(Producto.peso_kg),
+        volumen_total=volumen,
+        palets_total=volumen / 2,
+        peso_total_g=_subconsulta_suma(Producto.peso_g),
+        volumen_total_cm3=_subconsulta_suma(Producto.volumen_cm3)
+    )
+
+    conexion = session.connection()
+    if pedido_ids is None:
+        actualizados = conexion.execute(stmt).rowcount
+        pedido_ids = conexion.execute(select(Pedido.id)).scalars().all() if hashes else []
+        for inicio in range(0, len(pedido_ids), TAMANO_BLOQUE):
+            _actualizar_hashes(conexion, pedido_ids[inicio:inicio + TAMANO_BLOQUE])
+        return actualizados
+
+    pedido_ids = list(pedido_ids)
+    actualizados = 0
+    for inicio in range(0, len(pedido_ids), TAMANO_BLOQUE):
+        bloque = pedido_ids[inicio:inicio + TAMANO_BLOQUE]
+        actualizados += conexion.execute(stmt.where(Pedido.__table__.c.id.in_(bloque))).rowcount
+        if hashes:
+            _actualizar_hashes(conexion, bloque)
+    return actualizados
+
+
+def rellenar_totales_pendientes(session: Session) -> int:
+    """
+    Calcula los totales (y el hash de contenido) de los pedidos que aún no
+    los tienen (bases de datos existentes)
+
+    Args:
+        session: Sesión de base de datos
+
+    Returns:
+        Número de pedidos actualizados
+    """
+    pendientes = session.execute(
+        select(Pedido.id).where(
+            (Pedido.peso_total.is_(None)) | (Pedido.peso_total_g.is_(None)) |
+            (Pedido.hash_contenido.is_(None))
+        )
+    ).scalars().all()
+    return recalcular_totales_pedidos(session, pendientes)
+
+
+def _marcar_pedido(target: PedidoProducto):
+    """Registra el pedido de una línea para recalcular sus totales tras el flush"""
+    session = object_session(target)
+    if session is None:
+        return
+    pendientes: Set[int] = session.info.setdefault(_CLAVE_PENDIENTES, set())
+    pendientes.add(target.pedido_id)
+    # Si la línea cambia de pedido, también hay que recalcular el anterior
+    historial = inspect(target).attrs.pedido_id.history
+    pendientes.update(pid for pid in historial.deleted if pid is not None)
+
+
+@event.listens_for(PedidoProducto, 'after_insert')
+@event.listens_for(PedidoProducto, 'after_update')
+@event.listens_for(PedidoProducto, 'after_delete')
+def _linea_modificada(mapper, connection, target):
+    _marcar_pedido(target)
+
+
+@event.listens_for(Producto, 'after_update')
+def _producto_modificado(mapper, connection, target):
+    estado = inspect(target)
+    if not any(estado.attrs[columna].history.has_changes() for columna in _COLUMNAS_MEDIDAS):
+        return
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_CLAVE_PENDIENTES, set()).update(connection.execute(
+        select(PedidoProducto.pedido_id).where(PedidoProducto.producto_id == target.id).distinct()
+    ).scalars())
+
+
+@event.listens_for(Pedido, 'after_insert')
+def _pedido_creado(mapper, connection, target):
+    # Los pedidos nuevos parten con totales a cero aunque no tengan líneas
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CLAVE_PENDIENTES, set()).add(target.id)
+
+
+@event.listens_for(Pedido, 'after_update')
+def _pedido_modificado(mapper, connection, target):
+    # Cambiar el destino o el tipo de entrega no afecta a los totales pero sí a las cotizaciones
+    estado = inspect(target)
+    if any(estado.attrs[columna].history.has_changes() for columna in _COLUMNAS_COTIZACION):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(_CLAVE_OBSOLETOS, set()).add(target.id)
+
+
+def invalidar_cotizaciones(session: Session, pedido_ids: Iterable[int]):
+    """
+    Marca como obsoletas las cotizaciones materializadas de los pedidos
+    (se recotizan en la siguiente consulta)
+
+    Args:
+        session: Sesión de base de datos
+        pedido_ids: Pedidos modificados
+    """
+    pedido_ids = list(pedido_ids)
+    tabla = EstadoCotizacion.__table__
+    conexion = session.connection()
+    for inicio in range(0, len(pedido_ids), TAMANO_BLOQUE):
+        conexion.execute(delete(tabla).where(tabla.c.pedido_id.in_(pedido_ids[inicio:inicio + TAMANO_BLOQUE])))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _actualizar_totales(session, flush_context):
+    """Recalcula los totales de los pedidos modificados en el flush"""
+    pendientes = session.info.pop(_CLAVE_PENDIENTES, None) or set()
+    obsoletos = session.info.pop(_CLAVE_OBSOLETOS, None) or set()
+    if obsoletos or pendientes:
+        invalidar_cotizaciones(session, pendientes | obsoletos)
+    if not pendientes:
+        return
+    recalcular_totales_pedidos(session, pendientes)
+
+    # Expirar los totales en memoria para que se lean de nuevo de la base de datos
+    for pedido_id in pendientes:
+        pedido = session.identity_map.get(session.identity_key(Pedido, pedido_id))
+        if pedido is not None:
+            session.expire(pedido, [
+                'peso_total', 'volumen_total', 'palets_total',
+                'peso_total_g', 'volumen_total_cm3', 'hash_contenido'
+            ])
@@ -0,0 +1,73 @@
+"""
+Control de versiones de datos
+
+Mantiene contadores de versión en la tabla control_versiones. La versión de
+tarifas se incrementa automáticamente al hacer flush de cualquier cambio en
+transportistas, servicios, tarifas o zonas realizado a través del ORM.
+"""
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models.models import ControlVersion, Transportista, ServicioTransportista, Tarifa, ZonaProvincia
+
+
+VERSION_TARIFAS = 'tarifas'
+
+# Entidades cuyo cambio invalida las cotizaciones calculadas
+_ENTIDADES_TARIFAS = (Transportista, ServicioTransportista, Tarifa, ZonaProvincia)
+
+
+def obtener_version(session: Session, nombre: str = VERSION_TARIFAS) -> int:
+    """
+    Obtiene la versión actual de un conjunto de datos
+
+    Args:
+        session: Sesión de base de datos
+        nombre: Nombre del contador (por defecto, tarifas)
+
+    Returns:
+        Versión actual (0 si nunca se ha incrementado)
+    """
+    version = session.execute(
+        select(ControlVersion.version).where(ControlVersion.nombre == nombre)
+    ).scalar()
+    return version or 0
+
+
+def incrementar_version(session: Session, nombre: str = VERSION_TARIFAS) -> int:
+    """
+    Incrementa la versión de un conjunto de datos
+
+    Se ejecuta directamente sobre la conexión de la sesión, por lo que puede
+    usarse también durante un flush.
+
+    Args:
+        session: Sesión de base de datos
+        nombre: Nombre del contador (por defecto, tarifas)
+
+    Returns:
+        Nueva versión
+    """
+    conexion = session.connection()
+    stmt = insert(ControlVersion).values(nombre=nombre, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ControlVersion.nombre],
+        set_={'version': ControlVersion.version + 1}
+    )
+    conexion.execute(stmt)
+    return conexion.execute(
+        select(ControlVersion.version).where(ControlVersion.nombre == nombre)
+    ).scalar()
+
+
+@event.listens_for(Session, 'before_flush')
+def _incrementar_version_tarifas(session, flush_context, instances):
+    """Incrementa la versión de tarifas si el flush modifica alguna de ellas"""
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, _ENTIDADES_TARIFAS):
+            if objeto in session.dirty and not session.is_modified(objeto):
+                continue
+            incrementar_version(session, VERSION_TARIFAS)
+            return
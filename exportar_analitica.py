@@ -0,0 +1,50 @@
+"""
+Script de exportación analítica
+
+Genera un dataset Parquet con los pedidos, sus totales y sus cotizaciones
+ordenadas, particionado por mes y provincia (ver
+services/exportacion_analitica.py).
+
+Uso:
+    python exportar_analitica.py [directorio] [cotizaciones por pedido]
+    (por defecto, analitica/ y todas las cotizaciones)
+"""
+
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+from services.exportacion_analitica import exportar_dataset, PARQUET_DISPONIBLE
+
+
+RUTA_POR_DEFECTO = Path(__file__).parent / "analitica"
+
+
+def main():
+    """Exporta pedidos y cotizaciones a un dataset Parquet particionado"""
+    if not PARQUET_DISPONIBLE:
+        print("\n❌ ERROR: La librería pyarrow no está instalada.")
+        print("Instala con: pip install pyarrow")
+        sys.exit(1)
+    
+    directorio = sys.argv[1] if len(sys.argv) > 1 else str(RUTA_POR_DEFECTO)
+    limite = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    db_manager = get_db_manager()
+    
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    with db_manager.get_session() as session:
+        filas = exportar_dataset(session, directorio, limite)
+    
+    print(f"✓ {filas:,} filas exportadas (particiones mes/provincia)")
+    print(f"✓ Dataset generado: {directorio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Script de importación masiva de pedidos
+
+Importa pedidos desde un archivo CSV, JSONL o Excel por bloques (ver
+services/importacion_pedidos.py).
+
+Uso:
+    python importar_pedidos.py archivo [--cotizar]
+    --cotizar: materializa las cotizaciones de cada bloque al insertarlo
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+from services.importacion_pedidos import ImportadorPedidos, leer_pedidos, EXCEL_DISPONIBLE
+
+
+def main():
+    """Importa un archivo de pedidos"""
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not argumentos:
+        print(__doc__)
+        sys.exit(1)
+    ruta = argumentos[0]
+    cotizar = '--cotizar' in sys.argv
+    
+    if not Path(ruta).exists():
+        print(f"\n❌ Error: El archivo '{ruta}' no existe.")
+        sys.exit(1)
+    if Path(ruta).suffix.lower() not in ('.csv', '.jsonl', '.ndjson') and not EXCEL_DISPONIBLE:
+        print("\n❌ ERROR: La librería openpyxl no está instalada.")
+        print("Instala con: pip install openpyxl")
+        sys.exit(1)
+    
+    db_manager = get_db_manager()
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    inicio = time.perf_counter()
+    with db_manager.get_session() as session:
+        try:
+            resumen = ImportadorPedidos(session, cotizar=cotizar).importar(leer_pedidos(ruta))
+        except ValueError as e:
+            print(f"\n❌ Error al importar pedidos: {e}")
+            sys.exit(1)
+    
+    print(f"✓ Pedidos importados: {resumen.pedidos:,} ({resumen.lineas:,} líneas)")
+    if cotizar:
+        print(f"✓ Pedidos cotizados: {resumen.cotizados:,}")
+    if resumen.rechazados:
+        print(f"\n⚠️ Pedidos rechazados: {resumen.rechazados:,}")
+        for error in resumen.errores[:10]:
+            print(f"   • {error}")
+        if resumen.rechazados > 10:
+            print(f"   ... y {resumen.rechazados - 10} más")
+    print(f"✓ Tiempo: {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
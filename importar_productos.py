@@ -0,0 +1,76 @@
+"""
+Script de importación del catálogo de productos
+
+Crea o actualiza los productos de un archivo CSV o Excel por código y
+recalcula los totales de los pedidos afectados (ver
+services/importacion_productos.py).
+
+Uso:
+    python importar_productos.py archivo [--recotizar]
+    --recotizar: recotiza los pedidos afectados (si no, sus cotizaciones
+                 se recalculan la próxima vez que se consulten)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+from services.importacion_productos import ImportadorProductos, leer_productos
+from services.lectura_archivos import EXCEL_DISPONIBLE
+
+
+def main():
+    """Importa un archivo de catálogo de productos"""
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not argumentos:
+        print(__doc__)
+        sys.exit(1)
+    ruta = argumentos[0]
+    recotizar = '--recotizar' in sys.argv
+    
+    if not Path(ruta).exists():
+        print(f"\n❌ Error: El archivo '{ruta}' no existe.")
+        sys.exit(1)
+    if Path(ruta).suffix.lower() != '.csv' and not EXCEL_DISPONIBLE:
+        print("\n❌ ERROR: La librería openpyxl no está instalada.")
+        print("Instala con: pip install openpyxl")
+        sys.exit(1)
+    
+    db_manager = get_db_manager()
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    inicio = time.perf_counter()
+    with db_manager.get_session() as session:
+        try:
+            resumen = ImportadorProductos(session).importar(leer_productos(ruta), recotizar=recotizar)
+        except ValueError as e:
+            print(f"\n❌ Error al importar productos: {e}")
+            sys.exit(1)
+    
+    print(f"✓ Productos nuevos: {resumen.nuevos:,}")
+    print(f"✓ Productos con peso o volumen cambiado: {resumen.actualizados:,}")
+    print(f"✓ Productos renombrados: {resumen.renombrados:,}")
+    print(f"✓ Sin cambios: {resumen.sin_cambios:,}")
+    print(f"📦 Pedidos con totales recalculados: {len(resumen.pedidos_afectados):,}")
+    if recotizar:
+        print(f"📦 Pedidos recotizados: {resumen.pedidos_recotizados:,}")
+    elif resumen.pedidos_afectados:
+        print("   Sus cotizaciones se recalcularán en la próxima consulta")
+    if resumen.errores:
+        print(f"\n⚠️ Se encontraron {len(resumen.errores)} errores:")
+        for error in resumen.errores[:10]:
+            print(f"   • {error}")
+        if len(resumen.errores) > 10:
+            print(f"   ... y {len(resumen.errores) - 10} errores más")
+    print(f"✓ Tiempo: {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,9 +15,20 @@ from datetime import datetime
 # Añadir el directorio raíz al path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from database import get_db_manager
+from database import get_db_manager, obtener_version
 from services import TransportistaSelector
-from models import Pedido, Transportista, ServicioTransportista, Tarifa, TipoEntrega, MetodoCalculo
+from services.cotizaciones_materializadas import CotizacionesMaterializadas
+from services.impacto_tarifas import AnalizadorImpacto
+from services.importacion_tarifas import ImportadorTarifas, COLUMNAS_TARIFAS, COLUMNAS_DELTA, nombre_servicio
+from services.delta_tarifas import cambios_tarifas
+from services.intercambio_tarifas import (
+    filas_tarifas, exportar_csv, exportar_parquet, leer_csv, leer_parquet, PARQUET_DISPONIBLE
+)
+from services.validador_tarifas import ValidadorTarifas
+from services.zonas import AgrupadorZonas
+from sqlalchemy import func
+
+from models import Pedido, PedidoProducto, Transportista, ServicioTransportista, Tarifa, ZonaProvincia, TipoEntrega, MetodoCalculo
 
 try:
     from openpyxl import Workbook, load_workbook
@@ -72,8 +83,8 @@ def mostrar_mejor_transportista(pedido_id: int, session):
         print(f"     ({pp.producto.peso_kg}kg, {pp.producto.volumen_m3}m³ c/u)")
     print()
     
-    # Seleccionar mejor transportista
-    mejor = selector.seleccionar_mejor_transportista(pedido_id)
+    # Mejor transportista (desde las cotizaciones materializadas)
+    mejor = CotizacionesMaterializadas(session).obtener_mejor_cotizacion(pedido_id)
     
     if mejor:
         print("✅ MEJOR OPCIÓN:")
@@ -88,7 +99,8 @@ def mostrar_mejor_transportista(pedido_id: int, session):
 def comparar_transportistas(pedido_id: int, session):
     """Compara todos los transportistas disponibles para un pedido"""
     selector = TransportistaSelector(session)
-    comparacion = selector.comparar_transportistas(pedido_id)
+    cotizaciones = CotizacionesMaterializadas(session).obtener_cotizaciones_pedido(pedido_id)
+    comparacion = selector.comparar_transportistas(pedido_id, cotizaciones)
     
     pedido_info = comparacion['pedido']
     mejor = comparacion['mejor_opcion']
@@ -140,8 +152,37 @@ def comparar_transportistas(pedido_id: int, session):
     print()
 
 
-def exportar_tarifas_excel(session):
-    """Exporta todas las tarifas a un archivo Excel"""
+def comparar_tipos_entrega(pedido_id: int, session):
+    """Muestra la mejor opción del pedido en cada tipo de entrega"""
+    selector = TransportistaSelector(session)
+    pedido = session.get(Pedido, pedido_id)
+    por_tipo = selector.comparar_tipos_entrega(pedido_id)
+    
+    print(f"🚪 OPCIONES POR TIPO DE ENTREGA - Pedido {pedido.numero_pedido} ({pedido.provincia_entrega}):")
+    print()
+    print(f"{'Tipo Entrega':<25} {'Mejor Transportista':<20} {'Precio':>10} {'Opciones':>9}")
+    print("=" * 70)
+    for tipo, cotizaciones in por_tipo.items():
+        marca = " ◀ actual" if tipo == pedido.tipo_entrega else ""
+        nombre_tipo = tipo.value.replace('_', ' ').title()
+        if cotizaciones:
+            mejor = cotizaciones[0]
+            print(f"{nombre_tipo:<25} {mejor.transportista_nombre:<20} {mejor.precio_total:>9.2f}€ {len(cotizaciones):>9}{marca}")
+        else:
+            print(f"{nombre_tipo:<25} {'Sin opciones':<20} {'-':>10} {0:>9}{marca}")
+    imprimir_separador()
+    print()
+
+
+def exportar_tarifas_excel(session, secuencia=None):
+    """
+    Exporta las tarifas a un archivo Excel
+    
+    Args:
+        session: Sesión de base de datos
+        secuencia: Si se indica, exporta solo las tarifas cambiadas desde esa
+            secuencia del registro de cambios, con la columna "Operación"
+    """
     if not EXCEL_DISPONIBLE:
         print("\n❌ ERROR: La librería openpyxl no está instalada.")
         print("Instala con: pip install openpyxl")
@@ -159,10 +200,7 @@ def exportar_tarifas_excel(session):
         header_alignment = Alignment(horizontal="center", vertical="center")
         
         # Encabezados
-        headers = [
-            "ID", "Transportista", "Servicio", "Tipo Entrega", "Método Cálculo",
-            "Provincia", "Rango Min", "Rango Max", "Precio Fijo"
-        ]
+        headers = COLUMNAS_TARIFAS if secuencia is None else COLUMNAS_DELTA
         
         for col, header in enumerate(headers, 1):
             cell = ws.cell(row=1, column=col, value=header)
@@ -170,6 +208,27 @@ def exportar_tarifas_excel(session):
             cell.font = header_font
             cell.alignment = header_alignment
         
+        if secuencia is not None:
+            # Solo los cambios desde la secuencia indicada
+            delta = cambios_tarifas(session, secuencia)
+            for fila in delta.filas:
+                ws.append(fila)
+            for col in range(1, len(headers) + 1):
+                ws.column_dimensions[chr(64 + col)].width = 15
+            
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"tarifas_cambios_{delta.secuencia_inicial}_{delta.secuencia_final}_{timestamp}.xlsx"
+            wb.save(filename)
+            
+            print(f"\n✅ Cambios de tarifas exportados correctamente")
+            print(f"📁 Archivo: {filename}")
+            for operacion, total in delta.contar_por_operacion().items():
+                print(f"📊 {operacion.capitalize()}: {total}")
+            if delta.omitidas:
+                print(f"⚠️ Bajas omitidas (servicio eliminado): {delta.omitidas}")
+            print(f"🔖 Secuencia final: {delta.secuencia_final} (usar en la próxima exportación)")
+            return
+        
         # Obtener todas las tarifas con sus relaciones
         tarifas = session.query(Tarifa).join(
             ServicioTransportista
@@ -188,7 +247,7 @@ def exportar_tarifas_excel(session):
             transportista = servicio.transportista
             
             # Generar nombre descriptivo del servicio
-            servicio_nombre = f"{servicio.tipo_entrega.value.replace('_', ' ').title()} ({servicio.metodo_calculo.value})"
+            servicio_nombre = nombre_servicio(servicio.tipo_entrega, servicio.metodo_calculo)
             
             ws.cell(row=row, column=1, value=tarifa.id)
             ws.cell(row=row, column=2, value=transportista.nombre)
@@ -204,6 +263,35 @@ def exportar_tarifas_excel(session):
         for col in range(1, len(headers) + 1):
             ws.column_dimensions[chr(64 + col)].width = 15
         
+        # Hoja de zonas (referencia: las tarifas de una zona usan su nombre como provincia)
+        zonas = session.query(ZonaProvincia).join(
+            ServicioTransportista
+        ).join(
+            Transportista
+        ).order_by(
+            Transportista.nombre,
+            ServicioTransportista.tipo_entrega,
+            ZonaProvincia.zona,
+            ZonaProvincia.provincia
+        ).all()
+        if zonas:
+            ws_zonas = wb.create_sheet("Zonas")
+            headers_zonas = ["Transportista", "Tipo Entrega", "Método Cálculo", "Zona", "Provincia"]
+            for col, header in enumerate(headers_zonas, 1):
+                cell = ws_zonas.cell(row=1, column=col, value=header)
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.alignment = header_alignment
+            for row, asignacion in enumerate(zonas, 2):
+                servicio = asignacion.servicio
+                ws_zonas.cell(row=row, column=1, value=servicio.transportista.nombre)
+                ws_zonas.cell(row=row, column=2, value=servicio.tipo_entrega.value)
+                ws_zonas.cell(row=row, column=3, value=servicio.metodo_calculo.value)
+                ws_zonas.cell(row=row, column=4, value=asignacion.zona)
+                ws_zonas.cell(row=row, column=5, value=asignacion.provincia)
+            for col in range(1, len(headers_zonas) + 1):
+                ws_zonas.column_dimensions[chr(64 + col)].width = 15
+        
         # Guardar archivo
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"tarifas_export_{timestamp}.xlsx"
@@ -217,148 +305,194 @@ def exportar_tarifas_excel(session):
         print(f"\n❌ Error al exportar tarifas: {e}")
 
 
-def importar_tarifas_excel(session):
-    """Importa tarifas desde un archivo Excel"""
-    if not EXCEL_DISPONIBLE:
-        print("\n❌ ERROR: La librería openpyxl no está instalada.")
-        print("Instala con: pip install openpyxl")
+def exportar_tarifas_archivo(session, formato, secuencia=None):
+    """
+    Exporta las tarifas a un archivo CSV o Parquet
+    
+    Args:
+        session: Sesión de base de datos
+        formato: 'csv' o 'parquet'
+        secuencia: Si se indica, exporta solo las tarifas cambiadas desde esa
+            secuencia del registro de cambios, con la columna "Operación"
+    """
+    if formato == 'parquet' and not PARQUET_DISPONIBLE:
+        print("\n❌ ERROR: La librería pyarrow no está instalada.")
+        print("Instala con: pip install pyarrow")
         return
     
-    filename = input("\nNombre del archivo Excel (ej: tarifas_export_20241216.xlsx): ").strip()
+    exportar = exportar_csv if formato == 'csv' else exportar_parquet
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    try:
+        if secuencia is None:
+            filename = f"tarifas_export_{timestamp}.{formato}"
+            total = exportar(filename, filas_tarifas(session))
+        else:
+            delta = cambios_tarifas(session, secuencia)
+            filename = f"tarifas_cambios_{delta.secuencia_inicial}_{delta.secuencia_final}_{timestamp}.{formato}"
+            total = exportar(filename, delta.filas, COLUMNAS_DELTA)
+        
+        print(f"\n✅ Tarifas exportadas correctamente")
+        print(f"📁 Archivo: {filename}")
+        print(f"📊 Total de tarifas: {total}")
+        if secuencia is not None:
+            print(f"🔖 Secuencia final: {delta.secuencia_final} (usar en la próxima exportación)")
+        
+    except Exception as e:
+        print(f"\n❌ Error al exportar tarifas: {e}")
+
+
+def importar_tarifas_excel(session):
+    """Importa tarifas desde un archivo Excel, CSV o Parquet (según la extensión)"""
+    filename = input("\nNombre del archivo (ej: tarifas_export_20241216.xlsx, .csv o .parquet): ").strip()
     
     if not Path(filename).exists():
         print(f"\n❌ Error: El archivo '{filename}' no existe.")
         return
     
+    extension = Path(filename).suffix.lower()
+    if extension == '.parquet' and not PARQUET_DISPONIBLE:
+        print("\n❌ ERROR: La librería pyarrow no está instalada.")
+        print("Instala con: pip install pyarrow")
+        return
+    if extension not in ('.csv', '.parquet') and not EXCEL_DISPONIBLE:
+        print("\n❌ ERROR: La librería openpyxl no está instalada.")
+        print("Instala con: pip install openpyxl")
+        return
+    
+    importador = ImportadorTarifas(session)
+    lote = None
     try:
-        # Cargar el archivo
-        wb = load_workbook(filename)
-        ws = wb.active
-        
-        # Verificar encabezados
-        headers_esperados = [
-            "ID", "Transportista", "Servicio", "Tipo Entrega", "Método Cálculo",
-            "Provincia", "Rango Min", "Rango Max", "Precio Fijo"
-        ]
-        
-        headers_archivo = [cell.value for cell in ws[1]]
-        if headers_archivo != headers_esperados:
-            print("\n❌ Error: El formato del archivo no es correcto.")
-            print(f"Encabezados esperados: {headers_esperados}")
-            print(f"Encabezados encontrados: {headers_archivo}")
-            return
-        
-        # Procesar filas
-        tarifas_nuevas = 0
-        tarifas_actualizadas = 0
-        errores = []
-        
-        for row_idx in range(2, ws.max_row + 1):
-            try:
-                tarifa_id = ws.cell(row=row_idx, column=1).value
-                transportista_nombre = ws.cell(row=row_idx, column=2).value
-                servicio_nombre = ws.cell(row=row_idx, column=3).value
-                tipo_entrega_str = ws.cell(row=row_idx, column=4).value
-                metodo_calculo_str = ws.cell(row=row_idx, column=5).value
-                provincia = ws.cell(row=row_idx, column=6).value
-                rango_min = ws.cell(row=row_idx, column=7).value
-                rango_max = ws.cell(row=row_idx, column=8).value
-                precio_fijo = ws.cell(row=row_idx, column=9).value
-                
-                # Validar datos obligatorios
-                if not all([transportista_nombre, servicio_nombre, tipo_entrega_str, 
-                           metodo_calculo_str, provincia, rango_min is not None, precio_fijo]):
-                    errores.append(f"Fila {row_idx}: Faltan datos obligatorios")
-                    continue
-                
-                # Buscar transportista
-                transportista = session.query(Transportista).filter(
-                    Transportista.nombre == transportista_nombre
-                ).first()
-                
-                if not transportista:
-                    errores.append(f"Fila {row_idx}: Transportista '{transportista_nombre}' no encontrado")
-                    continue
-                
-                # Convertir enums
-                try:
-                    tipo_entrega = TipoEntrega(tipo_entrega_str)
-                    metodo_calculo = MetodoCalculo(metodo_calculo_str)
-                except ValueError:
-                    errores.append(f"Fila {row_idx}: Tipo de entrega o método de cálculo inválido")
-                    continue
-                
-                # Buscar servicio
-                servicio = session.query(ServicioTransportista).filter(
-                    ServicioTransportista.transportista_id == transportista.id,
-                    ServicioTransportista.tipo_entrega == tipo_entrega,
-                    ServicioTransportista.metodo_calculo == metodo_calculo
-                ).first()
-                
-                if not servicio:
-                    errores.append(f"Fila {row_idx}: Servicio '{servicio_nombre}' no encontrado para '{transportista_nombre}'")
-                    continue
-                
-                # Convertir rango_max
-                rango_max_decimal = Decimal(str(rango_max)) if rango_max else None
-                
-                # Verificar si la tarifa existe (por ID o por combinación única)
-                tarifa_existente = None
-                if tarifa_id:
-                    tarifa_existente = session.query(Tarifa).filter(Tarifa.id == tarifa_id).first()
-                
-                if not tarifa_existente:
-                    # Buscar por combinación única
-                    tarifa_existente = session.query(Tarifa).filter(
-                        Tarifa.servicio_id == servicio.id,
-                        Tarifa.provincia == provincia,
-                        Tarifa.rango_min == Decimal(str(rango_min)),
-                        Tarifa.rango_max == rango_max_decimal if rango_max_decimal else Tarifa.rango_max.is_(None)
-                    ).first()
-                
-                if tarifa_existente:
-                    # Actualizar tarifa existente
-                    tarifa_existente.precio_fijo = Decimal(str(precio_fijo))
-                    tarifas_actualizadas += 1
-                else:
-                    # Crear nueva tarifa
-                    nueva_tarifa = Tarifa(
-                        servicio_id=servicio.id,
-                        provincia=provincia,
-                        rango_min=Decimal(str(rango_min)),
-                        rango_max=rango_max_decimal,
-                        precio_fijo=Decimal(str(precio_fijo))
-                    )
-                    session.add(nueva_tarifa)
-                    tarifas_nuevas += 1
-                    
-            except Exception as e:
-                errores.append(f"Fila {row_idx}: {str(e)}")
+        if extension == '.csv':
+            filas = leer_csv(filename)
+        elif extension == '.parquet':
+            filas = leer_parquet(filename)
+        else:
+            # Cargar el archivo
+            wb = load_workbook(filename, read_only=True)
+            ws = wb.active
+            
+            # Verificar encabezados
+            headers_archivo = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
+            if headers_archivo not in (COLUMNAS_TARIFAS, COLUMNAS_DELTA):
+                print("\n❌ Error: El formato del archivo no es correcto.")
+                print(f"Encabezados esperados: {COLUMNAS_TARIFAS} (y opcionalmente '{COLUMNAS_DELTA[-1]}')")
+                print(f"Encabezados encontrados: {headers_archivo}")
+                return
+            filas = enumerate(ws.iter_rows(min_row=2, max_col=len(headers_archivo), values_only=True), 2)
+        
+        # Cargar las filas en staging y analizarlas con SQL
+        lote = importador.cargar(filas)
+        resumen = importador.analizar(lote)
+        session.commit()  # No mantener la transacción abierta durante la confirmación
+        
+        if resumen.errores:
+            print(f"\n⚠️ Se encontraron {len(resumen.errores)} errores:")
+            for error in resumen.errores[:10]:  # Mostrar solo los primeros 10
+                print(f"   • {error}")
+            if len(resumen.errores) > 10:
+                print(f"   ... y {len(resumen.errores) - 10} errores más")
+        
+        # Comprobar los rangos tal como quedarían tras la importación
+        validacion = ValidadorTarifas(session).validar_lote(lote)
+        if validacion.errores:
+            print(f"\n⚠️ La importación deja {len(validacion.errores)} problemas de rangos:")
+            for incidencia in validacion.errores[:10]:
+                print(f"   • {incidencia}")
+            if len(validacion.errores) > 10:
+                print(f"   ... y {len(validacion.errores) - 10} más")
         
         # Confirmar cambios
-        if tarifas_nuevas > 0 or tarifas_actualizadas > 0:
-            confirmacion = input(f"\n¿Confirmar importación? ({tarifas_nuevas} nuevas, {tarifas_actualizadas} actualizadas) (S/n): ").strip().lower()
+        if resumen.hay_cambios:
+            confirmacion = input(f"\n¿Confirmar importación? ({resumen.nuevas} nuevas, {resumen.actualizadas} actualizadas, {resumen.eliminadas} eliminadas) (S/n): ").strip().lower()
             if confirmacion in ['s', 'si', 'sí', '']:
+                # Aplicar en una única transacción corta
+                version_anterior = obtener_version(session)
+                resumen, cambios = importador.aplicar(lote)
                 session.commit()
+                lote = None
                 print(f"\n✅ Importación completada")
-                print(f"   📝 Tarifas nuevas: {tarifas_nuevas}")
-                print(f"   🔄 Tarifas actualizadas: {tarifas_actualizadas}")
+                print(f"   📝 Tarifas nuevas: {resumen.nuevas}")
+                print(f"   🔄 Tarifas actualizadas: {resumen.actualizadas}")
+                print(f"   🗑️ Tarifas eliminadas: {resumen.eliminadas}")
+                
+                # Recotizar solo los pedidos cuya cotización puede cambiar
+                impacto = AnalizadorImpacto(session).recotizar_afectados(cambios, version_anterior)
+                session.commit()
+                print(f"   📦 Pedidos recotizados: {len(impacto.pedidos_afectados)}")
+                print(f"   🔀 Cambios de mejor transportista: {len(impacto.cambios_ganador)}")
+                for cambio in impacto.cambios_ganador[:10]:
+                    anterior = cambio.anterior.transportista_nombre if cambio.anterior else "sin opción"
+                    nuevo = cambio.nuevo.transportista_nombre if cambio.nuevo else "sin opción"
+                    print(f"      • Pedido {cambio.pedido_id}: {anterior} → {nuevo}")
             else:
-                session.rollback()
                 print("\n❌ Importación cancelada")
         else:
             print("\n⚠️ No se encontraron cambios para aplicar")
-        
-        if errores:
-            print(f"\n⚠️ Se encontraron {len(errores)} errores:")
-            for error in errores[:10]:  # Mostrar solo los primeros 10
-                print(f"   • {error}")
-            if len(errores) > 10:
-                print(f"   ... y {len(errores) - 10} errores más")
                 
     except Exception as e:
         print(f"\n❌ Error al importar tarifas: {e}")
         session.rollback()
+    finally:
+        # Eliminar el lote de staging si no se ha aplicado
+        if lote is not None:
+            importador.descartar(lote)
+            session.commit()
+
+
+def validar_tarifas(session):
+    """Valida los rangos de todas las tarifas y muestra las incidencias"""
+    resultado = ValidadorTarifas(session).validar()
+    
+    print(f"\n🔍 VALIDACIÓN DE RANGOS ({resultado.tarifas_revisadas} tarifas revisadas)")
+    imprimir_separador()
+    
+    if not resultado.incidencias:
+        print("✅ No se han encontrado incidencias")
+        return
+    
+    for tipo, total in sorted(resultado.contar_por_tipo().items(), key=lambda t: t[0].value):
+        print(f"   {tipo.value.replace('_', ' ').capitalize():<25} {total:>6}")
+    
+    for titulo, incidencias in (("❌ Errores", resultado.errores), ("⚠️ Avisos", resultado.avisos)):
+        if incidencias:
+            print(f"\n{titulo}:")
+            for incidencia in incidencias[:20]:
+                print(f"   • {incidencia}")
+            if len(incidencias) > 20:
+                print(f"   ... y {len(incidencias) - 20} más")
+
+
+def agrupar_zonas(session):
+    """Detecta provincias con tarifas idénticas y las agrupa en zonas"""
+    agrupador = AgrupadorZonas(session)
+    propuestas = agrupador.detectar()
+    
+    print("\n🗺️ AGRUPACIÓN DE PROVINCIAS EN ZONAS")
+    imprimir_separador()
+    
+    if not propuestas:
+        print("✅ No hay provincias con tarifas idénticas para agrupar")
+        return
+    
+    servicios = {s.id: s for s in session.query(ServicioTransportista).all()}
+    for propuesta in propuestas:
+        servicio = servicios[propuesta.servicio_id]
+        destino = "igual a NACIONAL (se eliminan)" if propuesta.igual_nacional else "nueva zona"
+        print(f"   • {servicio.transportista.nombre} - {servicio.tipo_entrega.value} ({servicio.metodo_calculo.value}): "
+              f"{', '.join(propuesta.provincias)} → {destino}, -{propuesta.tarifas_eliminadas} tarifas")
+    
+    total = sum(p.tarifas_eliminadas for p in propuestas)
+    confirmacion = input(f"\n¿Aplicar agrupación? ({len(propuestas)} propuestas, -{total} tarifas) (S/n): ").strip().lower()
+    if confirmacion in ['s', 'si', 'sí', '']:
+        resultado = agrupador.aplicar(propuestas)
+        session.commit()
+        print(f"\n✅ Agrupación completada")
+        print(f"   🗺️ Zonas creadas: {len(resultado.zonas_creadas)}")
+        print(f"   📍 Provincias agrupadas: {resultado.provincias_agrupadas}")
+        print(f"   🗑️ Tarifas eliminadas: {resultado.tarifas_eliminadas}")
+    else:
+        session.rollback()
+        print("\n❌ Agrupación cancelada")
 
 
 def listar_tarifas(session):
@@ -452,15 +586,18 @@ def menu_principal():
         print("3. Comparar transportistas para TODOS los pedidos")
         print("4. Listar todos los pedidos")
         print("5. Listar tarifas de todos los transportistas")
-        print("6. Exportar tarifas a Excel")
-        print("7. Importar tarifas desde Excel")
-        print("8. Salir")
+        print("6. Exportar tarifas (Excel, CSV o Parquet)")
+        print("7. Importar tarifas (Excel, CSV o Parquet)")
+        print("8. Validar rangos de tarifas")
+        print("9. Agrupar provincias en zonas")
+        print("10. Salir")
         print()
         
-        opcion = input("Selecciona una opción (1-8): ").strip()
+        opcion = input("Selecciona una opción (1-10): ").strip()
         
         if opcion == '1':
             with db_manager.get_session() as session:
+                CotizacionesMaterializadas(session).refrescar()
                 pedidos = session.query(Pedido).all()
                 for pedido in pedidos:
                     mostrar_mejor_transportista(pedido.id, session)
@@ -477,6 +614,7 @@ def menu_principal():
                     seleccion = int(input("\nSelecciona un pedido (número): ")) - 1
                     if 0 <= seleccion < len(pedidos):
                         comparar_transportistas(pedidos[seleccion].id, session)
+                        comparar_tipos_entrega(pedidos[seleccion].id, session)
                         input("Presiona ENTER para continuar...")
                     else:
                         print("❌ Selección inválida")
@@ -485,6 +623,7 @@ def menu_principal():
         
         elif opcion == '3':
             with db_manager.get_session() as session:
+                CotizacionesMaterializadas(session).refrescar()
                 pedidos = session.query(Pedido).all()
                 for pedido in pedidos:
                     comparar_transportistas(pedido.id, session)
@@ -492,8 +631,11 @@ def menu_principal():
         
         elif opcion == '4':
             with db_manager.get_session() as session:
-                selector = TransportistaSelector(session)
                 pedidos = session.query(Pedido).all()
+                num_productos = dict(
+                    session.query(PedidoProducto.pedido_id, func.count(PedidoProducto.id))
+                    .group_by(PedidoProducto.pedido_id).all()
+                )
                 print("\n📦 LISTADO DE PEDIDOS:")
                 print()
                 # Encabezado de la tabla
@@ -501,9 +643,8 @@ def menu_principal():
                 print("=" * 120)
                 # Datos
                 for pedido in pedidos:
-                    totales = selector.calcular_totales_pedido(pedido)
                     tipo_entrega = pedido.tipo_entrega.value.replace('_', ' ').title()
-                    print(f"{pedido.numero_pedido:<15} {pedido.provincia_entrega:<15} {tipo_entrega:<25} {len(pedido.productos):>5} {totales['peso_total']:>10.2f} {totales['volumen_total']:>13.4f} {totales['palets_total']:>8.2f}")
+                    print(f"{pedido.numero_pedido:<15} {pedido.provincia_entrega:<15} {tipo_entrega:<25} {num_productos.get(pedido.id, 0):>5} {pedido.peso_total or 0:>10.2f} {pedido.volumen_total or 0:>13.4f} {pedido.palets_total or 0:>8.2f}")
                 print()
                 input("Presiona ENTER para continuar...")
         
@@ -513,8 +654,14 @@ def menu_principal():
                 input("Presiona ENTER para continuar...")
         
         elif opcion == '6':
+            formato = input("Formato (xlsx/csv/parquet, ENTER = xlsx): ").strip().lower() or 'xlsx'
+            secuencia = input("Exportar solo los cambios desde la secuencia (ENTER = todas las tarifas): ").strip()
+            secuencia = int(secuencia) if secuencia.isdigit() else None
             with db_manager.get_session() as session:
-                exportar_tarifas_excel(session)
+                if formato in ('csv', 'parquet'):
+                    exportar_tarifas_archivo(session, formato, secuencia)
+                else:
+                    exportar_tarifas_excel(session, secuencia)
                 input("Presiona ENTER para continuar...")
         
         elif opcion == '7':
@@ -523,6 +670,16 @@ def menu_principal():
                 input("Presiona ENTER para continuar...")
         
         elif opcion == '8':
+            with db_manager.get_session() as session:
+                validar_tarifas(session)
+                input("Presiona ENTER para continuar...")
+        
+        elif opcion == '9':
+            with db_manager.get_session() as session:
+                agrupar_zonas(session)
+                input("Presiona ENTER para continuar...")
+        
+        elif opcion == '10':
             print("\n👋 ¡Hasta luego!")
             break
         
@@ -540,6 +697,7 @@ def demo_rapido():
     db_manager = get_db_manager()
     
     with db_manager.get_session() as session:
+        CotizacionesMaterializadas(session).refrescar()
         pedidos = session.query(Pedido).all()
         
         print(f"Se analizarán {len(pedidos)} pedidos de ejemplo...\n")
@@ -0,0 +1,36 @@
+"""
+Script de migración de la base de datos
+
+Actualiza una base de datos existente al esquema actual: crea las tablas
+nuevas, añade las columnas que falten y rellena los totales de los pedidos.
+"""
+
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+
+
+def main():
+    """Migra la base de datos al esquema actual"""
+    print("=" * 60)
+    print("MIGRACIÓN DE LA BASE DE DATOS")
+    print("=" * 60)
+    
+    db_manager = get_db_manager()
+    
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    print()
+    db_manager.migrar()
+    print("\n✅ Migración completada\n")
+
+
+if __name__ == "__main__":
+    main()
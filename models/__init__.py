@@ -1,7 +1,9 @@
 """Modelos de datos para el sistema de transportistas"""
 from .models import (
     Base, Transportista, ServicioTransportista, Tarifa, 
-    Producto, Pedido, PedidoProducto, TipoEntrega, MetodoCalculo
+    Producto, Pedido, PedidoProducto, TipoEntrega, MetodoCalculo,
+    ControlVersion, Cotizacion, EstadoCotizacion, TarifaStaging,
+    ZonaProvincia, RegistroCambio
 )
 
 __all__ = [
@@ -13,5 +15,11 @@ __all__ = [
     'Pedido',
     'PedidoProducto',
     'TipoEntrega',
-    'MetodoCalculo'
+    'MetodoCalculo',
+    'ControlVersion',
+    'Cotizacion',
+    'EstadoCotizacion',
+    'TarifaStaging',
+    'ZonaProvincia',
+    'RegistroCambio'
 ]
@@ -6,11 +6,19 @@ El modelo soporta:
 - Tarifas por volumen, peso o palets
 - Tarifas por provincia y tipo de entrega
 - Rangos de precios según cantidad
+- Cotizaciones materializadas con la versión de tarifas usada
+- Columnas enteras opcionales (céntimos, gramos, cm³) para comparaciones exactas
+- Tabla de staging para importaciones de tarifas
+- Registro de cambios (CDC) de transportistas, servicios, tarifas y zonas
 """
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, Boolean, Numeric
+from sqlalchemy import (
+    Column, Integer, String, Float, ForeignKey, Enum, Boolean, Numeric,
+    DateTime, UniqueConstraint, Index, JSON
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from datetime import datetime
 import enum
 
 Base = declarative_base()
@@ -75,6 +83,9 @@ class Tarifa(Base):
         precio_total = precio_fijo
     """
     __tablename__ = 'tarifas'
+    __table_args__ = (
+        Index('ix_tarifas_busqueda_clave', 'servicio_id', 'provincia_clave', 'rango_min_ent'),
+    )
     
     id = Column(Integer, primary_key=True)
     servicio_id = Column(Integer, ForeignKey('servicios_transportista.id'), nullable=False)
@@ -82,6 +93,12 @@ class Tarifa(Base):
     rango_min = Column(Numeric(10, 2), nullable=False)  # Mínimo del rango
     rango_max = Column(Numeric(10, 2), nullable=True)   # Máximo del rango (NULL = infinito)
     precio_fijo = Column(Numeric(10, 2), nullable=False)  # Precio total fijo por el rango
+    provincia_clave = Column(String(50), nullable=True)  # Clave normalizada (ver models/provincias.py)
+    
+    # Esquema entero (ver models/unidades.py): rangos en la unidad entera del método
+    rango_min_ent = Column(Integer, nullable=True)
+    rango_max_ent = Column(Integer, nullable=True)
+    precio_cent = Column(Integer, nullable=True)
     
     # Relaciones
     servicio = relationship("ServicioTransportista", back_populates="tarifas")
@@ -90,6 +107,36 @@ class Tarifa(Base):
         return f"<Tarifa(id={self.id}, provincia='{self.provincia}', rango={self.rango_min}-{self.rango_max}, precio={self.precio_fijo}€)>"
 
 
+class ZonaProvincia(Base):
+    """
+    Asignación de una provincia a una zona de tarifas de un servicio
+    
+    Las tarifas de una zona se guardan con el nombre de la zona en
+    Tarifa.provincia y se aplican a todas sus provincias. Precedencia al
+    buscar tarifa: provincia > zona > NACIONAL.
+    
+    Ejemplo: servicio 1, zona "Zona Norte" = Asturias, Cantabria, Lugo...
+    """
+    __tablename__ = 'zonas_provincias'
+    __table_args__ = (
+        UniqueConstraint('servicio_id', 'provincia', name='uq_zona_servicio_provincia'),
+        Index('ix_zonas_servicio_zona', 'servicio_id', 'zona'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    servicio_id = Column(Integer, ForeignKey('servicios_transportista.id'), nullable=False)
+    provincia = Column(String(50), nullable=False)
+    zona = Column(String(50), nullable=False)  # No debe coincidir con una provincia
+    provincia_clave = Column(String(50), nullable=True, index=True)  # Claves normalizadas
+    zona_clave = Column(String(50), nullable=True)
+    
+    # Relaciones
+    servicio = relationship("ServicioTransportista")
+    
+    def __repr__(self):
+        return f"<ZonaProvincia(servicio_id={self.servicio_id}, provincia='{self.provincia}', zona='{self.zona}')>"
+
+
 class Producto(Base):
     """Producto con sus características físicas"""
     __tablename__ = 'productos'
@@ -100,6 +147,10 @@ class Producto(Base):
     peso_kg = Column(Numeric(10, 2), nullable=False)  # Peso en kilogramos
     volumen_m3 = Column(Numeric(10, 4), nullable=False)  # Volumen en metros cúbicos
     
+    # Esquema entero
+    peso_g = Column(Integer, nullable=True)  # Peso en gramos
+    volumen_cm3 = Column(Integer, nullable=True)  # Volumen en cm³
+    
     # Relaciones
     pedidos = relationship("PedidoProducto", back_populates="producto")
     
@@ -114,7 +165,18 @@ class Pedido(Base):
     id = Column(Integer, primary_key=True)
     numero_pedido = Column(String(50), nullable=False, unique=True)
     provincia_entrega = Column(String(50), nullable=False)
+    provincia_clave = Column(String(50), nullable=True, index=True)  # Clave normalizada de provincia_entrega
+    codigo_postal = Column(String(5), nullable=True)  # Si no se indica provincia, se obtiene de aquí
     tipo_entrega = Column(Enum(TipoEntrega), nullable=False)
+    fecha = Column(DateTime, nullable=True, default=datetime.now, index=True)  # Alta del pedido (NULL en pedidos anteriores a la columna)
+    
+    # Totales desnormalizados (se mantienen al modificar las líneas del pedido)
+    peso_total = Column(Numeric(12, 2), nullable=True)  # kg
+    volumen_total = Column(Numeric(12, 4), nullable=True)  # m³
+    palets_total = Column(Numeric(12, 5), nullable=True)  # volumen / 2
+    peso_total_g = Column(Integer, nullable=True)  # Esquema entero: gramos
+    volumen_total_cm3 = Column(Integer, nullable=True)  # Esquema entero: cm³
+    hash_contenido = Column(String(32), nullable=True, index=True)  # Hash de las líneas (producto, cantidad)
     
     # Relaciones
     productos = relationship("PedidoProducto", back_populates="pedido", cascade="all, delete-orphan")
@@ -128,7 +190,7 @@ class PedidoProducto(Base):
     __tablename__ = 'pedido_producto'
     
     id = Column(Integer, primary_key=True)
-    pedido_id = Column(Integer, ForeignKey('pedidos.id'), nullable=False)
+    pedido_id = Column(Integer, ForeignKey('pedidos.id'), nullable=False, index=True)  # Totales por pedido
     producto_id = Column(Integer, ForeignKey('productos.id'), nullable=False)
     cantidad = Column(Integer, nullable=False, default=1)
     
@@ -138,3 +200,130 @@ class PedidoProducto(Base):
     
     def __repr__(self):
         return f"<PedidoProducto(pedido_id={self.pedido_id}, producto_id={self.producto_id}, cantidad={self.cantidad})>"
+
+
+class ControlVersion(Base):
+    """
+    Contador de versión de un conjunto de datos
+    
+    La versión 'tarifas' se incrementa en cada cambio de transportistas,
+    servicios o tarifas y permite detectar cotizaciones obsoletas.
+    """
+    __tablename__ = 'control_versiones'
+    
+    nombre = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ControlVersion(nombre='{self.nombre}', version={self.version})>"
+
+
+class Cotizacion(Base):
+    """
+    Cotización materializada de un pedido
+    
+    Guarda el ranking de cotizaciones calculado por lotes (posicion 1 = mejor
+    opción) junto con la versión de tarifas con la que se calculó.
+    """
+    __tablename__ = 'cotizaciones'
+    __table_args__ = (
+        UniqueConstraint('pedido_id', 'posicion', name='uq_cotizacion_pedido_posicion'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey('pedidos.id'), nullable=False)
+    posicion = Column(Integer, nullable=False)  # 1 = más económica
+    servicio_id = Column(Integer, ForeignKey('servicios_transportista.id'), nullable=False)
+    tarifa_id = Column(Integer, ForeignKey('tarifas.id'), nullable=False)
+    precio_total = Column(Numeric(10, 2), nullable=False)
+    cantidad_calculada = Column(Numeric(12, 4), nullable=False)  # kg, m³ o palets
+    version_tarifas = Column(Integer, nullable=False)
+    
+    # Relaciones
+    pedido = relationship("Pedido")
+    servicio = relationship("ServicioTransportista")
+    tarifa = relationship("Tarifa")
+    
+    def __repr__(self):
+        return f"<Cotizacion(pedido_id={self.pedido_id}, posicion={self.posicion}, precio={self.precio_total}€)>"
+
+
+class EstadoCotizacion(Base):
+    """
+    Estado de las cotizaciones materializadas de un pedido
+    
+    Registra la versión de tarifas usada y el número de cotizaciones
+    encontradas (también cuando no hay ninguna opción disponible).
+    """
+    __tablename__ = 'estado_cotizaciones'
+    
+    pedido_id = Column(Integer, ForeignKey('pedidos.id'), primary_key=True)
+    version_tarifas = Column(Integer, nullable=False)
+    num_cotizaciones = Column(Integer, nullable=False, default=0)
+    actualizado = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<EstadoCotizacion(pedido_id={self.pedido_id}, version={self.version_tarifas}, cotizaciones={self.num_cotizaciones})>"
+
+
+class TarifaStaging(Base):
+    """
+    Fila de tarifa pendiente de importar
+    
+    Las importaciones se cargan primero en esta tabla (agrupadas por lote),
+    se validan y comparan con las tarifas actuales mediante SQL y, tras la
+    confirmación, se aplican en una única transacción corta.
+    """
+    __tablename__ = 'tarifas_staging'
+    __table_args__ = (
+        # Búsqueda de filas repetidas dentro del lote
+        Index('ix_staging_combinacion', 'lote', 'servicio_id', 'provincia_clave', 'rango_min'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    lote = Column(String(36), nullable=False, index=True)
+    fila = Column(Integer, nullable=False)  # Fila del archivo de origen
+    tarifa_id = Column(Integer, nullable=True)  # ID indicado en el archivo
+    transportista = Column(String(100), nullable=True)
+    tipo_entrega = Column(String(30), nullable=True)  # Nombre del enum TipoEntrega
+    metodo_calculo = Column(String(30), nullable=True)  # Nombre del enum MetodoCalculo
+    provincia = Column(String(50), nullable=True)
+    provincia_clave = Column(String(50), nullable=True)
+    rango_min = Column(Numeric(10, 2), nullable=True)
+    rango_max = Column(Numeric(10, 2), nullable=True)
+    precio_fijo = Column(Numeric(10, 2), nullable=True)
+    operacion = Column(String(20), nullable=True)  # 'baja' o None (alta o modificación)
+    
+    # Resultado del análisis
+    servicio_id = Column(Integer, nullable=True)
+    tarifa_existente_id = Column(Integer, nullable=True)
+    accion = Column(String(20), nullable=True)  # nueva, actualizar, eliminar, sin_cambios, error, invalida
+    error = Column(String(200), nullable=True)
+    
+    def __repr__(self):
+        return f"<TarifaStaging(lote='{self.lote}', fila={self.fila}, accion='{self.accion}')>"
+
+
+class RegistroCambio(Base):
+    """
+    Cambio registrado en transportistas, servicios, tarifas o zonas
+
+    Tabla de solo inserción rellenada por triggers de SQLite (ver
+    database/registro_cambios.py), por lo que recoge también las escrituras
+    masivas hechas sin el ORM. La secuencia es creciente y nunca se reutiliza.
+    """
+    __tablename__ = 'registro_cambios'
+    __table_args__ = (
+        Index('ix_registro_cambios_tabla', 'tabla', 'secuencia'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    secuencia = Column(Integer, primary_key=True)
+    tabla = Column(String(50), nullable=False)
+    operacion = Column(String(10), nullable=False)  # insert, update, delete
+    fila_id = Column(Integer, nullable=False)
+    datos = Column(JSON, nullable=False)  # Fila nueva (o la eliminada en delete)
+    momento = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<RegistroCambio(secuencia={self.secuencia}, tabla='{self.tabla}', operacion='{self.operacion}', fila_id={self.fila_id})>"
@@ -0,0 +1,195 @@
+"""
+Provincias españolas y clave normalizada de provincia
+
+Las provincias se comparan por su clave normalizada (minúsculas, sin
+acentos ni signos de puntuación y con los nombres alternativos resueltos
+mediante una tabla de alias), de modo que "Málaga", "MALAGA" y "malaga"
+o "La Coruña" y "A Coruña" corresponden a la misma provincia.
+
+La provincia de un código postal se obtiene de sus dos primeros dígitos
+(código INE) con una tabla de prefijos.
+
+Ejemplo:
+    clave_provincia("La Coruña")  -> "a coruna"
+    nombre_provincia("la coruna") -> "A Coruña"
+    provincia_codigo_postal("08001") -> "Barcelona"
+"""
+
+from typing import Optional, Dict, Iterable, List
+from functools import lru_cache
+import re
+import unicodedata
+
+
+# Provincias por código INE (posición = código - 1)
+PROVINCIAS = (
+    "Álava", "Albacete", "Alicante", "Almería", "Ávila", "Badajoz", "Illes Balears",
+    "Barcelona", "Burgos", "Cáceres", "Cádiz", "Castellón", "Ciudad Real", "Córdoba",
+    "A Coruña", "Cuenca", "Girona", "Granada", "Guadalajara", "Gipuzkoa", "Huelva",
+    "Huesca", "Jaén", "León", "Lleida", "La Rioja", "Lugo", "Madrid", "Málaga",
+    "Murcia", "Navarra", "Ourense", "Asturias", "Palencia", "Las Palmas", "Pontevedra",
+    "Salamanca", "Santa Cruz de Tenerife", "Cantabria", "Segovia", "Sevilla", "Soria",
+    "Tarragona", "Teruel", "Toledo", "Valencia", "Valladolid", "Bizkaia", "Zamora",
+    "Zaragoza", "Ceuta", "Melilla"
+)
+
+# Nombres alternativos (bilingües, antiguos o en formato "Coruña, A")
+ALIAS_PROVINCIAS = {
+    "Araba": "Álava", "Araba/Álava": "Álava", "Álava/Araba": "Álava",
+    "Alacant": "Alicante", "Alicante/Alacant": "Alicante",
+    "Baleares": "Illes Balears", "Islas Baleares": "Illes Balears",
+    "Balears": "Illes Balears", "Balears, Illes": "Illes Balears",
+    "Castelló": "Castellón", "Castellón/Castelló": "Castellón", "Castellón de la Plana": "Castellón",
+    "La Coruña": "A Coruña", "Coruña": "A Coruña", "Coruña, A": "A Coruña",
+    "Gerona": "Girona",
+    "Guipúzcoa": "Gipuzkoa",
+    "Lérida": "Lleida",
+    "Rioja": "La Rioja", "Rioja, La": "La Rioja",
+    "Nafarroa": "Navarra",
+    "Orense": "Ourense",
+    "Principado de Asturias": "Asturias", "Oviedo": "Asturias",
+    "Palmas": "Las Palmas", "Palmas, Las": "Las Palmas", "Las Palmas de Gran Canaria": "Las Palmas",
+    "Tenerife": "Santa Cruz de Tenerife", "S/C de Tenerife": "Santa Cruz de Tenerife",
+    "Santander": "Cantabria",
+    "València": "Valencia", "Valencia/València": "Valencia",
+    "Vizcaya": "Bizkaia", "Biscay": "Bizkaia",
+    "Pamplona": "Navarra", "Logroño": "La Rioja",
+}
+
+PROVINCIA_NACIONAL = 'NACIONAL'
+
+
+@lru_cache(maxsize=4096)
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza un texto para compararlo: minúsculas, sin acentos y sin signos
+
+    Se memoriza, ya que en importaciones y consultas masivas se repiten
+    continuamente los mismos nombres de provincia.
+
+    Args:
+        texto: Texto a normalizar
+
+    Returns:
+        Texto normalizado ("Castellón/Castelló" -> "castellon castello")
+    """
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', sin_acentos.casefold()).split())
+
+
+# Clave normalizada -> nombre oficial y variante normalizada -> clave
+_NOMBRES: Dict[str, str] = {normalizar_texto(nombre): nombre for nombre in PROVINCIAS}
+_CLAVES: Dict[str, str] = {clave: clave for clave in _NOMBRES}
+_CLAVES.update({
+    normalizar_texto(alias): normalizar_texto(nombre) for alias, nombre in ALIAS_PROVINCIAS.items()
+})
+
+CLAVE_NACIONAL = normalizar_texto(PROVINCIA_NACIONAL)
+
+
+def clave_provincia(texto: Optional[str]) -> Optional[str]:
+    """
+    Obtiene la clave normalizada de una provincia (o zona, o NACIONAL)
+
+    Los textos que no son provincias conocidas (nombres de zona) se
+    devuelven normalizados.
+
+    Args:
+        texto: Nombre de la provincia tal como llega
+
+    Returns:
+        Clave normalizada o None si el texto es None
+    """
+    if texto is None:
+        return None
+    normalizado = normalizar_texto(texto)
+    return _CLAVES.get(normalizado, normalizado)
+
+
+def nombre_provincia(texto: str) -> str:
+    """
+    Obtiene el nombre oficial de una provincia
+
+    Args:
+        texto: Nombre de la provincia en cualquier variante
+
+    Returns:
+        Nombre oficial, o el texto sin espacios sobrantes si no es una provincia conocida
+    """
+    return _NOMBRES.get(clave_provincia(texto), texto.strip())
+
+
+def provincia_conocida(texto: Optional[str]) -> bool:
+    """Indica si el texto corresponde a una provincia conocida o a NACIONAL"""
+    clave = clave_provincia(texto)
+    return clave in _NOMBRES or clave == CLAVE_NACIONAL
+
+
+# Código postal: los dos primeros dígitos son el código INE de la provincia
+_PROVINCIAS_POR_PREFIJO: Dict[str, str] = {
+    f"{codigo:02d}": nombre for codigo, nombre in enumerate(PROVINCIAS, 1)
+}
+
+
+def normalizar_codigo_postal(codigo) -> Optional[str]:
+    """
+    Normaliza un código postal a 5 dígitos
+
+    Admite enteros (8001 -> "08001") y textos con espacios.
+
+    Args:
+        codigo: Código postal como texto o entero
+
+    Returns:
+        Código de 5 dígitos o None si no es válido
+    """
+    if codigo is None:
+        return None
+    if isinstance(codigo, int):
+        texto = f"{codigo:05d}"
+    else:
+        texto = str(codigo).replace(" ", "").strip()
+        if texto.isdigit() and len(texto) == 4:
+            texto = "0" + texto  # Cero inicial perdido (hojas de cálculo)
+    if len(texto) != 5 or not texto.isdigit() or texto[:2] not in _PROVINCIAS_POR_PREFIJO:
+        return None
+    return texto
+
+
+def provincia_codigo_postal(codigo) -> Optional[str]:
+    """
+    Obtiene la provincia de un código postal español
+
+    Args:
+        codigo: Código postal como texto o entero
+
+    Returns:
+        Nombre oficial de la provincia o None si el código no es válido
+    """
+    normalizado = normalizar_codigo_postal(codigo)
+    return _PROVINCIAS_POR_PREFIJO[normalizado[:2]] if normalizado else None
+
+
+def provincias_codigos_postales(codigos: Iterable) -> List[Optional[str]]:
+    """
+    Resuelve en bloque la provincia de muchos códigos postales
+
+    Los códigos de 5 dígitos se resuelven con una única consulta al
+    diccionario de prefijos; el resto pasa por la normalización completa.
+
+    Args:
+        codigos: Códigos postales como texto o entero
+
+    Returns:
+        Lista de provincias (None para los códigos no válidos), en el mismo orden
+    """
+    prefijos = _PROVINCIAS_POR_PREFIJO
+    resultado = []
+    agregar = resultado.append
+    for codigo in codigos:
+        if type(codigo) is str and len(codigo) == 5 and codigo.isdigit():
+            agregar(prefijos.get(codigo[:2]))
+        else:
+            agregar(provincia_codigo_postal(codigo))
+    return resultado
@@ -0,0 +1,62 @@
+"""
+Conversión entre cantidades decimales y unidades enteras
+
+El esquema entero guarda precios en céntimos, pesos en gramos y volúmenes en
+cm³. Los rangos de las tarifas se guardan en la unidad entera del método de
+cálculo del servicio:
+
+- PESO: gramos (kg × 1.000)
+- VOLUMEN: cm³ (m³ × 1.000.000)
+- PALETS: cm³ de volumen (palets × 2.000.000, ya que 1 palet = 2 m³)
+
+Así la cantidad entera de un pedido para PALETS es directamente su volumen
+en cm³ y todas las comparaciones de rangos son exactas.
+"""
+
+from typing import Optional
+from decimal import Decimal, ROUND_HALF_UP
+
+from .models import MetodoCalculo
+
+
+FACTOR_PRECIO = 100          # euros -> céntimos
+FACTOR_PESO = 1000           # kg -> gramos
+FACTOR_VOLUMEN = 1000000     # m³ -> cm³
+
+FACTORES_METODO = {
+    MetodoCalculo.PESO: FACTOR_PESO,
+    MetodoCalculo.VOLUMEN: FACTOR_VOLUMEN,
+    MetodoCalculo.PALETS: 2 * FACTOR_VOLUMEN
+}
+
+
+def a_entero(valor, factor: int) -> Optional[int]:
+    """
+    Convierte una cantidad decimal a unidades enteras (redondeo al más cercano)
+
+    Args:
+        valor: Cantidad (Decimal, float, int o None)
+        factor: Factor de conversión a la unidad entera
+
+    Returns:
+        Cantidad entera o None si el valor es None
+    """
+    if valor is None:
+        return None
+    return int((Decimal(str(valor)) * factor).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def desde_entero(valor: Optional[int], factor: int) -> Optional[Decimal]:
+    """
+    Convierte una cantidad entera a Decimal en la unidad original
+
+    Args:
+        valor: Cantidad entera o None
+        factor: Factor de conversión usado al guardar
+
+    Returns:
+        Cantidad decimal exacta o None si el valor es None
+    """
+    if valor is None:
+        return None
+    return Decimal(valor) / factor
@@ -1,4 +1,4 @@
 """Servicios de negocio"""
-from .selector import TransportistaSelector, CotizacionResult
+from .selector import TransportistaSelector, CotizacionResult, LoteCotizaciones
 
-__all__ = ['TransportistaSelector', 'CotizacionResult']
+__all__ = ['TransportistaSelector', 'CotizacionResult', 'LoteCotizaciones']
@@ -0,0 +1,192 @@
+"""
+Agrupación de cotizaciones individuales en micro-lotes
+
+Con muchas peticiones concurrentes de un solo pedido, cada una paga su
+propia sesión y consulta. El agrupador las encola y un hilo las reúne
+durante unos milisegundos (o hasta completar un lote) y las resuelve juntas
+por la vía de lotes: una consulta de columnas para todos los pedidos
+(datos_pedidos) y el cálculo con las tarifas compiladas, reutilizando el
+resultado de los pedidos con el mismo contenido.
+
+Cada petición recibe un Future (concurrent.futures) con sus cotizaciones,
+que puede esperarse desde hilos o desde asyncio (asyncio.wrap_future).
+La espera añadida a una petición nunca supera max_espera más el tiempo de
+resolver su lote.
+
+Ejemplo:
+    with AgrupadorCotizaciones(db_manager, recargador, max_lote=64, max_espera=0.005) as agrupador:
+        cotizaciones = agrupador.cotizar(pedido_id)
+        futuro = agrupador.solicitar(pedido_id, limite=1)
+"""
+
+from typing import List, Optional, Tuple
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+from database.db_manager import DatabaseManager
+from services.selector import CotizacionResult
+from services.recarga_tarifas import RecargadorTarifas
+from services.cotizador_async import datos_pedidos, cotizar_datos
+
+
+MAX_LOTE = 64  # Peticiones por micro-lote
+
+MAX_ESPERA = 0.005  # Segundos que se espera a completar un lote
+
+# Petición encolada: (pedido_id, límite, futuro)
+Peticion = Tuple[int, Optional[int], Future]
+
+
+class AgrupadorCotizaciones:
+    """Resuelve las cotizaciones de pedidos individuales en micro-lotes"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        recargador: RecargadorTarifas,
+        max_lote: int = MAX_LOTE,
+        max_espera: float = MAX_ESPERA
+    ):
+        """
+        Inicializa el agrupador (el hilo se arranca con iniciar())
+
+        Args:
+            db_manager: Gestor de la base de datos
+            recargador: Recargador con las tarifas compiladas vigentes
+            max_lote: Peticiones como máximo por lote
+            max_espera: Segundos como máximo que la primera petición de un
+                lote espera a que lleguen más
+        """
+        if max_lote < 1:
+            raise ValueError("El tamaño máximo del lote debe ser al menos 1")
+        self.db_manager = db_manager
+        self.recargador = recargador
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.lotes = 0
+        self.peticiones = 0
+        self._cola: 'queue.Queue[Optional[Peticion]]' = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def tamano_medio(self) -> float:
+        """Peticiones resueltas por lote de media"""
+        return self.peticiones / self.lotes if self.lotes else 0.0
+
+    def solicitar(self, pedido_id: int, limite: Optional[int] = 5) -> Future:
+        """
+        Encola la cotización de un pedido
+
+        Args:
+            pedido_id: ID del pedido
+            limite: Número máximo de cotizaciones (None = todas)
+
+        Returns:
+            Future con la lista de cotizaciones ordenadas por precio, o con
+            ValueError si el pedido no existe
+        """
+        if self._hilo is None:
+            raise RuntimeError("El agrupador no está iniciado")
+        futuro = Future()
+        self._cola.put((pedido_id, limite, futuro))
+        return futuro
+
+    def cotizar(
+        self,
+        pedido_id: int,
+        limite: Optional[int] = 5,
+        timeout: Optional[float] = None
+    ) -> List[CotizacionResult]:
+        """
+        Cotiza un pedido esperando a que se resuelva su lote
+
+        Args:
+            pedido_id: ID del pedido
+            limite: Número máximo de cotizaciones (None = todas)
+            timeout: Segundos como máximo de espera (None = sin límite)
+
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+
+        Raises:
+            ValueError: Si el pedido no existe
+        """
+        return self.solicitar(pedido_id, limite).result(timeout)
+
+    def _reunir(self, primera: Peticion) -> List[Peticion]:
+        """Reúne peticiones hasta completar el lote o agotar la espera de la primera"""
+        lote = [primera]
+        limite_espera = time.monotonic() + self.max_espera
+        while len(lote) < self.max_lote:
+            restante = limite_espera - time.monotonic()
+            try:
+                peticion = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if peticion is None:
+                self._cola.put(None)  # Se procesa el lote y después se detiene
+                break
+            lote.append(peticion)
+        return lote
+
+    def _resolver(self, lote: List[Peticion]):
+        """Cotiza un lote con una sola consulta y completa los futuros"""
+        pendientes = [(pedido_id, limite, futuro) for pedido_id, limite, futuro in lote
+                      if futuro.set_running_or_notify_cancel()]
+        if not pendientes:
+            return
+        try:
+            tarifas = self.recargador.tarifas
+            with self.db_manager.get_session() as session:
+                datos = datos_pedidos(session, {pedido_id for pedido_id, _, _ in pendientes})
+            cotizaciones = cotizar_datos(tarifas, datos, limite=None)
+        except Exception as e:
+            for _, _, futuro in pendientes:
+                futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.peticiones += len(pendientes)
+        for pedido_id, limite, futuro in pendientes:
+            if pedido_id in datos:
+                futuro.set_result(cotizaciones.cotizaciones_pedido(pedido_id)[:limite])
+            else:
+                futuro.set_exception(ValueError(f"Pedido {pedido_id} no encontrado"))
+
+    def _procesar(self):
+        """Bucle del hilo de agrupación"""
+        while True:
+            primera = self._cola.get()
+            if primera is None:
+                return
+            self._resolver(self._reunir(primera))
+
+    def iniciar(self):
+        """Compila las tarifas si hace falta e inicia el hilo de agrupación"""
+        if self._hilo is not None:
+            return
+        self.recargador.tarifas
+        self._hilo = threading.Thread(target=self._procesar, name="agrupador-cotizaciones", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Resuelve las peticiones ya encoladas y detiene el hilo"""
+        hilo, self._hilo = self._hilo, None
+        if hilo is None:
+            return
+        self._cola.put(None)
+        hilo.join()
+        # Peticiones encoladas mientras se detenía
+        while not self._cola.empty():
+            peticion = self._cola.get_nowait()
+            if peticion is not None and peticion[2].set_running_or_notify_cancel():
+                peticion[2].set_exception(RuntimeError("El agrupador se ha detenido"))
+
+    def __enter__(self) -> 'AgrupadorCotizaciones':
+        self.iniciar()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detener()
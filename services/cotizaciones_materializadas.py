@@ -0,0 +1,269 @@
+"""
+Cotizaciones materializadas
+
+Guarda en la tabla 'cotizaciones' el ranking calculado por el selector para
+cada pedido, junto con la versión de tarifas utilizada. Las pantallas de
+listado y comparación leen de esta tabla y solo se recalculan los pedidos
+cuyas cotizaciones han quedado obsoletas (versión de tarifas anterior a la
+actual o sin calcular).
+"""
+
+from typing import List, Optional, Dict, Iterable
+from datetime import datetime
+
+from sqlalchemy import select, delete, or_, bindparam
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models.models import (
+    Pedido, Transportista, ServicioTransportista, Tarifa,
+    Cotizacion, EstadoCotizacion
+)
+from database.versiones import obtener_version
+from services.selector import TransportistaSelector, CotizacionResult, LoteCotizaciones
+
+
+# Número de pedidos que se recotizan y guardan en cada bloque
+TAMANO_BLOQUE = 1000
+
+
+def _bloques(pedido_ids: List[int]) -> Iterable[List[int]]:
+    """Divide una lista de IDs en bloques de TAMANO_BLOQUE (límite de parámetros de SQLite)"""
+    for inicio in range(0, len(pedido_ids), TAMANO_BLOQUE):
+        yield pedido_ids[inicio:inicio + TAMANO_BLOQUE]
+
+
+class CotizacionesMaterializadas:
+    """Gestiona la tabla de cotizaciones materializadas por pedido"""
+
+    def __init__(self, session: Session, limite: Optional[int] = None):
+        """
+        Inicializa el gestor
+
+        Args:
+            session: Sesión de base de datos
+            limite: Número máximo de cotizaciones guardadas por pedido (None = todas)
+        """
+        self.session = session
+        self.limite = limite
+        self.selector = TransportistaSelector(session)
+
+    def pedidos_obsoletos(self, pedido_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Obtiene los pedidos sin cotizaciones o calculados con otra versión de tarifas
+
+        Args:
+            pedido_ids: Pedidos a comprobar (None = todos)
+
+        Returns:
+            Lista de IDs de pedidos que deben recotizarse
+        """
+        version = obtener_version(self.session)
+        stmt = select(Pedido.id).outerjoin(
+            EstadoCotizacion, EstadoCotizacion.pedido_id == Pedido.id
+        ).where(
+            or_(
+                EstadoCotizacion.pedido_id.is_(None),
+                EstadoCotizacion.version_tarifas != version
+            )
+        ).order_by(Pedido.id)
+        if pedido_ids is None:
+            return list(self.session.execute(stmt).scalars())
+
+        obsoletos = []
+        for bloque in _bloques(list(pedido_ids)):
+            obsoletos.extend(self.session.execute(stmt.where(Pedido.id.in_(bloque))).scalars())
+        return obsoletos
+
+    def guardar_lote(self, lote: LoteCotizaciones, version: int):
+        """
+        Guarda un lote de cotizaciones mediante upsert masivo
+
+        Args:
+            lote: Cotizaciones calculadas por el selector
+            version: Versión de tarifas usada en el cálculo
+        """
+        filas = []
+        posiciones = {pedido_id: 0 for pedido_id in lote.pedido_ids()}
+        for pedido_id, cotizacion in lote:
+            posiciones[pedido_id] += 1
+            filas.append({
+                'pedido_id': pedido_id,
+                'posicion': posiciones[pedido_id],
+                'servicio_id': cotizacion.servicio_id,
+                'tarifa_id': cotizacion.tarifa_id,
+                'precio_total': cotizacion.precio_total,
+                'cantidad_calculada': cotizacion.cantidad_calculada,
+                'version_tarifas': version
+            })
+
+        if filas:
+            stmt = insert(Cotizacion)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Cotizacion.pedido_id, Cotizacion.posicion],
+                set_={
+                    'servicio_id': stmt.excluded.servicio_id,
+                    'tarifa_id': stmt.excluded.tarifa_id,
+                    'precio_total': stmt.excluded.precio_total,
+                    'cantidad_calculada': stmt.excluded.cantidad_calculada,
+                    'version_tarifas': stmt.excluded.version_tarifas
+                }
+            )
+            self.session.execute(stmt, filas)
+
+        # Eliminar posiciones sobrantes de cálculos anteriores con más opciones
+        if posiciones:
+            tabla = Cotizacion.__table__
+            self.session.connection().execute(
+                delete(tabla).where(
+                    tabla.c.pedido_id == bindparam('b_pedido_id'),
+                    tabla.c.posicion > bindparam('b_num')
+                ),
+                [{'b_pedido_id': pedido_id, 'b_num': num} for pedido_id, num in posiciones.items()]
+            )
+
+        ahora = datetime.now()
+        estados = [
+            {
+                'pedido_id': pedido_id,
+                'version_tarifas': version,
+                'num_cotizaciones': num,
+                'actualizado': ahora
+            }
+            for pedido_id, num in posiciones.items()
+        ]
+        if estados:
+            stmt = insert(EstadoCotizacion)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[EstadoCotizacion.pedido_id],
+                set_={
+                    'version_tarifas': stmt.excluded.version_tarifas,
+                    'num_cotizaciones': stmt.excluded.num_cotizaciones,
+                    'actualizado': stmt.excluded.actualizado
+                }
+            )
+            self.session.execute(stmt, estados)
+
+    def recotizar(self, pedido_ids: List[int]) -> int:
+        """
+        Recalcula y guarda las cotizaciones de los pedidos indicados
+
+        Args:
+            pedido_ids: Pedidos a recotizar
+
+        Returns:
+            Número de pedidos recotizados
+        """
+        version = obtener_version(self.session)
+        memo = {}  # Pedidos con el mismo contenido, provincia y tipo de entrega
+        for bloque in _bloques(pedido_ids):
+            lote = self.selector.cotizar_lote(bloque, limite=self.limite, memo=memo)
+            self.guardar_lote(lote, version)
+        self.session.flush()
+        return len(pedido_ids)
+
+    def refrescar(self, pedido_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recotiza solo los pedidos con cotizaciones obsoletas
+
+        Args:
+            pedido_ids: Pedidos a comprobar (None = todos)
+
+        Returns:
+            Número de pedidos recotizados
+        """
+        return self.recotizar(self.pedidos_obsoletos(pedido_ids))
+
+    def obtener_cotizaciones(
+        self,
+        pedido_ids: Optional[Iterable[int]] = None,
+        refrescar: bool = True
+    ) -> Dict[int, List[CotizacionResult]]:
+        """
+        Lee las cotizaciones materializadas de varios pedidos
+
+        Args:
+            pedido_ids: Pedidos a consultar (None = todos)
+            refrescar: Si es True, recotiza antes los pedidos obsoletos
+
+        Returns:
+            Diccionario pedido_id -> cotizaciones ordenadas por precio
+        """
+        if pedido_ids is not None:
+            pedido_ids = list(pedido_ids)
+        if refrescar:
+            self.refrescar(pedido_ids)
+
+        stmt = select(
+            Cotizacion.pedido_id,
+            Cotizacion.precio_total,
+            Cotizacion.cantidad_calculada,
+            Cotizacion.tarifa_id,
+            Tarifa.provincia,
+            Tarifa.rango_min,
+            Tarifa.rango_max,
+            ServicioTransportista.id,
+            ServicioTransportista.tipo_entrega,
+            ServicioTransportista.metodo_calculo,
+            Transportista.id,
+            Transportista.nombre
+        ).join(
+            Tarifa, Tarifa.id == Cotizacion.tarifa_id
+        ).join(
+            ServicioTransportista, ServicioTransportista.id == Cotizacion.servicio_id
+        ).join(
+            Transportista, Transportista.id == ServicioTransportista.transportista_id
+        ).order_by(Cotizacion.pedido_id, Cotizacion.posicion)
+        if pedido_ids is None:
+            filas = self.session.execute(stmt)
+        else:
+            filas = (
+                fila
+                for bloque in _bloques(pedido_ids)
+                for fila in self.session.execute(stmt.where(Cotizacion.pedido_id.in_(bloque)))
+            )
+
+        resultado: Dict[int, List[CotizacionResult]] = {
+            pedido_id: [] for pedido_id in (pedido_ids or [])
+        }
+        for (pedido_id, precio, cantidad, tarifa_id, provincia, rango_min, rango_max,
+             servicio_id, tipo_entrega, metodo, transportista_id, nombre) in filas:
+            resultado.setdefault(pedido_id, []).append(CotizacionResult(
+                transportista_id=transportista_id,
+                transportista_nombre=nombre,
+                servicio_id=servicio_id,
+                tipo_entrega=tipo_entrega.value,
+                metodo_calculo=metodo.value,
+                precio_total=precio,
+                cantidad_calculada=cantidad,
+                tarifa_id=tarifa_id,
+                provincia=provincia,
+                rango_min=rango_min,
+                rango_max=rango_max
+            ))
+        return resultado
+
+    def obtener_cotizaciones_pedido(self, pedido_id: int) -> List[CotizacionResult]:
+        """
+        Lee las cotizaciones materializadas de un pedido
+
+        Args:
+            pedido_id: ID del pedido
+
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+        """
+        return self.obtener_cotizaciones([pedido_id])[pedido_id]
+
+    def obtener_mejor_cotizacion(self, pedido_id: int) -> Optional[CotizacionResult]:
+        """
+        Obtiene la cotización materializada más económica de un pedido
+
+        Args:
+            pedido_id: ID del pedido
+
+        Returns:
+            Mejor cotización o None si no hay opciones
+        """
+        cotizaciones = self.obtener_cotizaciones_pedido(pedido_id)
+        return cotizaciones[0] if cotizaciones else None
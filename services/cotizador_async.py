@@ -0,0 +1,320 @@
+"""
+Interfaz asyncio del cotizador
+
+Permite cotizar desde aplicaciones asíncronas (servidores web) sin bloquear
+el bucle de eventos:
+
+- Las consultas a SQLite (datos del pedido, productos del carrito) se
+  ejecutan en un pool de hilos propio con un número limitado de hilos, y
+  las peticiones que superan el número máximo de tareas pendientes esperan
+  su turno de forma asíncrona en lugar de acumularse en la cola del pool
+- El cálculo de precios se hace con las tarifas compiladas en memoria de un
+  RecargadorTarifas (que las mantiene al día con la base de datos). Las
+  cotizaciones de un pedido o carrito se calculan en el propio bucle (son
+  microsegundos); los lotes se calculan en el pool junto con su consulta
+
+Ejemplo:
+    async with CotizadorAsync(get_db_manager()) as cotizador:
+        cotizaciones = await cotizador.cotizar(pedido_id)
+        lote = await cotizador.cotizar_lote([1, 2, 3])
+"""
+
+from typing import List, Optional, Dict, Tuple, Iterable, Callable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import Pedido, TipoEntrega
+from models.provincias import clave_provincia, provincia_codigo_postal
+from database.db_manager import DatabaseManager
+from services.selector import TransportistaSelector, CotizacionResult, LoteCotizaciones
+from services.recarga_tarifas import RecargadorTarifas
+from services.tarifas_compiladas import TarifasCompiladas
+
+
+HILOS = 4  # Hilos del pool para las consultas
+
+# Tareas en el pool por hilo (el resto de peticiones espera sin bloquear el bucle)
+PENDIENTES_POR_HILO = 4
+
+# IDs de pedido por consulta (límite de parámetros de SQLite)
+TAMANO_CONSULTA = 500
+
+T = TypeVar('T')
+
+# Datos de un pedido necesarios para cotizarlo: (tipo de entrega, provincia, totales, hash_contenido)
+DatosPedido = Tuple[TipoEntrega, str, Dict[str, Decimal], Optional[str]]
+
+
+def datos_pedidos(session: Session, pedido_ids: Iterable[int]) -> Dict[int, DatosPedido]:
+    """
+    Lee los datos de cotización de varios pedidos sin cargar objetos del ORM
+
+    Los pedidos sin totales calculados los suman a partir de sus líneas.
+
+    Args:
+        session: Sesión de base de datos
+        pedido_ids: IDs de los pedidos
+
+    Returns:
+        {pedido_id: (tipo de entrega, provincia, totales, hash_contenido)}
+        para los pedidos que existen
+    """
+    pedido_ids = list(pedido_ids)
+    datos: Dict[int, DatosPedido] = {}
+    sin_totales = []
+    for inicio in range(0, len(pedido_ids), TAMANO_CONSULTA):
+        for fila in session.execute(
+            select(
+                Pedido.id, Pedido.tipo_entrega, Pedido.provincia_entrega, Pedido.peso_total,
+                Pedido.volumen_total, Pedido.palets_total, Pedido.hash_contenido
+            ).where(Pedido.id.in_(pedido_ids[inicio:inicio + TAMANO_CONSULTA]))
+        ):
+            pedido_id, tipo_entrega, provincia, peso, volumen, palets, hash_contenido = fila
+            if peso is None:
+                sin_totales.append(pedido_id)
+                continue
+            totales = {'peso_total': peso, 'volumen_total': volumen, 'palets_total': palets}
+            datos[pedido_id] = (tipo_entrega, provincia, totales, hash_contenido)
+
+    if sin_totales:
+        selector = TransportistaSelector(session)
+        for pedido in session.query(Pedido).filter(Pedido.id.in_(sin_totales)):
+            datos[pedido.id] = (
+                pedido.tipo_entrega, pedido.provincia_entrega,
+                selector.calcular_totales_pedido(pedido), None
+            )
+    return datos
+
+
+def cotizar_datos(
+    tarifas: TarifasCompiladas,
+    datos: Dict[int, DatosPedido],
+    limite: Optional[int] = 5
+) -> LoteCotizaciones:
+    """
+    Cotiza pedidos ya leídos con unas tarifas compiladas
+
+    Los pedidos con el mismo contenido, provincia y tipo de entrega se
+    cotizan una sola vez.
+
+    Args:
+        tarifas: Tarifas compiladas
+        datos: Resultado de datos_pedidos()
+        limite: Número máximo de cotizaciones por pedido (None = todas)
+
+    Returns:
+        LoteCotizaciones con las cotizaciones de cada pedido
+    """
+    memo: Dict[Tuple[str, str, TipoEntrega], List[CotizacionResult]] = {}
+    lote = LoteCotizaciones()
+    for pedido_id in sorted(datos):
+        tipo_entrega, provincia, totales, hash_contenido = datos[pedido_id]
+        clave = None
+        if hash_contenido is not None:
+            clave = (hash_contenido, clave_provincia(provincia), tipo_entrega)
+            cotizaciones = memo.get(clave)
+            if cotizaciones is not None:
+                lote.agregar(pedido_id, cotizaciones[:limite])
+                continue
+        cotizaciones = tarifas.cotizar(tipo_entrega, provincia, totales)
+        if clave is not None:
+            memo[clave] = cotizaciones
+        lote.agregar(pedido_id, cotizaciones[:limite])
+    return lote
+
+
+class CotizadorAsync:
+    """Cotizador para código asyncio con consultas en un pool de hilos acotado"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        hilos: int = HILOS,
+        max_pendientes: Optional[int] = None,
+        recargador: Optional[RecargadorTarifas] = None,
+        agrupador=None
+    ):
+        """
+        Inicializa el cotizador (las tarifas se compilan en iniciar() o en
+        la primera cotización)
+
+        Args:
+            db_manager: Gestor de la base de datos
+            hilos: Hilos del pool para las consultas
+            max_pendientes: Tareas simultáneas en el pool (None = hilos * PENDIENTES_POR_HILO)
+            recargador: Recargador de tarifas compartido. Si no se indica, se
+                crea uno propio que se detiene al cerrar el cotizador
+            agrupador: AgrupadorCotizaciones (ya iniciado) con el que resolver
+                cotizar() en micro-lotes junto con otras peticiones
+        """
+        self.db_manager = db_manager
+        self.recargador = recargador or RecargadorTarifas(db_manager)
+        self._recargador_propio = recargador is None
+        self.agrupador = agrupador
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='cotizador')
+        self._pendientes = asyncio.Semaphore(max_pendientes or hilos * PENDIENTES_POR_HILO)
+
+    async def ejecutar(self, funcion: Callable[..., T], *args) -> T:
+        """
+        Ejecuta una función bloqueante en el pool sin bloquear el bucle de eventos
+
+        Args:
+            funcion: Función a ejecutar
+            *args: Argumentos de la función
+
+        Returns:
+            Resultado de la función
+        """
+        async with self._pendientes:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, funcion, *args)
+
+    async def en_sesion(self, funcion: Callable[..., T], *args) -> T:
+        """
+        Ejecuta funcion(session, *args) en el pool con una sesión propia
+
+        Returns:
+            Resultado de la función
+        """
+        def ejecutar():
+            with self.db_manager.get_session() as session:
+                return funcion(session, *args)
+        return await self.ejecutar(ejecutar)
+
+    async def tarifas(self) -> TarifasCompiladas:
+        """Tarifas compiladas vigentes (la primera compilación se hace en el pool)"""
+        if self.recargador.version is None:
+            return await self.ejecutar(lambda: self.recargador.tarifas)
+        return self.recargador.tarifas
+
+    async def iniciar(self):
+        """Compila las tarifas e inicia su recarga en caliente"""
+        await self.ejecutar(self.recargador.iniciar)
+
+    async def cerrar(self):
+        """Detiene la recarga de tarifas (si es propia) y el pool de hilos"""
+        if self._recargador_propio:
+            await self.ejecutar(self.recargador.detener)
+        self._pool.shutdown(wait=False)
+
+    async def __aenter__(self) -> 'CotizadorAsync':
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.cerrar()
+
+    async def _datos_pedido(self, pedido_id: int) -> DatosPedido:
+        datos = await self.en_sesion(datos_pedidos, [pedido_id])
+        if pedido_id not in datos:
+            raise ValueError(f"Pedido {pedido_id} no encontrado")
+        return datos[pedido_id]
+
+    async def cotizar(self, pedido_id: int, limite: Optional[int] = 5) -> List[CotizacionResult]:
+        """
+        Cotiza un pedido
+
+        Args:
+            pedido_id: ID del pedido
+            limite: Número máximo de cotizaciones (None = todas)
+
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+
+        Raises:
+            ValueError: Si el pedido no existe
+        """
+        if self.agrupador is not None:
+            return await asyncio.wrap_future(self.agrupador.solicitar(pedido_id, limite))
+        tipo_entrega, provincia, totales, _ = await self._datos_pedido(pedido_id)
+        tarifas = await self.tarifas()
+        return tarifas.cotizar(tipo_entrega, provincia, totales, limite)
+
+    async def mejor_cotizacion(self, pedido_id: int) -> Optional[CotizacionResult]:
+        """
+        Obtiene la opción más económica de un pedido
+
+        Returns:
+            CotizacionResult más económica o None si no hay opciones
+        """
+        cotizaciones = await self.cotizar(pedido_id, limite=1)
+        return cotizaciones[0] if cotizaciones else None
+
+    async def comparar_tipos_entrega(
+        self,
+        pedido_id: int,
+        limite: Optional[int] = None
+    ) -> Dict[TipoEntrega, List[CotizacionResult]]:
+        """
+        Cotiza el contenido de un pedido en todos los tipos de entrega
+
+        Returns:
+            {tipo de entrega: cotizaciones ordenadas por precio}
+        """
+        _, provincia, totales, _ = await self._datos_pedido(pedido_id)
+        tarifas = await self.tarifas()
+        return tarifas.cotizar_tipos(provincia, totales, limite)
+
+    async def cotizar_carrito(
+        self,
+        lineas: Iterable[Tuple[int, int]],
+        tipo_entrega: TipoEntrega,
+        provincia: Optional[str] = None,
+        codigo_postal: Optional[str] = None,
+        limite: Optional[int] = 5
+    ) -> List[CotizacionResult]:
+        """
+        Cotiza un carrito sin necesidad de guardar el pedido
+
+        Args:
+            lineas: Pares (producto_id, cantidad)
+            tipo_entrega: Tipo de entrega solicitado
+            provincia: Provincia de entrega
+            codigo_postal: Código postal de entrega (si no se indica provincia)
+            limite: Número máximo de cotizaciones (None = todas)
+
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+
+        Raises:
+            ValueError: Si el código postal no es válido o algún producto no existe
+        """
+        if not provincia:
+            provincia = provincia_codigo_postal(codigo_postal)
+            if provincia is None:
+                raise ValueError(f"Código postal no válido: {codigo_postal}")
+
+        lineas = list(lineas)
+        totales = await self.en_sesion(
+            lambda session: TransportistaSelector(session).calcular_totales_carrito(lineas)
+        )
+        tarifas = await self.tarifas()
+        return tarifas.cotizar(tipo_entrega, provincia, totales, limite)
+
+    async def cotizar_lote(
+        self,
+        pedido_ids: Iterable[int],
+        limite: Optional[int] = 5
+    ) -> LoteCotizaciones:
+        """
+        Cotiza un lote de pedidos
+
+        La consulta y el cálculo se hacen en el pool, de modo que los lotes
+        grandes tampoco bloquean el bucle de eventos. Los pedidos que no
+        existen no aparecen en el resultado.
+
+        Args:
+            pedido_ids: IDs de los pedidos
+            limite: Número máximo de cotizaciones por pedido (None = todas)
+
+        Returns:
+            LoteCotizaciones con las cotizaciones de cada pedido
+        """
+        pedido_ids = list(pedido_ids)
+        tarifas = await self.tarifas()
+        return await self.en_sesion(
+            lambda session: cotizar_datos(tarifas, datos_pedidos(session, pedido_ids), limite)
+        )
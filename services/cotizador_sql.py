@@ -0,0 +1,172 @@
+"""
+Cotizador SQL por conjuntos
+
+Alternativa al selector para informes y procesos masivos: cotiza todos los
+pedidos con una única sentencia SQL ejecutada dentro de SQLite.
+
+1. Unir cada pedido con los servicios activos de su tipo de entrega
+2. Unir con las tarifas de su provincia, su zona o NACIONAL (por clave
+   normalizada) cuyo rango contiene la cantidad del pedido (columnas del
+   esquema entero)
+3. ROW_NUMBER() por (pedido, servicio) elige la tarifa de provincia sobre
+   la de zona y NACIONAL (y la de menor ID si hay varias)
+4. ROW_NUMBER() por pedido ordena los servicios por precio
+
+Requiere SQLite 3.25 o superior (funciones de ventana) y las columnas
+enteras calculadas (ver DatabaseManager.migrar).
+"""
+
+from typing import Optional, Iterable, Iterator
+
+from sqlalchemy import select, case, func, and_, or_, literal
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from models.models import (
+    Pedido, Transportista, ServicioTransportista, Tarifa, ZonaProvincia, MetodoCalculo
+)
+from models.unidades import desde_entero, FACTORES_METODO
+from models.provincias import CLAVE_NACIONAL
+from services.selector import LoteCotizaciones, orden_precedencia_tarifas
+
+
+class CotizadorSQL:
+    """Cotiza pedidos con una sentencia SQL con funciones de ventana"""
+
+    def __init__(self, session: Session):
+        """
+        Inicializa el cotizador
+
+        Args:
+            session: Sesión de base de datos
+        """
+        self.session = session
+
+    def construir_consulta(
+        self,
+        pedido_ids: Optional[Iterable[int]] = None,
+        limite: Optional[int] = None
+    ):
+        """
+        Construye la sentencia de cotización por conjuntos
+
+        Args:
+            pedido_ids: Pedidos a cotizar (None = todos)
+            limite: Número máximo de cotizaciones por pedido (None = todas)
+
+        Returns:
+            Sentencia SELECT con una fila por cotización, ordenada por
+            pedido y posición
+        """
+        # Cantidad entera del pedido según el método del servicio
+        # (para PALETS la unidad entera es el volumen en cm³)
+        cantidad_ent = case(
+            (ServicioTransportista.metodo_calculo == MetodoCalculo.PESO, Pedido.peso_total_g),
+            else_=Pedido.volumen_total_cm3
+        )
+
+        candidatos = select(
+            Pedido.id.label('pedido_id'),
+            ServicioTransportista.id.label('servicio_id'),
+            ServicioTransportista.tipo_entrega.label('tipo_entrega'),
+            ServicioTransportista.metodo_calculo.label('metodo_calculo'),
+            Transportista.id.label('transportista_id'),
+            Transportista.nombre.label('transportista_nombre'),
+            Tarifa.id.label('tarifa_id'),
+            Tarifa.provincia.label('provincia'),
+            Tarifa.rango_min_ent.label('rango_min_ent'),
+            Tarifa.rango_max_ent.label('rango_max_ent'),
+            Tarifa.precio_cent.label('precio_cent'),
+            cantidad_ent.label('cantidad_ent'),
+            func.row_number().over(
+                partition_by=(Pedido.id, ServicioTransportista.id),
+                order_by=orden_precedencia_tarifas(Pedido.provincia_clave, ZonaProvincia.zona_clave)
+            ).label('precedencia')
+        ).select_from(Pedido).join(
+            ServicioTransportista, and_(
+                ServicioTransportista.tipo_entrega == Pedido.tipo_entrega,
+                ServicioTransportista.activo == True
+            )
+        ).join(
+            Transportista, and_(
+                Transportista.id == ServicioTransportista.transportista_id,
+                Transportista.activo == True
+            )
+        ).outerjoin(
+            ZonaProvincia, and_(
+                ZonaProvincia.servicio_id == ServicioTransportista.id,
+                ZonaProvincia.provincia_clave == Pedido.provincia_clave
+            )
+        ).join(
+            Tarifa, and_(
+                Tarifa.servicio_id == ServicioTransportista.id,
+                Tarifa.provincia_clave.in_([Pedido.provincia_clave, ZonaProvincia.zona_clave, literal(CLAVE_NACIONAL)]),
+                Tarifa.rango_min_ent <= cantidad_ent,
+                or_(Tarifa.rango_max_ent.is_(None), Tarifa.rango_max_ent >= cantidad_ent)
+            )
+        )
+        if pedido_ids is not None:
+            candidatos = candidatos.where(Pedido.id.in_(list(pedido_ids)))
+        candidatos = candidatos.subquery('candidatos')
+
+        ranking = select(
+            candidatos,
+            func.row_number().over(
+                partition_by=candidatos.c.pedido_id,
+                order_by=(candidatos.c.precio_cent, candidatos.c.servicio_id)
+            ).label('posicion')
+        ).where(candidatos.c.precedencia == 1).subquery('ranking')
+
+        stmt = select(ranking).order_by(ranking.c.pedido_id, ranking.c.posicion)
+        if limite is not None:
+            stmt = stmt.where(ranking.c.posicion <= limite)
+        return stmt
+
+    def iterar_filas(
+        self,
+        pedido_ids: Optional[Iterable[int]] = None,
+        limite: Optional[int] = None
+    ) -> Iterator[Row]:
+        """
+        Recorre las cotizaciones como filas (sin crear objetos)
+
+        Args:
+            pedido_ids: Pedidos a cotizar (None = todos)
+            limite: Número máximo de cotizaciones por pedido (None = todas)
+
+        Returns:
+            Iterador de filas con pedido_id, servicio, tarifa, importes
+            enteros y posición
+        """
+        stmt = self.construir_consulta(pedido_ids, limite)
+        return iter(self.session.execute(stmt, execution_options={'yield_per': 10000}))
+
+    def cotizar(
+        self,
+        pedido_ids: Optional[Iterable[int]] = None,
+        limite: Optional[int] = 5
+    ) -> LoteCotizaciones:
+        """
+        Cotiza pedidos con una sola sentencia SQL
+
+        Args:
+            pedido_ids: Pedidos a cotizar (None = todos)
+            limite: Número máximo de cotizaciones por pedido (None = todas)
+
+        Returns:
+            LoteCotizaciones con el mismo orden que el selector
+        """
+        lote = LoteCotizaciones()
+        for fila in self.iterar_filas(pedido_ids, limite):
+            factor = FACTORES_METODO[fila.metodo_calculo]
+            lote.agregar_fila(
+                fila.pedido_id,
+                (fila.servicio_id, fila.transportista_id, fila.transportista_nombre,
+                 fila.tipo_entrega.value, fila.metodo_calculo.value),
+                (fila.tarifa_id, fila.provincia,
+                 desde_entero(fila.rango_min_ent, factor),
+                 desde_entero(fila.rango_max_ent, factor)),
+                fila.precio_cent,
+                desde_entero(fila.cantidad_ent, factor)
+            )
+        return lote
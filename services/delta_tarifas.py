@@ -0,0 +1,124 @@
+"""
+Cambios de tarifas desde una secuencia del registro de cambios
+
+Resume el registro de cambios (database/registro_cambios.py) en una fila
+por tarifa con su estado final y la operación a aplicar (alta, modificación
+o baja), en el formato COLUMNAS_DELTA que acepta el importador. Así basta
+con intercambiar los cambios del día en lugar del archivo completo.
+
+Las tarifas creadas y eliminadas dentro del mismo periodo no aparecen.
+"""
+
+from typing import List, Optional, Dict, Tuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import Transportista, ServicioTransportista, Tarifa
+from database.registro_cambios import cambios_desde, ultima_secuencia
+from services.importacion_tarifas import (
+    nombre_servicio, OPERACION_ALTA, OPERACION_MODIFICACION, OPERACION_BAJA
+)
+
+
+@dataclass
+class DeltaTarifas:
+    """Cambios de tarifas de un periodo, listos para exportar"""
+    secuencia_inicial: int
+    secuencia_final: int  # Usar como secuencia_inicial de la siguiente exportación
+    filas: List[tuple] = field(default_factory=list)  # En el orden de COLUMNAS_DELTA
+    omitidas: int = 0  # Bajas de servicios que ya no existen
+
+    def contar_por_operacion(self) -> Dict[str, int]:
+        contadores: Dict[str, int] = {}
+        for fila in self.filas:
+            contadores[fila[-1]] = contadores.get(fila[-1], 0) + 1
+        return contadores
+
+
+def _decimal(numero) -> Optional[Decimal]:
+    """Importe exacto (los datos del registro de cambios llegan como número JSON)"""
+    return Decimal(str(numero)) if numero is not None else None
+
+
+def cambios_tarifas(
+    session: Session,
+    secuencia: int = 0,
+    desde: Optional[datetime] = None
+) -> DeltaTarifas:
+    """
+    Obtiene las tarifas creadas, modificadas o eliminadas desde una secuencia
+
+    Args:
+        session: Sesión de base de datos
+        secuencia: Última secuencia ya exportada (0 = desde el principio del registro)
+        desde: Si se indica, solo los cambios a partir de ese momento
+
+    Returns:
+        DeltaTarifas con una fila por tarifa cambiada
+    """
+    delta = DeltaTarifas(secuencia, ultima_secuencia(session))
+
+    # Primera operación y último estado registrado de cada tarifa
+    primera: Dict[int, str] = {}
+    ultimo: Dict[int, Tuple[str, dict]] = {}
+    for cambio in cambios_desde(session, secuencia, tablas=[Tarifa.__tablename__], desde=desde):
+        if cambio.secuencia > delta.secuencia_final:
+            break
+        primera.setdefault(cambio.fila_id, cambio.operacion)
+        ultimo[cambio.fila_id] = (cambio.operacion, cambio.datos)
+    if not ultimo:
+        return delta
+
+    # Datos de los servicios de las tarifas cambiadas
+    servicio_ids = {datos['servicio_id'] for _, datos in ultimo.values()}
+    servicios = {
+        servicio_id: (transportista, tipo_entrega, metodo)
+        for servicio_id, transportista, tipo_entrega, metodo in session.execute(
+            select(
+                ServicioTransportista.id, Transportista.nombre,
+                ServicioTransportista.tipo_entrega, ServicioTransportista.metodo_calculo
+            ).join(Transportista).where(ServicioTransportista.id.in_(servicio_ids))
+        )
+    }
+
+    # Estado actual de las tarifas que siguen existiendo
+    actuales = {
+        tarifa.id: tarifa
+        for tarifa in session.query(Tarifa).filter(
+            Tarifa.id.in_([tarifa_id for tarifa_id, (operacion, _) in ultimo.items() if operacion != 'delete'])
+        )
+    }
+
+    for tarifa_id in sorted(ultimo):
+        operacion, datos = ultimo[tarifa_id]
+        if operacion == 'delete':
+            if primera[tarifa_id] == 'insert':
+                continue  # Creada y eliminada en el periodo
+            operacion_delta = OPERACION_BAJA
+            valores = (datos['servicio_id'], datos['provincia'], datos['rango_min'],
+                       datos['rango_max'], datos['precio_fijo'])
+        else:
+            tarifa = actuales.get(tarifa_id)
+            if tarifa is None:
+                continue
+            operacion_delta = OPERACION_ALTA if primera[tarifa_id] == 'insert' else OPERACION_MODIFICACION
+            valores = (tarifa.servicio_id, tarifa.provincia, tarifa.rango_min,
+                       tarifa.rango_max, tarifa.precio_fijo)
+
+        servicio_id, provincia, rango_min, rango_max, precio_fijo = valores
+        if servicio_id not in servicios:
+            delta.omitidas += 1
+            continue
+        transportista, tipo_entrega, metodo = servicios[servicio_id]
+        delta.filas.append((
+            tarifa_id, transportista, nombre_servicio(tipo_entrega, metodo),
+            tipo_entrega.value, metodo.value, provincia,
+            _decimal(rango_min), _decimal(rango_max) if rango_max is not None else "",
+            _decimal(precio_fijo), operacion_delta
+        ))
+
+    return delta
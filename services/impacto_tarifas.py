@@ -0,0 +1,273 @@
+"""
+Análisis de impacto de cambios de tarifas
+
+Tras importar o corregir tarifas, determina qué pedidos pueden ver cambiada
+su cotización sin recalcular todos los pedidos:
+
+1. Construir un índice de totales de pedido por (tipo_entrega, provincia)
+   con las cantidades ordenadas para cada método de cálculo
+2. Para cada tarifa modificada (servicio, provincia, rango), buscar por
+   bisección los pedidos cuya cantidad cae dentro del rango (las tarifas
+   de una zona afectan a todas sus provincias)
+3. Recotizar solo esos pedidos y comparar el mejor transportista anterior
+   con el nuevo
+"""
+
+from typing import List, Optional, Dict, Iterable, Set, Tuple
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from models.models import (
+    Pedido, ServicioTransportista, EstadoCotizacion, TipoEntrega, MetodoCalculo
+)
+from models.provincias import clave_provincia, CLAVE_NACIONAL
+from database.versiones import obtener_version
+from services.selector import CotizacionResult
+from services.cotizaciones_materializadas import CotizacionesMaterializadas
+from services.zonas import MapaZonas
+
+
+@dataclass
+class CambioTarifa:
+    """Tarifa creada, modificada o eliminada"""
+    servicio_id: int
+    provincia: str
+    rango_min: Decimal
+    rango_max: Optional[Decimal]  # None = infinito
+
+
+@dataclass
+class CambioGanador:
+    """Pedido cuyo transportista más económico ha cambiado"""
+    pedido_id: int
+    anterior: Optional[CotizacionResult]
+    nuevo: Optional[CotizacionResult]
+
+
+@dataclass
+class ResultadoImpacto:
+    """Resultado del análisis de impacto de un conjunto de cambios"""
+    pedidos_afectados: List[int] = field(default_factory=list)
+    cambios_ganador: List[CambioGanador] = field(default_factory=list)
+    pedidos_actualizados: int = 0  # Pedidos no afectados marcados con la nueva versión
+
+
+class IndiceTotalesPedidos:
+    """
+    Índice en memoria de los totales de los pedidos
+
+    Para cada (tipo_entrega, clave de provincia) y método de cálculo guarda
+    las cantidades ordenadas junto con los IDs de pedido, de modo que los
+    pedidos dentro de un rango se obtienen por bisección.
+    """
+
+    def __init__(self):
+        # (tipo_entrega, provincia, metodo) -> (cantidades ordenadas, pedido_ids)
+        self._indice: Dict[Tuple[TipoEntrega, str, MetodoCalculo], Tuple[List[Decimal], List[int]]] = {}
+        # tipo_entrega -> provincias con pedidos
+        self._provincias: Dict[TipoEntrega, Set[str]] = {}
+
+    @classmethod
+    def desde_base_datos(cls, session: Session) -> 'IndiceTotalesPedidos':
+        """
+        Construye el índice a partir de los totales desnormalizados de los pedidos
+
+        Args:
+            session: Sesión de base de datos
+
+        Returns:
+            Índice con los totales de todos los pedidos
+        """
+        stmt = select(
+            Pedido.id,
+            Pedido.tipo_entrega,
+            Pedido.provincia_clave,
+            Pedido.peso_total,
+            Pedido.volumen_total,
+            Pedido.palets_total
+        ).where(Pedido.peso_total.is_not(None))
+
+        indice = cls()
+        for pedido_id, tipo_entrega, provincia, peso, volumen, palets in session.execute(stmt):
+            indice.agregar(pedido_id, tipo_entrega, provincia, {
+                'peso_total': peso,
+                'volumen_total': volumen,
+                'palets_total': palets
+            })
+        indice.ordenar()
+        return indice
+
+    def agregar(self, pedido_id: int, tipo_entrega: TipoEntrega, provincia: str, totales: Dict[str, Decimal]):
+        """
+        Añade un pedido al índice (llamar a ordenar() tras añadir todos)
+
+        Args:
+            pedido_id: ID del pedido
+            tipo_entrega: Tipo de entrega del pedido
+            provincia: Provincia de entrega (nombre o clave)
+            totales: Totales del pedido (peso_total, volumen_total, palets_total)
+        """
+        provincia = clave_provincia(provincia)
+        cantidades = {
+            MetodoCalculo.PESO: totales['peso_total'],
+            MetodoCalculo.VOLUMEN: totales['volumen_total'],
+            MetodoCalculo.PALETS: totales['palets_total']
+        }
+        for metodo, cantidad in cantidades.items():
+            valores, ids = self._indice.setdefault((tipo_entrega, provincia, metodo), ([], []))
+            valores.append(cantidad)
+            ids.append(pedido_id)
+        self._provincias.setdefault(tipo_entrega, set()).add(provincia)
+
+    def ordenar(self):
+        """Ordena las cantidades de cada entrada del índice"""
+        for clave, (valores, ids) in self._indice.items():
+            pares = sorted(zip(valores, ids))
+            self._indice[clave] = ([v for v, _ in pares], [i for _, i in pares])
+
+    def pedidos_en_rango(
+        self,
+        tipo_entrega: TipoEntrega,
+        provincia: str,
+        metodo: MetodoCalculo,
+        rango_min: Decimal,
+        rango_max: Optional[Decimal]
+    ) -> List[int]:
+        """
+        Obtiene los pedidos cuya cantidad cae en el rango [rango_min, rango_max]
+
+        Una provincia NACIONAL abarca los pedidos de todas las provincias.
+
+        Args:
+            tipo_entrega: Tipo de entrega del servicio
+            provincia: Provincia de la tarifa o NACIONAL
+            metodo: Método de cálculo del servicio
+            rango_min: Mínimo del rango
+            rango_max: Máximo del rango (None = infinito)
+
+        Returns:
+            Lista de IDs de pedidos
+        """
+        provincia = clave_provincia(provincia)
+        if provincia == CLAVE_NACIONAL:
+            provincias = self._provincias.get(tipo_entrega, set())
+        else:
+            provincias = [provincia]
+
+        pedido_ids = []
+        for prov in provincias:
+            valores, ids = self._indice.get((tipo_entrega, prov, metodo), ([], []))
+            inicio = bisect_left(valores, rango_min)
+            fin = len(valores) if rango_max is None else bisect_right(valores, rango_max)
+            pedido_ids.extend(ids[inicio:fin])
+        return pedido_ids
+
+
+class AnalizadorImpacto:
+    """Determina y recotiza los pedidos afectados por cambios de tarifas"""
+
+    def __init__(self, session: Session):
+        """
+        Inicializa el analizador
+
+        Args:
+            session: Sesión de base de datos
+        """
+        self.session = session
+        self.materializadas = CotizacionesMaterializadas(session)
+
+    def pedidos_afectados(
+        self,
+        cambios: Iterable[CambioTarifa],
+        indice: Optional[IndiceTotalesPedidos] = None
+    ) -> List[int]:
+        """
+        Obtiene los pedidos cuya cotización puede cambiar
+
+        Args:
+            cambios: Tarifas creadas, modificadas o eliminadas
+            indice: Índice de totales (si es None, se construye)
+
+        Returns:
+            Lista ordenada de IDs de pedidos afectados
+        """
+        cambios = list(cambios)
+        if not cambios:
+            return []
+        if indice is None:
+            indice = IndiceTotalesPedidos.desde_base_datos(self.session)
+
+        servicio_ids = {cambio.servicio_id for cambio in cambios}
+        servicios = {
+            servicio_id: (tipo_entrega, metodo)
+            for servicio_id, tipo_entrega, metodo in self.session.execute(
+                select(
+                    ServicioTransportista.id,
+                    ServicioTransportista.tipo_entrega,
+                    ServicioTransportista.metodo_calculo
+                ).where(ServicioTransportista.id.in_(servicio_ids))
+            )
+        }
+
+        zonas = MapaZonas.desde_base_datos(self.session)
+        afectados: Set[int] = set()
+        for cambio in cambios:
+            if cambio.servicio_id not in servicios:
+                continue
+            tipo_entrega, metodo = servicios[cambio.servicio_id]
+            provincias = zonas.provincias(cambio.servicio_id, cambio.provincia) or [cambio.provincia]
+            for provincia in provincias:
+                afectados.update(indice.pedidos_en_rango(
+                    tipo_entrega, provincia, metodo, cambio.rango_min, cambio.rango_max
+                ))
+        return sorted(afectados)
+
+    def recotizar_afectados(
+        self,
+        cambios: Iterable[CambioTarifa],
+        version_anterior: Optional[int] = None
+    ) -> ResultadoImpacto:
+        """
+        Recotiza solo los pedidos afectados y detecta cambios de transportista
+
+        Si se indica la versión de tarifas anterior a los cambios, los pedidos
+        no afectados cuyas cotizaciones estaban al día con esa versión se
+        marcan con la versión actual sin recalcularlos.
+
+        Args:
+            cambios: Tarifas creadas, modificadas o eliminadas
+            version_anterior: Versión de tarifas antes de aplicar los cambios
+
+        Returns:
+            ResultadoImpacto con los pedidos afectados y los cambios de ganador
+        """
+        resultado = ResultadoImpacto()
+        resultado.pedidos_afectados = self.pedidos_afectados(cambios)
+        afectados = resultado.pedidos_afectados
+
+        anteriores = self.materializadas.obtener_cotizaciones(afectados, refrescar=False)
+        self.materializadas.recotizar(afectados)
+        nuevas = self.materializadas.obtener_cotizaciones(afectados, refrescar=False)
+
+        for pedido_id in afectados:
+            anterior = anteriores[pedido_id][0] if anteriores[pedido_id] else None
+            nuevo = nuevas[pedido_id][0] if nuevas[pedido_id] else None
+            if (anterior is None) != (nuevo is None) or (
+                anterior is not None and anterior.servicio_id != nuevo.servicio_id
+            ):
+                resultado.cambios_ganador.append(CambioGanador(pedido_id, anterior, nuevo))
+
+        if version_anterior is not None:
+            # Los afectados ya tienen la versión actual: solo quedan los no afectados
+            stmt = update(EstadoCotizacion).where(
+                EstadoCotizacion.version_tarifas == version_anterior
+            ).values(version_tarifas=obtener_version(self.session))
+            resultado.pedidos_actualizados = self.session.execute(
+                stmt, execution_options={'synchronize_session': False}
+            ).rowcount
+
+        return resultado
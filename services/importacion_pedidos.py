@@ -0,0 +1,381 @@
+"""
+Importación masiva de pedidos desde CSV, JSONL o Excel
+
+Los archivos se leen fila a fila y los pedidos se insertan por bloques, cada
+uno en su propia transacción, por lo que la memoria no depende del tamaño
+del archivo:
+
+- CSV y Excel: una fila por línea de pedido con las columnas
+  COLUMNAS_PEDIDOS. Las filas consecutivas con el mismo número de pedido (o
+  con el número vacío) son líneas del mismo pedido; los datos de cabecera
+  (provincia, código postal, tipo de entrega) se toman de la primera fila
+- JSONL: un pedido por línea con sus líneas anidadas:
+  {"numero_pedido": "P-1", "provincia": "Madrid", "codigo_postal": null,
+   "tipo_entrega": "pie_calle", "lineas": [{"producto": "MES001", "cantidad": 2}]}
+  Cada línea es un pedido distinto: sin número se rechaza y con un número
+  repetido se rechaza como pedido repetido
+
+Los productos se resuelven con un diccionario de códigos cargado al
+empezar. Los pedidos con errores (producto desconocido, provincia o tipo
+de entrega no válidos, número ya existente) se rechazan sin detener la
+importación. Como cada bloque se confirma al insertarse, volver a importar
+un archivo interrumpido solo añade los pedidos que faltan.
+
+Ejemplo:
+    resumen = ImportadorPedidos(session, cotizar=True).importar(leer_csv_pedidos("pedidos.csv"))
+"""
+
+from typing import List, Optional, Iterable, Iterator, Sequence, Tuple, Dict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import json
+
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from models.models import Pedido, PedidoProducto, Producto, TipoEntrega
+from models.provincias import (
+    clave_provincia, nombre_provincia, provincia_conocida, provincia_codigo_postal,
+    normalizar_codigo_postal, CLAVE_NACIONAL
+)
+from database.totales import recalcular_totales_pedidos, hash_contenido
+from services.cotizaciones_materializadas import CotizacionesMaterializadas
+from services.lectura_archivos import leer_csv, leer_excel, EXCEL_DISPONIBLE
+
+
+# Columnas del formato de pedidos (CSV y Excel)
+COLUMNAS_PEDIDOS = ["Pedido", "Provincia", "Código Postal", "Tipo Entrega", "Producto", "Cantidad"]
+
+# Pedidos insertados (y confirmados) en cada transacción
+TAMANO_BLOQUE = 5000
+
+# Números de pedido por consulta de existentes (límite de parámetros de SQLite)
+TAMANO_CONSULTA = 500
+
+# Errores detallados que se guardan en el resumen (el resto solo se cuentan)
+MAX_ERRORES = 1000
+
+# Unidades como máximo por línea de pedido
+MAX_CANTIDAD = 1000000
+
+
+@dataclass
+class ResumenImportacionPedidos:
+    """Resumen de una importación de pedidos"""
+    pedidos: int = 0
+    lineas: int = 0
+    rechazados: int = 0
+    cotizados: int = 0
+    errores: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PedidoLeido:
+    """Pedido agrupado a partir de las filas del archivo (o leído de una línea JSONL)"""
+    fila: int
+    numero_pedido: str
+    provincia: Optional[str]
+    codigo_postal: Optional[str]
+    tipo_entrega: Optional[str]
+    lineas: List[Tuple[int, object, object]] = field(default_factory=list)  # (fila, producto, cantidad)
+
+
+def _texto(valor) -> Optional[str]:
+    """Convierte un valor de celda a texto sin espacios (None si está vacío)"""
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _cantidad(valor) -> int:
+    """
+    Convierte una cantidad de celda a entero positivo (admite 2.0 de hojas de cálculo)
+
+    Raises:
+        ValueError: Si no es un entero entre 1 y MAX_CANTIDAD
+        InvalidOperation: Si no es un número
+    """
+    if isinstance(valor, int):
+        cantidad = valor
+    else:
+        numero = Decimal(str(valor).strip())
+        if not numero.is_finite() or not 0 < numero <= MAX_CANTIDAD or numero != numero.to_integral_value():
+            raise ValueError(valor)
+        cantidad = int(numero)
+    if not 0 < cantidad <= MAX_CANTIDAD:
+        raise ValueError(valor)
+    return cantidad
+
+
+def _tipo_entrega(valor: str) -> TipoEntrega:
+    """Obtiene el tipo de entrega por su valor ("pie_calle") o su nombre ("PIE_CALLE")"""
+    try:
+        return TipoEntrega(valor.lower())
+    except ValueError:
+        return TipoEntrega[valor.upper()]
+
+
+class ImportadorPedidos:
+    """Inserta pedidos y sus líneas por bloques con sentencias masivas"""
+
+    def __init__(
+        self,
+        session: Session,
+        tamano_bloque: int = TAMANO_BLOQUE,
+        cotizar: bool = False,
+        limite_cotizaciones: Optional[int] = None
+    ):
+        """
+        Inicializa el importador y carga los códigos de producto
+
+        Args:
+            session: Sesión de base de datos (se confirma tras cada bloque)
+            tamano_bloque: Pedidos por transacción
+            cotizar: Si es True, materializa las cotizaciones de cada bloque al insertarlo
+            limite_cotizaciones: Cotizaciones guardadas por pedido (None = todas)
+        """
+        self.session = session
+        self.tamano_bloque = tamano_bloque
+        self.cotizaciones = CotizacionesMaterializadas(session, limite_cotizaciones) if cotizar else None
+        self.productos: Dict[str, int] = dict(session.execute(select(Producto.codigo, Producto.id)).all())
+
+    def _agrupar(self, filas: Iterable) -> Iterator[PedidoLeido]:
+        """Agrupa las filas consecutivas de cada pedido (los PedidoLeido se devuelven tal cual)"""
+        pedido = None
+        for fila in filas:
+            if isinstance(fila, PedidoLeido):
+                if pedido is not None:
+                    yield pedido
+                    pedido = None
+                yield fila
+                continue
+            num_fila, valores = fila
+            numero, provincia, codigo_postal, tipo_entrega, producto, cantidad = (list(valores) + [None] * 6)[:6]
+            numero = _texto(numero)
+            if pedido is None or (numero is not None and numero != pedido.numero_pedido):
+                if pedido is not None:
+                    yield pedido
+                pedido = PedidoLeido(
+                    num_fila, numero, _texto(provincia), _texto(codigo_postal), _texto(tipo_entrega)
+                )
+            pedido.lineas.append((num_fila, producto, cantidad))
+        if pedido is not None:
+            yield pedido
+
+    def _validar(self, pedido: PedidoLeido) -> Tuple[Optional[dict], Optional[List[tuple]], Optional[str]]:
+        """
+        Valida un pedido leído y lo convierte en registros de pedido y líneas
+
+        Returns:
+            (registro del pedido, líneas (producto_id, cantidad), error)
+        """
+        if pedido.numero_pedido is None:
+            return None, None, f"Fila {pedido.fila}: Falta el número de pedido"
+        prefijo = f"Fila {pedido.fila} (pedido {pedido.numero_pedido})"
+
+        if pedido.tipo_entrega is None:
+            return None, None, f"{prefijo}: Falta el tipo de entrega"
+        try:
+            tipo_entrega = _tipo_entrega(pedido.tipo_entrega)
+        except KeyError:
+            return None, None, f"{prefijo}: Tipo de entrega '{pedido.tipo_entrega}' inválido"
+
+        codigo_postal = None
+        if pedido.codigo_postal is not None:
+            codigo_postal = normalizar_codigo_postal(pedido.codigo_postal)
+            if codigo_postal is None:
+                return None, None, f"{prefijo}: Código postal '{pedido.codigo_postal}' no válido"
+        if pedido.provincia is not None:
+            if not provincia_conocida(pedido.provincia) or clave_provincia(pedido.provincia) == CLAVE_NACIONAL:
+                return None, None, f"{prefijo}: Provincia '{pedido.provincia}' desconocida"
+            provincia = nombre_provincia(pedido.provincia)
+        elif codigo_postal is not None:
+            provincia = provincia_codigo_postal(codigo_postal)
+        else:
+            return None, None, f"{prefijo}: Falta la provincia o el código postal"
+
+        lineas = []
+        for num_fila, producto, cantidad in pedido.lineas:
+            codigo = _texto(producto)
+            if codigo is None:
+                return None, None, f"Fila {num_fila} (pedido {pedido.numero_pedido}): Falta el producto"
+            producto_id = self.productos.get(codigo)
+            if producto_id is None:
+                return None, None, f"Fila {num_fila} (pedido {pedido.numero_pedido}): Producto '{codigo}' desconocido"
+            try:
+                lineas.append((producto_id, _cantidad(cantidad if cantidad is not None else 1)))
+            except (ValueError, InvalidOperation):
+                return None, None, f"Fila {num_fila} (pedido {pedido.numero_pedido}): Cantidad '{cantidad}' inválida"
+
+        registro = {
+            'numero_pedido': pedido.numero_pedido,
+            'provincia_entrega': provincia,
+            'provincia_clave': clave_provincia(provincia),
+            'codigo_postal': codigo_postal,
+            'tipo_entrega': tipo_entrega,
+            'hash_contenido': hash_contenido(lineas),
+        }
+        return registro, lineas, None
+
+    def _numeros_existentes(self, numeros: List[str]) -> set:
+        """Números de pedido que ya existen en la base de datos"""
+        existentes = set()
+        for inicio in range(0, len(numeros), TAMANO_CONSULTA):
+            existentes.update(self.session.execute(
+                select(Pedido.numero_pedido).where(
+                    Pedido.numero_pedido.in_(numeros[inicio:inicio + TAMANO_CONSULTA])
+                )
+            ).scalars())
+        return existentes
+
+    def _insertar_bloque(self, bloque: List[Tuple[int, dict, List[tuple]]], resumen: ResumenImportacionPedidos):
+        """Inserta un bloque de pedidos válidos con sus líneas y confirma la transacción"""
+        existentes = self._numeros_existentes([registro['numero_pedido'] for _, registro, _ in bloque])
+        registros, lineas_por_numero = [], {}
+        ahora = datetime.now()
+        for fila, registro, lineas in bloque:
+            if registro['numero_pedido'] in existentes:
+                self._rechazar(resumen, f"Fila {fila} (pedido {registro['numero_pedido']}): El pedido ya existe")
+                continue
+            registro['fecha'] = ahora
+            registros.append(registro)
+            lineas_por_numero[registro['numero_pedido']] = lineas
+
+        if registros:
+            pedidos = Pedido.__table__
+            ids = dict(self.session.execute(
+                insert(pedidos).returning(pedidos.c.numero_pedido, pedidos.c.id), registros
+            ).all())
+            self.session.execute(insert(PedidoProducto.__table__), [
+                {'pedido_id': ids[numero], 'producto_id': producto_id, 'cantidad': cantidad}
+                for numero, lineas in lineas_por_numero.items()
+                for producto_id, cantidad in lineas
+            ])
+            pedido_ids = list(ids.values())
+            recalcular_totales_pedidos(self.session, pedido_ids, hashes=False)
+            if self.cotizaciones is not None:
+                resumen.cotizados += self.cotizaciones.recotizar(pedido_ids)
+            resumen.pedidos += len(registros)
+            resumen.lineas += sum(len(lineas) for lineas in lineas_por_numero.values())
+        self.session.commit()
+
+    @staticmethod
+    def _rechazar(resumen: ResumenImportacionPedidos, error: str):
+        resumen.rechazados += 1
+        if len(resumen.errores) < MAX_ERRORES:
+            resumen.errores.append(error)
+
+    def importar(self, filas: Iterable) -> ResumenImportacionPedidos:
+        """
+        Importa los pedidos de un archivo por bloques
+
+        Args:
+            filas: Iterable de (número de fila, valores en el orden de
+                COLUMNAS_PEDIDOS), p. ej. leer_csv_pedidos(), o de pedidos
+                ya agrupados (PedidoLeido), p. ej. leer_jsonl_pedidos()
+
+        Returns:
+            ResumenImportacionPedidos con los pedidos insertados y rechazados
+        """
+        resumen = ResumenImportacionPedidos()
+        bloque = []
+        numeros_bloque = set()
+        for pedido in self._agrupar(filas):
+            registro, lineas, error = self._validar(pedido)
+            if error is None and registro['numero_pedido'] in numeros_bloque:
+                error = f"Fila {pedido.fila} (pedido {pedido.numero_pedido}): Pedido repetido en el archivo"
+            if error is not None:
+                self._rechazar(resumen, error)
+                continue
+            bloque.append((pedido.fila, registro, lineas))
+            numeros_bloque.add(registro['numero_pedido'])
+            if len(bloque) >= self.tamano_bloque:
+                self._insertar_bloque(bloque, resumen)
+                bloque = []
+                numeros_bloque = set()
+        if bloque:
+            self._insertar_bloque(bloque, resumen)
+        return resumen
+
+
+# ---------------------------------------------------------------------------
+# Lectura de archivos
+# ---------------------------------------------------------------------------
+
+def leer_csv_pedidos(ruta: str) -> Iterator[Tuple[int, list]]:
+    """
+    Lee un archivo CSV de pedidos para ImportadorPedidos.importar()
+
+    Raises:
+        ValueError: Si los encabezados no son COLUMNAS_PEDIDOS
+    """
+    return leer_csv(ruta, COLUMNAS_PEDIDOS)
+
+
+def leer_jsonl_pedidos(ruta: str) -> Iterator[PedidoLeido]:
+    """
+    Lee un archivo JSONL de pedidos (un pedido por línea con sus líneas anidadas)
+
+    Cada línea del archivo es un pedido independiente: a diferencia del CSV,
+    un número vacío o igual al anterior no continúa el pedido anterior.
+
+    Args:
+        ruta: Ruta del archivo
+
+    Yields:
+        PedidoLeido de cada línea (con el número de línea como fila)
+
+    Raises:
+        ValueError: Si una línea no es un objeto JSON válido
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        for num_linea, texto in enumerate(archivo, 1):
+            if not texto.strip():
+                continue
+            try:
+                pedido = json.loads(texto)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {num_linea} de '{ruta}': JSON no válido ({e})")
+            if not isinstance(pedido, dict):
+                raise ValueError(f"Línea {num_linea} de '{ruta}': se esperaba un objeto JSON")
+            leido = PedidoLeido(
+                num_linea, _texto(pedido.get('numero_pedido')), _texto(pedido.get('provincia')),
+                _texto(pedido.get('codigo_postal')), _texto(pedido.get('tipo_entrega'))
+            )
+            # Un pedido sin líneas se devuelve con una línea sin producto (y se rechaza)
+            for linea in pedido.get('lineas') or [{}]:
+                if not isinstance(linea, dict):
+                    linea = {}
+                leido.lineas.append((num_linea, linea.get('producto'), linea.get('cantidad')))
+            yield leido
+
+
+def leer_excel_pedidos(ruta: str) -> Iterator[Tuple[int, tuple]]:
+    """
+    Lee la primera hoja de un Excel de pedidos para ImportadorPedidos.importar()
+
+    Raises:
+        ValueError: Si los encabezados no son COLUMNAS_PEDIDOS
+    """
+    return leer_excel(ruta, COLUMNAS_PEDIDOS)
+
+
+def leer_pedidos(ruta: str) -> Iterator:
+    """
+    Lee un archivo de pedidos según su extensión (.csv, .jsonl o Excel)
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        Iterador de (número de fila, valores) o de PedidoLeido (JSONL) para
+        ImportadorPedidos.importar()
+    """
+    extension = ruta.lower().rsplit('.', 1)[-1]
+    if extension == 'csv':
+        return leer_csv_pedidos(ruta)
+    if extension in ('jsonl', 'ndjson'):
+        return leer_jsonl_pedidos(ruta)
+    return leer_excel_pedidos(ruta)
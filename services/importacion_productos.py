@@ -0,0 +1,235 @@
+"""
+Importación del catálogo de productos (upsert por código)
+
+Las filas del archivo se procesan por bloques:
+
+1. Se comparan con los productos existentes del bloque (una consulta por
+   cada 500 códigos) para clasificarlas en nuevas, con medidas cambiadas,
+   solo renombradas o sin cambios
+2. Las nuevas y las cambiadas se escriben con INSERT ... ON CONFLICT(codigo)
+   DO UPDATE, calculando también las columnas del esquema entero
+3. Al terminar, los pedidos con líneas de productos cuyo peso o volumen ha
+   cambiado recalculan sus totales y sus cotizaciones materializadas se
+   marcan como obsoletas (o se recotizan si se indica)
+
+Todo se hace en la transacción de la sesión: el llamador confirma o
+deshace la importación completa.
+
+Ejemplo:
+    resumen = ImportadorProductos(session).importar(leer_productos("catalogo.csv"))
+"""
+
+from typing import List, Optional, Iterable, Iterator, Sequence, Tuple, Dict, Set
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models.models import Producto, PedidoProducto, EstadoCotizacion
+from models.unidades import a_entero, FACTOR_PESO, FACTOR_VOLUMEN
+from database.totales import recalcular_totales_pedidos
+from services.cotizaciones_materializadas import CotizacionesMaterializadas
+from services.lectura_archivos import leer_csv, leer_excel
+
+
+# Columnas del formato del catálogo (CSV y Excel)
+COLUMNAS_PRODUCTOS = ["Código", "Nombre", "Peso (kg)", "Volumen (m³)"]
+
+# Filas procesadas por bloque
+TAMANO_BLOQUE = 5000
+
+# Códigos o IDs por consulta (límite de parámetros de SQLite)
+TAMANO_CONSULTA = 500
+
+# Valores máximos de las columnas Numeric(10, 2) y Numeric(10, 4) del producto
+MAX_PESO_KG = Decimal('99999999.99')
+MAX_VOLUMEN_M3 = Decimal('999999.9999')
+
+
+@dataclass
+class ResumenCatalogo:
+    """Resumen de una importación del catálogo de productos"""
+    nuevos: int = 0
+    actualizados: int = 0  # Peso o volumen cambiados
+    renombrados: int = 0  # Solo cambia el nombre
+    sin_cambios: int = 0
+    errores: List[str] = field(default_factory=list)
+    productos_modificados: List[int] = field(default_factory=list)  # IDs con peso o volumen cambiados
+    pedidos_afectados: List[int] = field(default_factory=list)  # Pedidos con totales recalculados
+    pedidos_recotizados: int = 0
+
+
+def _bloques(valores: List) -> Iterator[List]:
+    for inicio in range(0, len(valores), TAMANO_CONSULTA):
+        yield valores[inicio:inicio + TAMANO_CONSULTA]
+
+
+class ImportadorProductos:
+    """Actualiza el catálogo de productos con upserts masivos"""
+
+    def __init__(self, session: Session, tamano_bloque: int = TAMANO_BLOQUE):
+        """
+        Inicializa el importador
+
+        Args:
+            session: Sesión de base de datos
+            tamano_bloque: Filas procesadas por bloque
+        """
+        self.session = session
+        self.tamano_bloque = tamano_bloque
+        self.productos = Producto.__table__
+
+    @staticmethod
+    def _convertir_fila(num_fila: int, valores: Sequence) -> Tuple[Optional[dict], Optional[str]]:
+        """Valida una fila y la convierte en registro de producto"""
+        codigo, nombre, peso_kg, volumen_m3 = (list(valores) + [None] * 4)[:4]
+        codigo = str(codigo).strip() if codigo is not None else ""
+        nombre = str(nombre).strip() if nombre is not None else ""
+        if not codigo or not nombre or peso_kg in (None, "") or volumen_m3 in (None, ""):
+            return None, f"Fila {num_fila}: Faltan datos obligatorios"
+        try:
+            peso_kg = Decimal(str(peso_kg).strip())
+            volumen_m3 = Decimal(str(volumen_m3).strip())
+            # NaN, infinito o fuera del rango de las columnas
+            if not (peso_kg.is_finite() and volumen_m3.is_finite()) or \
+                    abs(peso_kg) > MAX_PESO_KG or abs(volumen_m3) > MAX_VOLUMEN_M3:
+                raise InvalidOperation
+        except InvalidOperation:
+            return None, f"Fila {num_fila} ({codigo}): Valores numéricos inválidos"
+        if peso_kg < 0 or volumen_m3 < 0:
+            return None, f"Fila {num_fila} ({codigo}): El peso y el volumen no pueden ser negativos"
+        return {
+            'codigo': codigo,
+            'nombre': nombre,
+            'peso_kg': peso_kg,
+            'volumen_m3': volumen_m3,
+            'peso_g': a_entero(peso_kg, FACTOR_PESO),
+            'volumen_cm3': a_entero(volumen_m3, FACTOR_VOLUMEN),
+        }, None
+
+    def _procesar_bloque(self, registros: List[dict], resumen: ResumenCatalogo):
+        """Clasifica un bloque contra los productos existentes y escribe los cambios"""
+        existentes: Dict[str, tuple] = {}
+        for bloque in _bloques([registro['codigo'] for registro in registros]):
+            for codigo, producto_id, nombre, peso_g, volumen_cm3 in self.session.execute(
+                select(
+                    Producto.codigo, Producto.id, Producto.nombre, Producto.peso_g, Producto.volumen_cm3
+                ).where(Producto.codigo.in_(bloque))
+            ):
+                existentes[codigo] = (producto_id, nombre, peso_g, volumen_cm3)
+
+        cambios = []
+        for registro in registros:
+            actual = existentes.get(registro['codigo'])
+            if actual is None:
+                resumen.nuevos += 1
+            elif (actual[2], actual[3]) != (registro['peso_g'], registro['volumen_cm3']):
+                resumen.actualizados += 1
+                resumen.productos_modificados.append(actual[0])
+            elif actual[1] != registro['nombre']:
+                resumen.renombrados += 1
+            else:
+                resumen.sin_cambios += 1
+                continue
+            cambios.append(registro)
+
+        if cambios:
+            stmt = insert(self.productos)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[self.productos.c.codigo],
+                set_={
+                    columna: stmt.excluded[columna]
+                    for columna in ('nombre', 'peso_kg', 'volumen_m3', 'peso_g', 'volumen_cm3')
+                }
+            )
+            self.session.execute(stmt, cambios)
+
+    def pedidos_con_productos(self, producto_ids: Iterable[int]) -> List[int]:
+        """
+        Obtiene los pedidos con alguna línea de los productos indicados
+
+        Args:
+            producto_ids: IDs de producto
+
+        Returns:
+            IDs de pedido ordenados
+        """
+        pedidos: Set[int] = set()
+        for bloque in _bloques(list(producto_ids)):
+            pedidos.update(self.session.execute(
+                select(PedidoProducto.pedido_id).where(PedidoProducto.producto_id.in_(bloque)).distinct()
+            ).scalars())
+        return sorted(pedidos)
+
+    def importar(
+        self,
+        filas: Iterable[Tuple[int, Sequence]],
+        recotizar: bool = False
+    ) -> ResumenCatalogo:
+        """
+        Importa el catálogo y actualiza los pedidos afectados
+
+        Args:
+            filas: Iterable de (número de fila, valores en el orden de
+                COLUMNAS_PRODUCTOS), p. ej. leer_productos()
+            recotizar: Si es True, recotiza los pedidos afectados; si no,
+                sus cotizaciones materializadas quedan obsoletas
+
+        Returns:
+            ResumenCatalogo con los contadores y los pedidos afectados
+        """
+        resumen = ResumenCatalogo()
+        vistos: Set[str] = set()
+        bloque = []
+        for num_fila, valores in filas:
+            registro, error = self._convertir_fila(num_fila, valores)
+            if error is None and registro['codigo'] in vistos:
+                error = f"Fila {num_fila} ({registro['codigo']}): Código repetido en el archivo"
+            if error is not None:
+                resumen.errores.append(error)
+                continue
+            vistos.add(registro['codigo'])
+            bloque.append(registro)
+            if len(bloque) >= self.tamano_bloque:
+                self._procesar_bloque(bloque, resumen)
+                bloque = []
+        if bloque:
+            self._procesar_bloque(bloque, resumen)
+
+        if not resumen.productos_modificados:
+            return resumen
+
+        # Pedidos cuyos totales (y por tanto cotizaciones) cambian
+        resumen.pedidos_afectados = self.pedidos_con_productos(resumen.productos_modificados)
+        recalcular_totales_pedidos(self.session, resumen.pedidos_afectados)
+        if recotizar:
+            resumen.pedidos_recotizados = CotizacionesMaterializadas(self.session).recotizar(
+                resumen.pedidos_afectados
+            )
+        else:
+            for pedidos in _bloques(resumen.pedidos_afectados):
+                self.session.execute(
+                    delete(EstadoCotizacion).where(EstadoCotizacion.pedido_id.in_(pedidos)),
+                    execution_options={'synchronize_session': False}
+                )
+        return resumen
+
+
+def leer_productos(ruta: str) -> Iterator[Tuple[int, Sequence]]:
+    """
+    Lee un archivo de catálogo según su extensión (.csv o Excel)
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        Iterador de (número de fila, valores) para ImportadorProductos.importar()
+
+    Raises:
+        ValueError: Si los encabezados no son COLUMNAS_PRODUCTOS
+    """
+    if ruta.lower().endswith('.csv'):
+        return leer_csv(ruta, COLUMNAS_PRODUCTOS)
+    return leer_excel(ruta, COLUMNAS_PRODUCTOS)
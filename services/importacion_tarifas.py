@@ -0,0 +1,499 @@
+"""
+Importación de tarifas en dos fases (staging)
+
+1. cargar(): inserta las filas del archivo en la tabla tarifas_staging
+2. analizar(): valida y compara con las tarifas actuales mediante SQL
+   (transportista, servicio, tarifa existente, duplicados y acción a aplicar)
+3. aplicar(): tras la confirmación, vuelve a analizar y aplica las altas,
+   modificaciones y bajas en una única transacción corta
+
+Los archivos de cambios (ver services/delta_tarifas.py) añaden la columna
+"Operación": las filas con operación "baja" eliminan la tarifa con el mismo
+servicio, provincia y rango; el resto se tratan como altas o modificaciones.
+Como el ID puede ser de otra base de datos, las altas se buscan solo por
+combinación y el resto de filas solo se asocian a la tarifa de su ID si
+tiene el mismo servicio y provincia (si no, la fila se rechaza).
+
+Entre el análisis y la confirmación no queda ninguna transacción de
+escritura abierta, por lo que los procesos de cotización no se bloquean
+mientras el operador revisa el resumen.
+"""
+
+from typing import List, Optional, Iterable, Sequence, Tuple
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+import uuid
+
+from sqlalchemy import select, update, insert, delete, exists, and_, or_, func, literal, cast, case, Integer, String
+from sqlalchemy.orm import Session, aliased
+
+from models.models import (
+    Transportista, ServicioTransportista, Tarifa, TarifaStaging, ZonaProvincia,
+    TipoEntrega, MetodoCalculo
+)
+from models.provincias import clave_provincia, nombre_provincia, provincia_conocida
+from models.unidades import FACTOR_PRECIO
+from database.versiones import incrementar_version
+from database.enteros import factor_metodo_sql
+from services.impacto_tarifas import CambioTarifa
+
+
+# Columnas del formato de intercambio de tarifas (Excel, CSV...)
+COLUMNAS_TARIFAS = [
+    "ID", "Transportista", "Servicio", "Tipo Entrega", "Método Cálculo",
+    "Provincia", "Rango Min", "Rango Max", "Precio Fijo"
+]
+
+# Columna opcional con la operación de cada fila (archivos de cambios)
+COLUMNA_OPERACION = "Operación"
+COLUMNAS_DELTA = COLUMNAS_TARIFAS + [COLUMNA_OPERACION]
+
+OPERACION_ALTA = "alta"
+OPERACION_MODIFICACION = "modificación"
+OPERACION_BAJA = "baja"
+
+# Filas insertadas por sentencia al cargar el staging
+TAMANO_BLOQUE = 5000
+
+
+@dataclass
+class ResumenImportacion:
+    """Resumen del análisis de un lote de importación"""
+    lote: str
+    nuevas: int = 0
+    actualizadas: int = 0
+    eliminadas: int = 0
+    sin_cambios: int = 0
+    errores: List[str] = field(default_factory=list)
+
+    @property
+    def hay_cambios(self) -> bool:
+        return self.nuevas > 0 or self.actualizadas > 0 or self.eliminadas > 0
+
+
+def nombre_servicio(tipo_entrega: TipoEntrega, metodo_calculo: MetodoCalculo) -> str:
+    """Nombre descriptivo de un servicio para la columna "Servicio" ("Pie Calle (peso)")"""
+    return f"{tipo_entrega.value.replace('_', ' ').title()} ({metodo_calculo.value})"
+
+
+def _a_decimal(valor) -> Optional[Decimal]:
+    """Convierte un valor de celda a Decimal (None si está vacío)"""
+    if valor is None or valor == "":
+        return None
+    return Decimal(str(valor))
+
+
+class ImportadorTarifas:
+    """Importa tarifas a través de la tabla de staging"""
+
+    def __init__(self, session: Session):
+        """
+        Inicializa el importador
+
+        Args:
+            session: Sesión de base de datos
+        """
+        self.session = session
+        self.staging = TarifaStaging.__table__
+
+    def _convertir_fila(self, lote: str, num_fila: int, valores: Sequence) -> dict:
+        """Valida el formato de una fila y la convierte en registro de staging"""
+        (tarifa_id, transportista, servicio_nombre, tipo_entrega_str, metodo_calculo_str,
+         provincia, rango_min, rango_max, precio_fijo, operacion) = (list(valores) + [None] * 10)[:10]
+
+        registro = {
+            'lote': lote, 'fila': num_fila, 'tarifa_id': None,
+            'transportista': transportista, 'tipo_entrega': None, 'metodo_calculo': None,
+            'provincia': provincia, 'provincia_clave': None,
+            'rango_min': None, 'rango_max': None, 'precio_fijo': None, 'operacion': None,
+            'accion': None, 'error': None
+        }
+
+        operacion = str(operacion).strip().lower() if operacion else OPERACION_MODIFICACION
+        if operacion not in (OPERACION_ALTA, OPERACION_MODIFICACION, "modificacion", OPERACION_BAJA):
+            registro.update(accion='invalida', error=f"Operación '{operacion}' desconocida")
+            return registro
+        es_baja = operacion == OPERACION_BAJA
+        if operacion in (OPERACION_BAJA, OPERACION_ALTA):
+            registro['operacion'] = operacion
+
+        # Validar datos obligatorios (las bajas no necesitan precio)
+        if not all([transportista, servicio_nombre, tipo_entrega_str,
+                    metodo_calculo_str, provincia, rango_min is not None, es_baja or precio_fijo]):
+            registro.update(accion='invalida', error='Faltan datos obligatorios')
+            return registro
+
+        # Nombre oficial y clave normalizada de la provincia ("malaga" -> "Málaga")
+        registro['provincia'] = nombre_provincia(str(provincia))
+        registro['provincia_clave'] = clave_provincia(str(provincia))
+
+        # Convertir enums (se guardan por nombre, igual que en las tablas)
+        try:
+            registro['tipo_entrega'] = TipoEntrega(tipo_entrega_str).name
+            registro['metodo_calculo'] = MetodoCalculo(metodo_calculo_str).name
+        except ValueError:
+            registro.update(accion='invalida', error='Tipo de entrega o método de cálculo inválido')
+            return registro
+
+        try:
+            registro['tarifa_id'] = int(tarifa_id) if tarifa_id not in (None, "") else None
+            registro['rango_min'] = _a_decimal(rango_min)
+            registro['rango_max'] = _a_decimal(rango_max) if rango_max else None
+            registro['precio_fijo'] = _a_decimal(precio_fijo) if precio_fijo not in (None, "") else None
+        except (ValueError, InvalidOperation):
+            registro.update(accion='invalida', error='Valores numéricos inválidos')
+        return registro
+
+    def cargar(self, filas: Iterable[Tuple[int, Sequence]]) -> str:
+        """
+        Carga las filas de un archivo en la tabla de staging
+
+        Args:
+            filas: Iterable de (número de fila, valores en el orden de COLUMNAS_TARIFAS
+                o COLUMNAS_DELTA)
+
+        Returns:
+            Identificador del lote cargado
+        """
+        lote = uuid.uuid4().hex
+        bloque = []
+        for num_fila, valores in filas:
+            bloque.append(self._convertir_fila(lote, num_fila, valores))
+            if len(bloque) >= TAMANO_BLOQUE:
+                self.session.execute(insert(self.staging), bloque)
+                bloque = []
+        if bloque:
+            self.session.execute(insert(self.staging), bloque)
+        return lote
+
+    def analizar(self, lote: str) -> ResumenImportacion:
+        """
+        Valida el lote y determina la acción de cada fila con SQL
+
+        Puede ejecutarse varias veces: el resultado refleja siempre el
+        estado actual de las tarifas.
+
+        Args:
+            lote: Identificador del lote
+
+        Returns:
+            ResumenImportacion con los contadores y errores
+        """
+        st = self.staging
+        transportistas = Transportista.__table__
+        servicios = ServicioTransportista.__table__
+        tarifas = Tarifa.__table__
+        pendientes = and_(st.c.lote == lote, st.c.accion.is_(None))
+
+        # Reiniciar el análisis anterior (los errores de formato se mantienen)
+        self.session.execute(
+            update(st).where(st.c.lote == lote, or_(st.c.accion.is_(None), st.c.accion != 'invalida'))
+            .values(servicio_id=None, tarifa_existente_id=None, accion=None, error=None)
+        )
+
+        # Transportista inexistente
+        self.session.execute(
+            update(st).where(
+                pendientes,
+                ~exists().where(transportistas.c.nombre == st.c.transportista)
+            ).values(
+                accion='error',
+                error=literal("Transportista '") + st.c.transportista + literal("' no encontrado")
+            )
+        )
+
+        # Resolver el servicio (transportista + tipo de entrega + método)
+        self.session.execute(
+            update(st).where(pendientes).values(
+                servicio_id=select(servicios.c.id).join(
+                    transportistas, transportistas.c.id == servicios.c.transportista_id
+                ).where(
+                    transportistas.c.nombre == st.c.transportista,
+                    servicios.c.tipo_entrega == st.c.tipo_entrega,
+                    servicios.c.metodo_calculo == st.c.metodo_calculo
+                ).limit(1).scalar_subquery()
+            )
+        )
+        self.session.execute(
+            update(st).where(pendientes, st.c.servicio_id.is_(None)).values(
+                accion='error',
+                error=literal("Servicio no encontrado para '") + st.c.transportista + literal("'")
+            )
+        )
+
+        # Provincia desconocida (salvo que sea una zona del servicio)
+        claves = self.session.execute(
+            select(st.c.provincia_clave).where(pendientes).distinct()
+        ).scalars()
+        desconocidas = [clave for clave in claves if not provincia_conocida(clave)]
+        if desconocidas:
+            zonas = ZonaProvincia.__table__
+            self.session.execute(
+                update(st).where(
+                    pendientes,
+                    st.c.provincia_clave.in_(desconocidas),
+                    ~exists().where(
+                        zonas.c.servicio_id == st.c.servicio_id,
+                        zonas.c.zona_clave == st.c.provincia_clave
+                    )
+                ).values(
+                    accion='error',
+                    error=literal("Provincia '") + st.c.provincia + literal("' desconocida")
+                )
+            )
+
+        # Tarifa existente con el mismo servicio, provincia y rango
+        misma_combinacion = select(tarifas.c.id).where(
+            tarifas.c.servicio_id == st.c.servicio_id,
+            tarifas.c.provincia_clave == st.c.provincia_clave,
+            tarifas.c.rango_min == st.c.rango_min,
+            or_(
+                and_(tarifas.c.rango_max.is_(None), st.c.rango_max.is_(None)),
+                tarifas.c.rango_max == st.c.rango_max
+            )
+        ).order_by(tarifas.c.id).limit(1)
+
+        # Filas indicadas por ID (modificaciones): el ID solo se acepta si la
+        # tarifa es del mismo servicio y provincia (puede ser de otra base de datos)
+        por_id = and_(st.c.operacion.is_(None), st.c.tarifa_id.is_not(None))
+        misma_tarifa = and_(
+            tarifas.c.id == st.c.tarifa_id,
+            tarifas.c.servicio_id == st.c.servicio_id,
+            tarifas.c.provincia_clave == st.c.provincia_clave
+        )
+        self.session.execute(
+            update(st).where(
+                pendientes, por_id,
+                exists().where(tarifas.c.id == st.c.tarifa_id),
+                ~exists().where(misma_tarifa)
+            ).values(
+                accion='error',
+                error=literal("La tarifa ") + cast(st.c.tarifa_id, String) +
+                literal(" existente es de otro servicio o provincia")
+            )
+        )
+
+        # Bajas: solo por combinación y sin contar las tarifas que otra fila
+        # del lote indica por ID (baja y nueva alta de la misma combinación)
+        es_baja = st.c.operacion == OPERACION_BAJA
+        otra = st.alias('otra')
+        indicadas = select(otra.c.tarifa_id).join(
+            tarifas, and_(
+                tarifas.c.id == otra.c.tarifa_id,
+                tarifas.c.servicio_id == otra.c.servicio_id,
+                tarifas.c.provincia_clave == otra.c.provincia_clave
+            )
+        ).where(otra.c.lote == lote, otra.c.operacion.is_(None), otra.c.accion.is_(None))
+        self.session.execute(
+            update(st).where(pendientes, es_baja).values(
+                tarifa_existente_id=misma_combinacion.where(tarifas.c.id.not_in(indicadas)).scalar_subquery()
+            )
+        )
+
+        # Resto: primero por ID (salvo las altas) y si no por combinación
+        # única, sin contar las tarifas que el propio lote da de baja
+        bajas = select(st.c.tarifa_existente_id).where(
+            st.c.lote == lote, es_baja, st.c.tarifa_existente_id.is_not(None)
+        )
+        self.session.execute(
+            update(st).where(
+                pendientes, por_id,
+                exists().where(misma_tarifa),
+                st.c.tarifa_id.not_in(bajas)
+            ).values(tarifa_existente_id=st.c.tarifa_id)
+        )
+        self.session.execute(
+            update(st).where(
+                pendientes,
+                func.coalesce(st.c.operacion, '') != OPERACION_BAJA,
+                st.c.tarifa_existente_id.is_(None)
+            ).values(
+                tarifa_existente_id=misma_combinacion.where(tarifas.c.id.not_in(bajas)).scalar_subquery()
+            )
+        )
+
+        # Filas repetidas dentro del mismo archivo
+        anterior = aliased(TarifaStaging)
+        self.session.execute(
+            update(st).where(
+                pendientes,
+                exists().where(
+                    anterior.lote == lote,
+                    anterior.fila < st.c.fila,
+                    anterior.accion.is_(None),
+                    anterior.servicio_id == st.c.servicio_id,
+                    anterior.provincia_clave == st.c.provincia_clave,
+                    anterior.rango_min == st.c.rango_min,
+                    func.coalesce(anterior.rango_max, -1) == func.coalesce(st.c.rango_max, -1),
+                    # Una baja y un alta de la misma combinación no se repiten
+                    (func.coalesce(anterior.operacion, '') == OPERACION_BAJA) ==
+                    (func.coalesce(st.c.operacion, '') == OPERACION_BAJA)
+                )
+            ).values(accion='error', error='Tarifa repetida en el archivo')
+        )
+
+        # Acción a aplicar (las bajas de tarifas que ya no existen no cambian nada)
+        self.session.execute(
+            update(st).where(pendientes, es_baja).values(
+                accion=case((st.c.tarifa_existente_id.is_(None), 'sin_cambios'), else_='eliminar')
+            )
+        )
+        self.session.execute(
+            update(st).where(pendientes, st.c.tarifa_existente_id.is_(None)).values(accion='nueva')
+        )
+        # Las filas indicadas por ID pueden cambiar también el rango
+        distinta = exists().where(
+            tarifas.c.id == st.c.tarifa_existente_id,
+            or_(
+                tarifas.c.precio_fijo != st.c.precio_fijo,
+                tarifas.c.rango_min != st.c.rango_min,
+                tarifas.c.rango_max.is_distinct_from(st.c.rango_max)
+            )
+        )
+        self.session.execute(
+            update(st).where(pendientes, distinta).values(accion='actualizar')
+        )
+        self.session.execute(
+            update(st).where(pendientes).values(accion='sin_cambios')
+        )
+
+        return self.resumen(lote)
+
+    def resumen(self, lote: str) -> ResumenImportacion:
+        """
+        Obtiene el resumen de un lote ya analizado
+
+        Args:
+            lote: Identificador del lote
+
+        Returns:
+            ResumenImportacion con los contadores y errores
+        """
+        st = self.staging
+        resumen = ResumenImportacion(lote=lote)
+        contadores = dict(self.session.execute(
+            select(st.c.accion, func.count()).where(st.c.lote == lote).group_by(st.c.accion)
+        ).all())
+        resumen.nuevas = contadores.get('nueva', 0)
+        resumen.actualizadas = contadores.get('actualizar', 0)
+        resumen.eliminadas = contadores.get('eliminar', 0)
+        resumen.sin_cambios = contadores.get('sin_cambios', 0)
+        resumen.errores = [
+            f"Fila {fila}: {error}"
+            for fila, error in self.session.execute(
+                select(st.c.fila, st.c.error).where(
+                    st.c.lote == lote, st.c.accion.in_(['error', 'invalida'])
+                ).order_by(st.c.fila)
+            )
+        ]
+        return resumen
+
+    def aplicar(self, lote: str) -> Tuple[ResumenImportacion, List[CambioTarifa]]:
+        """
+        Aplica el lote sobre la tabla de tarifas y elimina el staging
+
+        Se vuelve a analizar dentro de la misma transacción para que los
+        cambios se calculen sobre el estado actual. El llamador debe hacer
+        commit al terminar.
+
+        Args:
+            lote: Identificador del lote
+
+        Returns:
+            Tupla (resumen aplicado, tarifas afectadas para el análisis de impacto)
+        """
+        resumen = self.analizar(lote)
+        st = self.staging
+        tarifas = Tarifa.__table__
+
+        # Tarifas afectadas (las modificadas y eliminadas, con sus rangos actuales)
+        cambios = [
+            CambioTarifa(servicio_id, provincia, Decimal(str(rango_min)),
+                         Decimal(str(rango_max)) if rango_max is not None else None)
+            for servicio_id, provincia, rango_min, rango_max in self.session.execute(
+                select(tarifas.c.servicio_id, tarifas.c.provincia, tarifas.c.rango_min, tarifas.c.rango_max)
+                .join(st, st.c.tarifa_existente_id == tarifas.c.id)
+                .where(st.c.lote == lote, st.c.accion.in_(['actualizar', 'eliminar']))
+            )
+        ]
+        cambios.extend(
+            CambioTarifa(servicio_id, provincia, rango_min, rango_max)
+            for servicio_id, provincia, rango_min, rango_max in self.session.execute(
+                select(st.c.servicio_id, st.c.provincia, st.c.rango_min, st.c.rango_max)
+                .where(st.c.lote == lote, st.c.accion.in_(['nueva', 'actualizar']))
+            )
+        )
+
+        if resumen.actualizadas:
+            def nuevo(columna):
+                """Valor de la fila del lote que actualiza cada tarifa"""
+                return select(columna).where(
+                    st.c.lote == lote,
+                    st.c.accion == 'actualizar',
+                    st.c.tarifa_existente_id == tarifas.c.id
+                ).order_by(st.c.fila).limit(1).scalar_subquery()
+
+            nuevo_servicio = nuevo(st.c.servicio_id)
+            nuevo_min, nuevo_max, nuevo_precio = nuevo(st.c.rango_min), nuevo(st.c.rango_max), nuevo(st.c.precio_fijo)
+            factor = factor_metodo_sql(nuevo_servicio)
+            self.session.execute(
+                update(tarifas).where(
+                    tarifas.c.id.in_(
+                        select(st.c.tarifa_existente_id).where(st.c.lote == lote, st.c.accion == 'actualizar')
+                    )
+                ).values(
+                    servicio_id=nuevo_servicio,
+                    provincia=nuevo(st.c.provincia),
+                    provincia_clave=nuevo(st.c.provincia_clave),
+                    rango_min=nuevo_min,
+                    rango_max=nuevo_max,
+                    precio_fijo=nuevo_precio,
+                    rango_min_ent=cast(func.round(nuevo_min * factor), Integer),
+                    rango_max_ent=cast(func.round(nuevo_max * factor), Integer),
+                    precio_cent=cast(func.round(nuevo_precio * FACTOR_PRECIO), Integer)
+                )
+            )
+
+        if resumen.eliminadas:
+            self.session.execute(
+                delete(tarifas).where(
+                    tarifas.c.id.in_(
+                        select(st.c.tarifa_existente_id).where(st.c.lote == lote, st.c.accion == 'eliminar')
+                    )
+                )
+            )
+
+        if resumen.nuevas:
+            factor = factor_metodo_sql(st.c.servicio_id)
+            self.session.execute(
+                insert(tarifas).from_select(
+                    ['servicio_id', 'provincia', 'provincia_clave', 'rango_min', 'rango_max', 'precio_fijo',
+                     'rango_min_ent', 'rango_max_ent', 'precio_cent'],
+                    select(
+                        st.c.servicio_id,
+                        st.c.provincia,
+                        st.c.provincia_clave,
+                        st.c.rango_min,
+                        st.c.rango_max,
+                        st.c.precio_fijo,
+                        cast(func.round(st.c.rango_min * factor), Integer),
+                        cast(func.round(st.c.rango_max * factor), Integer),
+                        cast(func.round(st.c.precio_fijo * FACTOR_PRECIO), Integer)
+                    ).where(st.c.lote == lote, st.c.accion == 'nueva').order_by(st.c.fila)
+                )
+            )
+
+        if resumen.hay_cambios:
+            incrementar_version(self.session)
+
+        self.descartar(lote)
+        return resumen, cambios
+
+    def descartar(self, lote: str):
+        """
+        Elimina las filas de un lote de la tabla de staging
+
+        Args:
+            lote: Identificador del lote
+        """
+        self.session.execute(delete(self.staging).where(self.staging.c.lote == lote))
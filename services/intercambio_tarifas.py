@@ -0,0 +1,222 @@
+"""
+Intercambio de tarifas en CSV y Parquet
+
+Alternativa rápida al Excel para los intercambios automáticos con el mismo
+formato de columnas (COLUMNAS_TARIFAS, o COLUMNAS_DELTA en los archivos de
+cambios) y la misma semántica de importación (ver ImportadorTarifas):
+
+- CSV: se escribe y se lee fila a fila con el módulo csv
+- Parquet: se escribe y se lee por bloques de filas con pyarrow (opcional),
+  convirtiendo cada bloque por columnas
+
+Las tarifas se leen de la base de datos por bloques con una consulta
+directa, sin crear objetos del ORM.
+
+Ejemplo:
+    exportar_csv("tarifas.csv", filas_tarifas(session))
+    lote = ImportadorTarifas(session).cargar(leer_csv("tarifas.csv"))
+"""
+
+from typing import Iterable, Iterator, List, Sequence, Tuple
+import csv
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import Transportista, ServicioTransportista, Tarifa
+from services.importacion_tarifas import (
+    COLUMNAS_TARIFAS, COLUMNAS_DELTA, TAMANO_BLOQUE, nombre_servicio
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+
+def filas_tarifas(session: Session) -> Iterator[tuple]:
+    """
+    Recorre todas las tarifas en el orden de COLUMNAS_TARIFAS
+
+    Los resultados se leen por bloques (yield_per), por lo que la memoria no
+    depende del número de tarifas.
+
+    Args:
+        session: Sesión de base de datos
+
+    Yields:
+        Tuplas (ID, transportista, servicio, tipo de entrega, método,
+        provincia, rango_min, rango_max o "", precio) con valores Decimal
+    """
+    stmt = select(
+        Tarifa.id, Transportista.nombre, ServicioTransportista.tipo_entrega,
+        ServicioTransportista.metodo_calculo, Tarifa.provincia,
+        Tarifa.rango_min, Tarifa.rango_max, Tarifa.precio_fijo
+    ).join(
+        ServicioTransportista, Tarifa.servicio_id == ServicioTransportista.id
+    ).join(
+        Transportista, ServicioTransportista.transportista_id == Transportista.id
+    ).order_by(
+        Transportista.nombre,
+        ServicioTransportista.tipo_entrega,
+        Tarifa.provincia,
+        Tarifa.rango_min
+    )
+    for tarifa_id, transportista, tipo, metodo, provincia, rango_min, rango_max, precio in (
+        session.execute(stmt).yield_per(TAMANO_BLOQUE)
+    ):
+        yield (
+            tarifa_id, transportista, nombre_servicio(tipo, metodo), tipo.value, metodo.value,
+            provincia, rango_min, rango_max if rango_max is not None else "", precio
+        )
+
+
+def _columnas(archivo: str, encabezados: List[str]) -> List[str]:
+    """Comprueba los encabezados de un archivo de tarifas"""
+    if encabezados not in (COLUMNAS_TARIFAS, COLUMNAS_DELTA):
+        raise ValueError(
+            f"El formato del archivo '{archivo}' no es correcto. "
+            f"Encabezados esperados: {COLUMNAS_TARIFAS}; encontrados: {encabezados}"
+        )
+    return encabezados
+
+
+# ---------------------------------------------------------------------------
+# CSV
+# ---------------------------------------------------------------------------
+
+def exportar_csv(ruta: str, filas: Iterable[Sequence], columnas: List[str] = COLUMNAS_TARIFAS) -> int:
+    """
+    Escribe tarifas en un archivo CSV (UTF-8, separado por comas)
+
+    Args:
+        ruta: Ruta del archivo
+        filas: Filas en el orden de las columnas (p. ej. filas_tarifas())
+        columnas: COLUMNAS_TARIFAS o COLUMNAS_DELTA
+
+    Returns:
+        Número de filas escritas
+    """
+    total = 0
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(columnas)
+        for fila in filas:
+            escritor.writerow(fila)
+            total += 1
+    return total
+
+
+def leer_csv(ruta: str) -> Iterator[Tuple[int, list]]:
+    """
+    Lee un archivo CSV de tarifas para ImportadorTarifas.cargar()
+
+    Los encabezados se comprueban al abrir el archivo; las filas se leen
+    a medida que se consumen.
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        Iterador de (número de fila, valores); las celdas vacías se devuelven como None
+
+    Raises:
+        ValueError: Si los encabezados no son los del formato de tarifas
+    """
+    archivo = open(ruta, newline='', encoding='utf-8-sig')
+    lector = csv.reader(archivo)
+    try:
+        _columnas(ruta, next(lector, []))
+    except ValueError:
+        archivo.close()
+        raise
+
+    def filas():
+        with archivo:
+            for num_fila, valores in enumerate(lector, 2):
+                if valores:
+                    yield num_fila, [valor if valor != "" else None for valor in valores]
+
+    return filas()
+
+
+# ---------------------------------------------------------------------------
+# Parquet
+# ---------------------------------------------------------------------------
+
+def _esquema_parquet(columnas: List[str]):
+    """Esquema Arrow del formato de tarifas (importes exactos como decimal)"""
+    importe = pa.decimal128(10, 2)
+    tipos = [pa.int64(), pa.string(), pa.string(), pa.string(), pa.string(),
+             pa.string(), importe, importe, importe, pa.string()]
+    return pa.schema([pa.field(nombre, tipo) for nombre, tipo in zip(columnas, tipos)])
+
+
+def exportar_parquet(ruta: str, filas: Iterable[Sequence], columnas: List[str] = COLUMNAS_TARIFAS) -> int:
+    """
+    Escribe tarifas en un archivo Parquet por bloques de filas
+
+    Args:
+        ruta: Ruta del archivo
+        filas: Filas en el orden de las columnas (p. ej. filas_tarifas())
+        columnas: COLUMNAS_TARIFAS o COLUMNAS_DELTA
+
+    Returns:
+        Número de filas escritas
+    """
+    if not PARQUET_DISPONIBLE:
+        raise RuntimeError("La librería pyarrow no está instalada")
+
+    esquema = _esquema_parquet(columnas)
+    total = 0
+    with pq.ParquetWriter(ruta, esquema) as escritor:
+        bloque = []
+
+        def escribir():
+            datos = [list(columna) for columna in zip(*bloque)]
+            datos[7] = [None if valor == "" else valor for valor in datos[7]]  # Sin máximo
+            escritor.write_batch(pa.record_batch(datos, schema=esquema))
+
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) >= TAMANO_BLOQUE:
+                escribir()
+                total += len(bloque)
+                bloque = []
+        if bloque:
+            escribir()
+            total += len(bloque)
+    return total
+
+
+def leer_parquet(ruta: str) -> Iterator[Tuple[int, list]]:
+    """
+    Lee un archivo Parquet de tarifas para ImportadorTarifas.cargar()
+
+    Se lee por bloques de filas y cada bloque se convierte por columnas.
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        Iterador de (número de fila, valores)
+
+    Raises:
+        ValueError: Si las columnas no son las del formato de tarifas
+    """
+    if not PARQUET_DISPONIBLE:
+        raise RuntimeError("La librería pyarrow no está instalada")
+
+    archivo = pq.ParquetFile(ruta)
+    columnas = _columnas(ruta, archivo.schema_arrow.names)
+
+    def filas():
+        num_fila = 2  # Misma numeración que en CSV y Excel (fila 1 = encabezados)
+        for bloque in archivo.iter_batches(batch_size=TAMANO_BLOQUE, columns=columnas):
+            for valores in zip(*(columna.to_pylist() for columna in bloque.columns)):
+                yield num_fila, list(valores)
+                num_fila += 1
+
+    return filas()
@@ -0,0 +1,99 @@
+"""
+Lectura por filas de archivos CSV y Excel con encabezados fijos
+
+Usada por las importaciones masivas (pedidos, productos): los encabezados
+se comprueban al abrir el archivo y las filas se leen a medida que se
+consumen, por lo que la memoria no depende del tamaño del archivo.
+"""
+
+from typing import Iterator, List, Sequence, Tuple
+import csv
+
+try:
+    from openpyxl import load_workbook
+    EXCEL_DISPONIBLE = True
+except ImportError:
+    EXCEL_DISPONIBLE = False
+
+
+def comprobar_columnas(archivo: str, encabezados: Sequence, columnas: List[str]):
+    """
+    Comprueba los encabezados de un archivo
+
+    Raises:
+        ValueError: Si los encabezados no son las columnas esperadas
+    """
+    if list(encabezados) != columnas:
+        raise ValueError(
+            f"El formato del archivo '{archivo}' no es correcto. "
+            f"Encabezados esperados: {columnas}; encontrados: {list(encabezados)}"
+        )
+
+
+def leer_csv(ruta: str, columnas: List[str]) -> Iterator[Tuple[int, list]]:
+    """
+    Lee un archivo CSV (UTF-8) fila a fila
+
+    Args:
+        ruta: Ruta del archivo
+        columnas: Encabezados esperados
+
+    Returns:
+        Iterador de (número de fila, valores), sin las filas vacías
+
+    Raises:
+        ValueError: Si los encabezados no son las columnas esperadas
+    """
+    archivo = open(ruta, newline='', encoding='utf-8-sig')
+    lector = csv.reader(archivo)
+    try:
+        comprobar_columnas(ruta, next(lector, []), columnas)
+    except ValueError:
+        archivo.close()
+        raise
+
+    def filas():
+        with archivo:
+            for num_fila, valores in enumerate(lector, 2):
+                if valores:
+                    yield num_fila, valores
+
+    return filas()
+
+
+def leer_excel(ruta: str, columnas: List[str]) -> Iterator[Tuple[int, tuple]]:
+    """
+    Lee la primera hoja de un Excel fila a fila en modo de solo lectura
+
+    Args:
+        ruta: Ruta del archivo
+        columnas: Encabezados esperados
+
+    Returns:
+        Iterador de (número de fila, valores), sin las filas vacías
+
+    Raises:
+        ValueError: Si los encabezados no son las columnas esperadas
+    """
+    if not EXCEL_DISPONIBLE:
+        raise RuntimeError("La librería openpyxl no está instalada")
+
+    wb = load_workbook(ruta, read_only=True)
+    ws = wb.active
+    try:
+        comprobar_columnas(ruta, [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1), ())], columnas)
+    except ValueError:
+        wb.close()
+        raise
+
+    def filas():
+        try:
+            for num_fila, valores in enumerate(
+                ws.iter_rows(min_row=2, max_col=len(columnas), values_only=True), 2
+            ):
+                if any(valor is not None for valor in valores):
+                    yield num_fila, valores
+        finally:
+            wb.close()
+
+    return filas()
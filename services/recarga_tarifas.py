@@ -0,0 +1,143 @@
+"""
+Recarga en caliente de las tarifas compiladas
+
+Los procesos de larga duración mantienen unas TarifasCompiladas en memoria
+y un hilo comprueba periódicamente la versión de tarifas (control_versiones),
+que se incrementa con cualquier cambio hecho por el ORM, la importación o la
+agrupación en zonas. Si ha cambiado, compila las tarifas en segundo plano y
+sustituye la referencia de una sola vez: las cotizaciones en curso terminan
+con la estructura anterior y las siguientes usan la nueva.
+
+Ejemplo:
+    with RecargadorTarifas(get_db_manager(), intervalo=2) as recargador:
+        cotizaciones = recargador.tarifas.cotizar(tipo_entrega, provincia, totales)
+"""
+
+from typing import Optional, Callable
+from pathlib import Path
+import threading
+
+from database.db_manager import DatabaseManager
+from database.versiones import obtener_version
+from services.tarifas_compiladas import TarifasCompiladas
+
+
+class RecargadorTarifas:
+    """Mantiene unas tarifas compiladas al día con la base de datos"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        intervalo: float = 5.0,
+        ruta: Optional[str] = None,
+        al_recargar: Optional[Callable[[TarifasCompiladas], None]] = None
+    ):
+        """
+        Inicializa el recargador (las tarifas se compilan en la primera consulta)
+
+        Args:
+            db_manager: Gestor de la base de datos a vigilar
+            intervalo: Segundos entre comprobaciones de la versión
+            ruta: Archivo de tarifas compiladas. Si se indica, se reutiliza al
+                arrancar si está al día y se regenera en cada recarga, de modo
+                que el resto de procesos pueden cargarlo
+            al_recargar: Función a la que se pasan las tarifas nuevas tras cada recarga
+        """
+        self.db_manager = db_manager
+        self.intervalo = intervalo
+        self.ruta = ruta
+        self.al_recargar = al_recargar
+        self.recargas = 0
+        self.ultimo_error: Optional[Exception] = None
+        self._tarifas: Optional[TarifasCompiladas] = None
+        self._bloqueo = threading.Lock()  # Evita dos compilaciones simultáneas
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def tarifas(self) -> TarifasCompiladas:
+        """Tarifas compiladas vigentes (se compilan en la primera consulta)"""
+        tarifas = self._tarifas
+        if tarifas is None:
+            self.comprobar()
+            tarifas = self._tarifas
+        return tarifas
+
+    @property
+    def version(self) -> Optional[int]:
+        """Versión de tarifas de la estructura vigente (None si aún no se ha compilado)"""
+        tarifas = self._tarifas
+        return tarifas.version if tarifas is not None else None
+
+    def _compilar(self, version: int) -> TarifasCompiladas:
+        """Obtiene las tarifas de una versión, del archivo si está al día o compilándolas"""
+        if self.ruta is not None and Path(self.ruta).exists():
+            try:
+                tarifas = TarifasCompiladas.cargar(self.ruta)
+            except ValueError:
+                tarifas = None
+            if tarifas is not None and tarifas.version == version:
+                return tarifas
+
+        with self.db_manager.get_session() as session:
+            tarifas = TarifasCompiladas.compilar(session)
+        if self.ruta is None:
+            return tarifas
+        tarifas.guardar(self.ruta)
+        return TarifasCompiladas.cargar(self.ruta)
+
+    def comprobar(self) -> bool:
+        """
+        Comprueba la versión de tarifas y recompila si ha cambiado
+
+        Returns:
+            True si se han sustituido las tarifas
+        """
+        with self._bloqueo:
+            with self.db_manager.get_session() as session:
+                version = obtener_version(session)
+            if self._tarifas is not None and self._tarifas.version == version:
+                return False
+
+            tarifas = self._compilar(version)
+            # Sustitución atómica: quien ya tenga la referencia anterior la sigue usando
+            self._tarifas = tarifas
+            self.recargas += 1
+
+        if self.al_recargar is not None:
+            self.al_recargar(tarifas)
+        return True
+
+    def _vigilar(self):
+        """Bucle del hilo de vigilancia"""
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.comprobar()
+                self.ultimo_error = None
+            except Exception as e:
+                # Se conservan las tarifas anteriores y se reintenta en la siguiente comprobación
+                self.ultimo_error = e
+
+    def iniciar(self):
+        """Compila las tarifas si hace falta e inicia el hilo de vigilancia"""
+        if self._hilo is not None:
+            return
+        self.tarifas
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._vigilar, name="recarga-tarifas", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo de vigilancia"""
+        if self._hilo is None:
+            return
+        self._parar.set()
+        self._hilo.join()
+        self._hilo = None
+
+    def __enter__(self) -> 'RecargadorTarifas':
+        self.iniciar()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detener()
@@ -8,67 +8,310 @@ Algoritmo:
 4. Seleccionar la opción más económica
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Iterable
+from array import array
 from decimal import Decimal
 from dataclasses import dataclass
+from sqlalchemy import case
 from sqlalchemy.orm import Session
 
 from models.models import (
     Pedido, Producto, PedidoProducto, Transportista, 
     ServicioTransportista, Tarifa, TipoEntrega, MetodoCalculo
 )
+from models.unidades import a_entero, desde_entero, FACTORES_METODO, FACTOR_PRECIO
+from models.provincias import clave_provincia, provincia_codigo_postal, CLAVE_NACIONAL
+from services.zonas import MapaZonas
+
+
+# Unidad de medida mostrada según el método de cálculo (valor del enum)
+UNIDADES_METODO = {
+    MetodoCalculo.PESO.value: 'kg',
+    MetodoCalculo.VOLUMEN.value: 'm³',
+    MetodoCalculo.PALETS.value: 'palets'
+}
 
 
 @dataclass
 class CotizacionResult:
-    """Resultado de una cotización de transporte"""
+    """
+    Resultado de una cotización de transporte
+
+    Usa __slots__ para reducir memoria en procesos por lotes. Los valores
+    numéricos se guardan como Decimal y el texto de ``detalles`` se genera
+    solo cuando se consulta.
+    """
+    __slots__ = (
+        'transportista_id', 'transportista_nombre', 'servicio_id',
+        'tipo_entrega', 'metodo_calculo', 'precio_total',
+        'cantidad_calculada', 'tarifa_id', 'provincia',
+        'rango_min', 'rango_max'
+    )
+
     transportista_id: int
     transportista_nombre: str
     servicio_id: int
     tipo_entrega: str
     metodo_calculo: str
     precio_total: Decimal
-    precio_base: Decimal
-    precio_variable: Decimal
     cantidad_calculada: Decimal  # kg, m³ o palets
     tarifa_id: int
     provincia: str
-    detalles: str
+    rango_min: Decimal
+    rango_max: Optional[Decimal]  # None = infinito
+    
+    @property
+    def unidad(self) -> str:
+        """Unidad de la cantidad calculada (kg, m³ o palets)"""
+        return UNIDADES_METODO[self.metodo_calculo]
+    
+    @property
+    def detalles(self) -> str:
+        """Desglose legible del cálculo (se genera bajo demanda)"""
+        rango_max_str = f"{self.rango_max:.2f}" if self.rango_max is not None else "∞"
+        return (f"{self.cantidad_calculada:.2f} {self.unidad} en rango "
+                f"[{self.rango_min:.2f} - {rango_max_str}] = {self.precio_total:.2f}€")
     
     def __repr__(self):
         return (f"CotizacionResult(transportista='{self.transportista_nombre}', "
                 f"tipo='{self.tipo_entrega}', precio={self.precio_total}€)")
 
 
+class LoteCotizaciones:
+    """
+    Contenedor compacto de cotizaciones para procesos por lotes
+
+    Guarda las cotizaciones en columnas (arrays de enteros y listas de
+    Decimal) en lugar de un objeto por cotización. Los datos comunes de
+    servicios y tarifas se almacenan una sola vez y los CotizacionResult
+    se reconstruyen solo al recorrer el lote.
+
+    Las cotizaciones de cada pedido se añaden de forma contigua y en orden
+    de precio, tal como las devuelve el selector.
+    """
+    __slots__ = (
+        '_pedido_ids', '_servicio_ids', '_tarifa_ids', '_precios_cent',
+        '_cantidades', '_servicios', '_tarifas', '_indice'
+    )
+    
+    def __init__(self):
+        self._pedido_ids = array('q')
+        self._servicio_ids = array('q')
+        self._tarifa_ids = array('q')
+        self._precios_cent = array('q')  # Precio en céntimos
+        self._cantidades: List[Decimal] = []
+        # servicio_id -> (transportista_id, transportista_nombre, tipo_entrega, metodo_calculo)
+        self._servicios: Dict[int, Tuple[int, str, str, str]] = {}
+        # tarifa_id -> (provincia, rango_min, rango_max)
+        self._tarifas: Dict[int, Tuple[str, Decimal, Optional[Decimal]]] = {}
+        # pedido_id -> (posición inicial, posición final)
+        self._indice: Dict[int, Tuple[int, int]] = {}
+    
+    def agregar(self, pedido_id: int, cotizaciones: List[CotizacionResult]):
+        """
+        Añade las cotizaciones (ya ordenadas) de un pedido al lote
+        
+        Args:
+            pedido_id: ID del pedido
+            cotizaciones: Cotizaciones del pedido ordenadas por precio
+        """
+        self._indice[pedido_id] = (len(self._pedido_ids), len(self._pedido_ids))
+        for c in cotizaciones:
+            self.agregar_fila(
+                pedido_id,
+                (c.servicio_id, c.transportista_id, c.transportista_nombre,
+                 c.tipo_entrega, c.metodo_calculo),
+                (c.tarifa_id, c.provincia, c.rango_min, c.rango_max),
+                a_entero(c.precio_total, FACTOR_PRECIO),
+                c.cantidad_calculada
+            )
+    
+    def agregar_fila(
+        self,
+        pedido_id: int,
+        servicio: Tuple[int, int, str, str, str],
+        tarifa: Tuple[int, str, Decimal, Optional[Decimal]],
+        precio_cent: int,
+        cantidad: Decimal
+    ):
+        """
+        Añade una cotización al lote a partir de sus columnas
+        
+        Las filas de un mismo pedido deben añadirse seguidas y en orden de precio.
+        
+        Args:
+            pedido_id: ID del pedido
+            servicio: (servicio_id, transportista_id, transportista_nombre, tipo_entrega, metodo_calculo)
+            tarifa: (tarifa_id, provincia, rango_min, rango_max)
+            precio_cent: Precio total en céntimos
+            cantidad: Cantidad calculada (kg, m³ o palets)
+        """
+        servicio_id, tarifa_id = servicio[0], tarifa[0]
+        if servicio_id not in self._servicios:
+            self._servicios[servicio_id] = servicio[1:]
+        if tarifa_id not in self._tarifas:
+            self._tarifas[tarifa_id] = tarifa[1:]
+        
+        posicion = len(self._pedido_ids)
+        self._pedido_ids.append(pedido_id)
+        self._servicio_ids.append(servicio_id)
+        self._tarifa_ids.append(tarifa_id)
+        self._precios_cent.append(precio_cent)
+        self._cantidades.append(cantidad)
+        inicio, _ = self._indice.get(pedido_id, (posicion, posicion))
+        self._indice[pedido_id] = (inicio, posicion + 1)
+    
+    def _construir(self, posicion: int) -> CotizacionResult:
+        """Reconstruye la cotización almacenada en una posición"""
+        servicio_id = self._servicio_ids[posicion]
+        tarifa_id = self._tarifa_ids[posicion]
+        transportista_id, nombre, tipo_entrega, metodo = self._servicios[servicio_id]
+        provincia, rango_min, rango_max = self._tarifas[tarifa_id]
+        return CotizacionResult(
+            transportista_id=transportista_id,
+            transportista_nombre=nombre,
+            servicio_id=servicio_id,
+            tipo_entrega=tipo_entrega,
+            metodo_calculo=metodo,
+            precio_total=Decimal(self._precios_cent[posicion]).scaleb(-2),
+            cantidad_calculada=self._cantidades[posicion],
+            tarifa_id=tarifa_id,
+            provincia=provincia,
+            rango_min=rango_min,
+            rango_max=rango_max
+        )
+    
+    def __len__(self) -> int:
+        return len(self._pedido_ids)
+    
+    def __iter__(self) -> Iterator[Tuple[int, CotizacionResult]]:
+        """Recorre el lote devolviendo tuplas (pedido_id, cotización)"""
+        for posicion in range(len(self._pedido_ids)):
+            yield self._pedido_ids[posicion], self._construir(posicion)
+    
+    def pedido_ids(self) -> List[int]:
+        """IDs de los pedidos incluidos en el lote"""
+        return list(self._indice)
+    
+    def cotizaciones_pedido(self, pedido_id: int) -> List[CotizacionResult]:
+        """Cotizaciones de un pedido ordenadas por precio (vacía si no hay)"""
+        inicio, fin = self._indice.get(pedido_id, (0, 0))
+        return [self._construir(posicion) for posicion in range(inicio, fin)]
+    
+    def mejor_cotizacion(self, pedido_id: int) -> Optional[CotizacionResult]:
+        """Cotización más económica de un pedido o None si no hay opciones"""
+        inicio, fin = self._indice.get(pedido_id, (0, 0))
+        return self._construir(inicio) if fin > inicio else None
+
+
+def orden_precedencia_tarifas(provincia_clave, zona_clave=None):
+    """
+    Criterios ORDER BY para elegir entre varias tarifas aplicables
+    
+    Prioriza la tarifa de la provincia de entrega, después la de su zona y
+    por último NACIONAL; si varias coinciden (rangos que comparten límite),
+    la de menor ID.
+    
+    Args:
+        provincia_clave: Clave normalizada de la provincia de entrega (valor o columna SQL)
+        zona_clave: Clave de la zona de la provincia para el servicio (valor, columna SQL o None)
+    
+    Returns:
+        Tupla de expresiones para order_by()
+    """
+    criterios = [(Tarifa.provincia_clave == provincia_clave, 0)]
+    if zona_clave is not None:
+        criterios.append((Tarifa.provincia_clave == zona_clave, 1))
+    return (
+        case(*criterios, else_=2),
+        Tarifa.id
+    )
+
+
 class TransportistaSelector:
     """Servicio para seleccionar el mejor transportista y calcular precios"""
     
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, usar_enteros: bool = False, compiladas=None):
         """
         Inicializa el selector
         
         Args:
             session: Sesión de base de datos
+            usar_enteros: Si es True, busca las tarifas con las columnas del
+                esquema entero (rangos en gramos/cm³ y precios en céntimos)
+            compiladas: TarifasCompiladas con las que buscar las tarifas en
+                memoria en lugar de consultarlas (implica usar_enteros)
         """
         self.session = session
+        self.compiladas = compiladas
+        self.usar_enteros = usar_enteros or compiladas is not None
+        self._zonas: Optional[MapaZonas] = None
+        self._compiladas_propias = None  # Compiladas por el selector para los mapas de precios
+    
+    @property
+    def zonas(self) -> MapaZonas:
+        """Mapa provincia -> zona (se carga en la primera consulta)"""
+        if self._zonas is None:
+            self._zonas = MapaZonas.desde_base_datos(self.session)
+        return self._zonas
+    
+    def ambitos_tarifa(self, servicio_id: int, provincia: str) -> Tuple[str, Optional[str], List[str]]:
+        """
+        Claves de Tarifa.provincia_clave aplicables a una provincia de entrega
+        
+        Args:
+            servicio_id: ID del servicio
+            provincia: Provincia de entrega (cualquier variante del nombre)
+        
+        Returns:
+            Tupla (clave de la provincia, clave de su zona o None, lista de
+            claves aplicables incluida NACIONAL)
+        """
+        provincia_clave = clave_provincia(provincia)
+        zona_clave = clave_provincia(self.zonas.zona(servicio_id, provincia_clave))
+        if zona_clave is None:
+            return provincia_clave, None, [provincia_clave, CLAVE_NACIONAL]
+        return provincia_clave, zona_clave, [provincia_clave, zona_clave, CLAVE_NACIONAL]
     
     def calcular_totales_pedido(self, pedido: Pedido) -> Dict[str, Decimal]:
         """
         Calcula los totales del pedido
         
+        Usa los totales desnormalizados del pedido si ya están calculados y,
+        si no (pedido aún no guardado), los suma a partir de sus líneas.
+        
         Args:
             pedido: Pedido a calcular
         
+        Returns:
+            Dict con peso_total, volumen_total y palets_total
+        """
+        if pedido.peso_total is not None:
+            return {
+                'peso_total': pedido.peso_total,
+                'volumen_total': pedido.volumen_total,
+                'palets_total': pedido.palets_total
+            }
+        
+        return self.calcular_totales_lineas(
+            (pedido_producto.producto, pedido_producto.cantidad)
+            for pedido_producto in pedido.productos
+        )
+    
+    def calcular_totales_lineas(self, lineas: Iterable[Tuple[Producto, int]]) -> Dict[str, Decimal]:
+        """
+        Calcula los totales de un conjunto de líneas (producto, cantidad)
+        
+        Args:
+            lineas: Pares (producto, cantidad)
+        
         Returns:
             Dict con peso_total, volumen_total y palets_total
         """
         peso_total = Decimal('0')
         volumen_total = Decimal('0')
         
-        for pedido_producto in pedido.productos:
-            producto = pedido_producto.producto
-            cantidad = pedido_producto.cantidad
-            
+        for producto, cantidad in lineas:
             peso_total += Decimal(str(producto.peso_kg)) * cantidad
             volumen_total += Decimal(str(producto.volumen_m3)) * cantidad
         
@@ -114,7 +357,8 @@ class TransportistaSelector:
         """
         Busca la tarifa aplicable para un servicio, provincia y cantidad
         
-        Busca primero tarifa específica de provincia, luego NACIONAL
+        Busca primero tarifa específica de provincia, luego la de su zona
+        y por último NACIONAL
         
         Args:
             servicio_id: ID del servicio
@@ -125,19 +369,56 @@ class TransportistaSelector:
             Tarifa aplicable o None si no se encuentra
         """
         # Intentar primero con provincia específica
+        provincia_clave, zona_clave, ambitos = self.ambitos_tarifa(servicio_id, provincia)
         tarifas = self.session.query(Tarifa).filter(
             Tarifa.servicio_id == servicio_id,
-            Tarifa.provincia.in_([provincia, 'NACIONAL']),
+            Tarifa.provincia_clave.in_(ambitos),
             Tarifa.rango_min <= cantidad,
             (Tarifa.rango_max.is_(None)) | (Tarifa.rango_max >= cantidad)
         ).order_by(
-            # Priorizar provincia específica sobre NACIONAL
-            Tarifa.provincia.desc()
+            *orden_precedencia_tarifas(provincia_clave, zona_clave)
         ).all()
         
-        # Retornar la primera tarifa (provincia específica si existe, sino NACIONAL)
+        # Retornar la primera tarifa (provincia específica, zona o NACIONAL)
         return tarifas[0] if tarifas else None
     
+    def buscar_tarifa_aplicable_entera(
+        self,
+        servicio_id: int,
+        provincia: str,
+        cantidad_ent: int
+    ):
+        """
+        Busca la tarifa aplicable comparando las columnas del esquema entero
+        
+        Solo lee las columnas enteras, sin conversiones de Decimal, y la
+        búsqueda por servicio, provincia_clave y rango usa el índice
+        ix_tarifas_busqueda_clave.
+        
+        Args:
+            servicio_id: ID del servicio
+            provincia: Provincia de entrega
+            cantidad_ent: Cantidad en la unidad entera del método (ver models/unidades.py)
+        
+        Returns:
+            Fila (id, provincia, rango_min_ent, rango_max_ent, precio_cent) o None
+        """
+        provincia_clave, zona_clave, ambitos = self.ambitos_tarifa(servicio_id, provincia)
+        return self.session.query(
+            Tarifa.id,
+            Tarifa.provincia,
+            Tarifa.rango_min_ent,
+            Tarifa.rango_max_ent,
+            Tarifa.precio_cent
+        ).filter(
+            Tarifa.servicio_id == servicio_id,
+            Tarifa.provincia_clave.in_(ambitos),
+            Tarifa.rango_min_ent <= cantidad_ent,
+            (Tarifa.rango_max_ent.is_(None)) | (Tarifa.rango_max_ent >= cantidad_ent)
+        ).order_by(
+            *orden_precedencia_tarifas(provincia_clave, zona_clave)
+        ).first()
+    
     def calcular_precio_servicio(
         self,
         servicio: ServicioTransportista,
@@ -158,6 +439,9 @@ class TransportistaSelector:
         # Obtener cantidad según método de cálculo
         cantidad = self.obtener_cantidad_segun_metodo(totales, servicio.metodo_calculo)
         
+        if self.usar_enteros:
+            return self._calcular_precio_servicio_entero(servicio, provincia, cantidad)
+        
         # Buscar tarifa aplicable
         tarifa = self.buscar_tarifa_aplicable(servicio.id, provincia, cantidad)
         
@@ -167,16 +451,6 @@ class TransportistaSelector:
         # Calcular precio (ahora es fijo por rango)
         precio_total = Decimal(str(tarifa.precio_fijo))
         
-        # Crear detalles
-        unidad = {
-            MetodoCalculo.PESO: 'kg',
-            MetodoCalculo.VOLUMEN: 'm³',
-            MetodoCalculo.PALETS: 'palets'
-        }[servicio.metodo_calculo]
-        
-        rango_max_str = f"{tarifa.rango_max:.2f}" if tarifa.rango_max else "∞"
-        detalles = f"{cantidad:.2f} {unidad} en rango [{tarifa.rango_min:.2f} - {rango_max_str}] = {precio_total:.2f}€"
-        
         return CotizacionResult(
             transportista_id=servicio.transportista.id,
             transportista_nombre=servicio.transportista.nombre,
@@ -184,14 +458,87 @@ class TransportistaSelector:
             tipo_entrega=servicio.tipo_entrega.value,
             metodo_calculo=servicio.metodo_calculo.value,
             precio_total=precio_total,
-            precio_base=Decimal('0'),  # Ya no se usa
-            precio_variable=precio_total,  # El precio completo
             cantidad_calculada=cantidad,
             tarifa_id=tarifa.id,
             provincia=tarifa.provincia,
-            detalles=detalles
+            rango_min=tarifa.rango_min,
+            rango_max=tarifa.rango_max
+        )
+    
+    def _calcular_precio_servicio_entero(
+        self,
+        servicio: ServicioTransportista,
+        provincia: str,
+        cantidad: Decimal
+    ) -> Optional[CotizacionResult]:
+        """Variante de calcular_precio_servicio sobre el esquema entero"""
+        factor = FACTORES_METODO[servicio.metodo_calculo]
+        buscar = self.compiladas.buscar_tarifa if self.compiladas is not None else self.buscar_tarifa_aplicable_entera
+        tarifa = buscar(servicio.id, provincia, a_entero(cantidad, factor))
+        
+        if not tarifa:
+            return None
+        
+        tarifa_id, tarifa_provincia, rango_min_ent, rango_max_ent, precio_cent = tarifa
+        return CotizacionResult(
+            transportista_id=servicio.transportista.id,
+            transportista_nombre=servicio.transportista.nombre,
+            servicio_id=servicio.id,
+            tipo_entrega=servicio.tipo_entrega.value,
+            metodo_calculo=servicio.metodo_calculo.value,
+            precio_total=desde_entero(precio_cent, FACTOR_PRECIO),
+            cantidad_calculada=cantidad,
+            tarifa_id=tarifa_id,
+            provincia=tarifa_provincia,
+            rango_min=desde_entero(rango_min_ent, factor),
+            rango_max=desde_entero(rango_max_ent, factor)
         )
     
+    def obtener_servicios_activos(self, tipo_entrega: TipoEntrega) -> List[ServicioTransportista]:
+        """
+        Obtiene los servicios activos (de transportistas activos) para un tipo de entrega
+        
+        Args:
+            tipo_entrega: Tipo de entrega del pedido
+        
+        Returns:
+            Lista de servicios compatibles
+        """
+        return self.session.query(ServicioTransportista).join(
+            Transportista
+        ).filter(
+            ServicioTransportista.tipo_entrega == tipo_entrega,
+            ServicioTransportista.activo == True,
+            Transportista.activo == True
+        ).order_by(ServicioTransportista.id).all()
+    
+    def cotizar_servicios(
+        self,
+        servicios: List[ServicioTransportista],
+        provincia: str,
+        totales: Dict[str, Decimal]
+    ) -> List[CotizacionResult]:
+        """
+        Calcula y ordena por precio las cotizaciones de una lista de servicios
+        
+        Args:
+            servicios: Servicios compatibles con el pedido
+            provincia: Provincia de entrega
+            totales: Totales del pedido
+        
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+        """
+        cotizaciones = []
+        for servicio in servicios:
+            cotizacion = self.calcular_precio_servicio(servicio, provincia, totales)
+            if cotizacion:
+                cotizaciones.append(cotizacion)
+        
+        # Ordenar por precio (menor a mayor)
+        cotizaciones.sort(key=lambda x: x.precio_total)
+        return cotizaciones
+    
     def obtener_mejores_cotizaciones(
         self,
         pedido_id: int,
@@ -216,29 +563,215 @@ class TransportistaSelector:
         totales = self.calcular_totales_pedido(pedido)
         
         # Buscar servicios activos que coincidan con el tipo de entrega
-        servicios = self.session.query(ServicioTransportista).join(
-            Transportista
-        ).filter(
-            ServicioTransportista.tipo_entrega == pedido.tipo_entrega,
-            ServicioTransportista.activo == True,
-            Transportista.activo == True
-        ).all()
+        servicios = self.obtener_servicios_activos(pedido.tipo_entrega)
         
         # Calcular precios para cada servicio
-        cotizaciones = []
-        for servicio in servicios:
-            cotizacion = self.calcular_precio_servicio(
-                servicio,
+        cotizaciones = self.cotizar_servicios(servicios, pedido.provincia_entrega, totales)
+        
+        return cotizaciones[:limite]
+    
+    def cotizar_carrito(
+        self,
+        lineas: Iterable[Tuple[int, int]],
+        tipo_entrega: TipoEntrega,
+        provincia: Optional[str] = None,
+        codigo_postal: Optional[str] = None,
+        limite: Optional[int] = 5
+    ) -> List[CotizacionResult]:
+        """
+        Cotiza un carrito sin necesidad de guardar el pedido
+        
+        La provincia de entrega puede indicarse directamente o mediante el
+        código postal.
+        
+        Args:
+            lineas: Pares (producto_id, cantidad)
+            tipo_entrega: Tipo de entrega solicitado
+            provincia: Provincia de entrega
+            codigo_postal: Código postal de entrega (si no se indica provincia)
+            limite: Número máximo de cotizaciones (None = todas)
+        
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+        """
+        if not provincia:
+            provincia = provincia_codigo_postal(codigo_postal)
+            if provincia is None:
+                raise ValueError(f"Código postal no válido: {codigo_postal}")
+        
+        totales = self.calcular_totales_carrito(lineas)
+        servicios = self.obtener_servicios_activos(tipo_entrega)
+        return self.cotizar_servicios(servicios, provincia, totales)[:limite]
+    
+    def calcular_totales_carrito(self, lineas: Iterable[Tuple[int, int]]) -> Dict[str, Decimal]:
+        """
+        Calcula los totales de un carrito con una sola consulta de productos
+        
+        Args:
+            lineas: Pares (producto_id, cantidad)
+        
+        Returns:
+            Dict con peso_total, volumen_total y palets_total
+        
+        Raises:
+            ValueError: Si algún producto no existe
+        """
+        lineas = list(lineas)
+        productos = {
+            producto.id: producto
+            for producto in self.session.query(Producto).filter(
+                Producto.id.in_({producto_id for producto_id, _ in lineas})
+            )
+        }
+        faltan = {producto_id for producto_id, _ in lineas} - productos.keys()
+        if faltan:
+            raise ValueError(f"Productos no encontrados: {sorted(faltan)}")
+        
+        return self.calcular_totales_lineas(
+            (productos[producto_id], cantidad) for producto_id, cantidad in lineas
+        )
+    
+    def tarifas_compiladas(self):
+        """
+        Tarifas compiladas del selector (se compilan en la primera llamada
+        si no se indicaron al crearlo)
+        """
+        if self.compiladas is not None:
+            return self.compiladas
+        if self._compiladas_propias is None:
+            from services.tarifas_compiladas import TarifasCompiladas  # Evita la importación circular
+            self._compiladas_propias = TarifasCompiladas.compilar(self.session)
+        return self._compiladas_propias
+    
+    def mapa_precios_carrito(
+        self,
+        lineas: Iterable[Tuple[int, int]],
+        provincias: Optional[Iterable[str]] = None,
+        tipos_entrega: Optional[Iterable[TipoEntrega]] = None
+    ) -> Dict[TipoEntrega, Dict[str, Optional[CotizacionResult]]]:
+        """
+        Obtiene la opción más económica de un carrito en cada provincia y tipo de entrega
+        
+        Los totales se calculan una sola vez y todas las provincias se
+        cotizan con las tarifas compiladas, sin más consultas.
+        
+        Args:
+            lineas: Pares (producto_id, cantidad)
+            provincias: Provincias a cotizar (None = todas)
+            tipos_entrega: Tipos de entrega (None = todos)
+        
+        Returns:
+            {tipo de entrega: {provincia: mejor cotización o None si no hay opciones}}
+        """
+        totales = self.calcular_totales_carrito(lineas)
+        return self.tarifas_compiladas().mejores_por_provincia(totales, provincias, tipos_entrega)
+    
+    def mapa_precios_pedido(
+        self,
+        pedido_id: int,
+        provincias: Optional[Iterable[str]] = None,
+        tipos_entrega: Optional[Iterable[TipoEntrega]] = None
+    ) -> Dict[TipoEntrega, Dict[str, Optional[CotizacionResult]]]:
+        """
+        Obtiene la opción más económica del contenido de un pedido en cada
+        provincia y tipo de entrega
+        
+        Args:
+            pedido_id: ID del pedido
+            provincias: Provincias a cotizar (None = todas)
+            tipos_entrega: Tipos de entrega (None = todos)
+        
+        Returns:
+            {tipo de entrega: {provincia: mejor cotización o None si no hay opciones}}
+        """
+        pedido = self.session.query(Pedido).filter(Pedido.id == pedido_id).first()
+        if not pedido:
+            raise ValueError(f"Pedido {pedido_id} no encontrado")
+        totales = self.calcular_totales_pedido(pedido)
+        return self.tarifas_compiladas().mejores_por_provincia(totales, provincias, tipos_entrega)
+    
+    def comparar_tipos_entrega(
+        self,
+        pedido_id: int,
+        limite: Optional[int] = None
+    ) -> Dict[TipoEntrega, List[CotizacionResult]]:
+        """
+        Cotiza el contenido de un pedido en todos los tipos de entrega
+        
+        El pedido no se modifica: los totales se calculan una vez y todos los
+        servicios activos se cotizan en una sola pasada con las tarifas
+        compiladas.
+        
+        Args:
+            pedido_id: ID del pedido
+            limite: Número máximo de cotizaciones por tipo (None = todas)
+        
+        Returns:
+            {tipo de entrega: cotizaciones ordenadas por precio} (lista vacía
+            si un tipo no tiene opciones)
+        """
+        pedido = self.session.query(Pedido).filter(Pedido.id == pedido_id).first()
+        if not pedido:
+            raise ValueError(f"Pedido {pedido_id} no encontrado")
+        totales = self.calcular_totales_pedido(pedido)
+        return self.tarifas_compiladas().cotizar_tipos(pedido.provincia_entrega, totales, limite)
+    
+    def cotizar_lote(
+        self,
+        pedido_ids: Optional[Iterable[int]] = None,
+        limite: Optional[int] = 5,
+        memo: Optional[Dict[Tuple[str, str, TipoEntrega], List[CotizacionResult]]] = None
+    ) -> LoteCotizaciones:
+        """
+        Cotiza un lote de pedidos y guarda el resultado en formato compacto
+        
+        Los servicios activos se consultan una sola vez por tipo de entrega
+        y los totales se leen de las columnas desnormalizadas del pedido.
+        Los pedidos con el mismo contenido (hash_contenido), provincia y
+        tipo de entrega se cotizan una sola vez.
+        
+        Args:
+            pedido_ids: IDs de los pedidos a cotizar (None = todos)
+            limite: Número máximo de cotizaciones por pedido (None = todas)
+            memo: Cotizaciones ya calculadas por (hash_contenido, clave de
+                provincia, tipo de entrega), para compartirlas entre varios
+                lotes con las mismas tarifas (se amplía con las calculadas)
+        
+        Returns:
+            LoteCotizaciones con las cotizaciones de cada pedido
+        """
+        query = self.session.query(Pedido)
+        if pedido_ids is not None:
+            query = query.filter(Pedido.id.in_(list(pedido_ids)))
+        
+        servicios_por_tipo: Dict[TipoEntrega, List[ServicioTransportista]] = {}
+        lote = LoteCotizaciones()
+        if memo is None:
+            memo = {}
+        
+        for pedido in query.order_by(Pedido.id).all():
+            clave = None
+            if pedido.hash_contenido is not None:
+                clave = (pedido.hash_contenido, clave_provincia(pedido.provincia_entrega), pedido.tipo_entrega)
+                cotizaciones = memo.get(clave)
+                if cotizaciones is not None:
+                    lote.agregar(pedido.id, cotizaciones[:limite])
+                    continue
+            
+            if pedido.tipo_entrega not in servicios_por_tipo:
+                servicios_por_tipo[pedido.tipo_entrega] = self.obtener_servicios_activos(pedido.tipo_entrega)
+            
+            totales = self.calcular_totales_pedido(pedido)
+            cotizaciones = self.cotizar_servicios(
+                servicios_por_tipo[pedido.tipo_entrega],
                 pedido.provincia_entrega,
                 totales
             )
-            if cotizacion:
-                cotizaciones.append(cotizacion)
-        
-        # Ordenar por precio (menor a mayor)
-        cotizaciones.sort(key=lambda x: x.precio_total)
+            if clave is not None:
+                memo[clave] = cotizaciones
+            lote.agregar(pedido.id, cotizaciones[:limite])
         
-        return cotizaciones[:limite]
+        return lote
     
     def seleccionar_mejor_transportista(
         self,
@@ -258,13 +791,16 @@ class TransportistaSelector:
     
     def comparar_transportistas(
         self,
-        pedido_id: int
+        pedido_id: int,
+        cotizaciones: Optional[List[CotizacionResult]] = None
     ) -> Dict[str, Any]:
         """
         Compara todos los transportistas disponibles para un pedido
         
         Args:
             pedido_id: ID del pedido
+            cotizaciones: Cotizaciones ya calculadas (p. ej. materializadas).
+                Si es None, se calculan en el momento
         
         Returns:
             Diccionario con información del pedido y todas las cotizaciones
@@ -274,7 +810,8 @@ class TransportistaSelector:
             raise ValueError(f"Pedido {pedido_id} no encontrado")
         
         totales = self.calcular_totales_pedido(pedido)
-        cotizaciones = self.obtener_mejores_cotizaciones(pedido_id, limite=100)
+        if cotizaciones is None:
+            cotizaciones = self.obtener_mejores_cotizaciones(pedido_id, limite=100)
         
         return {
             'pedido': {
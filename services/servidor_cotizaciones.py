@@ -0,0 +1,462 @@
+"""
+Servidor HTTP de cotizaciones (biblioteca estándar)
+
+Proceso residente que mantiene en memoria el gestor de la base de datos,
+las tarifas compiladas (con recarga en caliente) y una caché con las
+medidas de los productos, de modo que varias aplicaciones comparten el
+mismo estado ya preparado en lugar de crear sesiones y compilar tarifas en
+cada llamada.
+
+Rutas (JSON):
+    GET  /salud                      Estado y métricas del servidor
+    GET  /pedidos/<id>/mejor         Opción más económica de un pedido
+    GET  /pedidos/<id>/comparacion   Comparación completa de transportistas
+    POST /cotizar/carrito            {"lineas": [[producto_id, cantidad], ...],
+                                      "tipo_entrega": "pie_calle",
+                                      "provincia": "Madrid" | "codigo_postal": "28001",
+                                      "limite": 5}
+    POST /cotizar/lote               {"pedido_ids": [1, 2, 3], "limite": 5}
+
+Las peticiones se atienden en hilos (ThreadingHTTPServer): las tarifas
+compiladas son de solo lectura y cada petición que consulta la base de
+datos usa su propia sesión.
+
+Ejemplo:
+    servicio = ServicioCotizaciones(get_db_manager())
+    servidor = crear_servidor(servicio, "127.0.0.1", 8080)
+    servidor.serve_forever()
+"""
+
+from typing import List, Optional, Dict, Tuple, Any, Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from decimal import Decimal
+import json
+import re
+import threading
+import time
+
+from sqlalchemy import select
+
+from models.models import Producto, TipoEntrega
+from models.provincias import provincia_codigo_postal
+from database.db_manager import DatabaseManager
+from services.selector import TransportistaSelector, CotizacionResult
+from services.recarga_tarifas import RecargadorTarifas
+from services.cotizador_async import datos_pedidos, cotizar_datos
+from services.agrupador_cotizaciones import AgrupadorCotizaciones, MAX_LOTE as MAX_MICRO_LOTE, MAX_ESPERA
+
+
+TTL_PRODUCTOS = 60.0  # Segundos hasta recargar la caché de productos
+
+# Segundos mínimos entre recargas de productos por códigos desconocidos
+RECARGA_MINIMA_PRODUCTOS = 1.0
+
+MAX_LOTE = 10000  # Pedidos por petición de lote
+
+MAX_CUERPO = 10 * 1024 * 1024  # Bytes del cuerpo de una petición
+
+
+class RecursoNoEncontrado(LookupError):
+    """El pedido o la ruta solicitados no existen"""
+
+
+class CacheProductos:
+    """
+    Medidas (peso y volumen) de todos los productos en memoria
+
+    El catálogo se carga con una sola consulta y se recarga cuando ha pasado
+    el tiempo de vida o cuando se pide un producto que no está (producto
+    nuevo, como mucho una vez por RECARGA_MINIMA_PRODUCTOS).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, ttl: float = TTL_PRODUCTOS):
+        """
+        Args:
+            db_manager: Gestor de la base de datos
+            ttl: Segundos hasta recargar el catálogo
+        """
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.cargas = 0
+        self._medidas: Dict[int, Tuple[Decimal, Decimal]] = {}
+        self._cargado = None  # time.monotonic() de la última carga
+        self._bloqueo = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._medidas)
+
+    def cargar(self):
+        """Lee el catálogo completo y sustituye la caché"""
+        with self._bloqueo:
+            with self.db_manager.get_session() as session:
+                medidas = {
+                    producto_id: (Decimal(str(peso_kg)), Decimal(str(volumen_m3)))
+                    for producto_id, peso_kg, volumen_m3 in session.execute(
+                        select(Producto.id, Producto.peso_kg, Producto.volumen_m3)
+                    )
+                }
+            self._medidas = medidas
+            self._cargado = time.monotonic()
+            self.cargas += 1
+
+    def calcular_totales(self, lineas: Iterable[Tuple[int, int]]) -> Dict[str, Decimal]:
+        """
+        Calcula los totales de un carrito (mismo cálculo que TransportistaSelector)
+
+        Args:
+            lineas: Pares (producto_id, cantidad)
+
+        Returns:
+            Dict con peso_total, volumen_total y palets_total
+
+        Raises:
+            ValueError: Si algún producto no existe
+        """
+        lineas = list(lineas)
+        if self._cargado is None or time.monotonic() - self._cargado > self.ttl:
+            self.cargar()
+        medidas = self._medidas
+        faltan = {producto_id for producto_id, _ in lineas} - medidas.keys()
+        if faltan and time.monotonic() - self._cargado > RECARGA_MINIMA_PRODUCTOS:
+            self.cargar()
+            medidas = self._medidas
+            faltan -= medidas.keys()
+        if faltan:
+            raise ValueError(f"Productos no encontrados: {sorted(faltan)}")
+
+        peso_total = Decimal('0')
+        volumen_total = Decimal('0')
+        for producto_id, cantidad in lineas:
+            peso_kg, volumen_m3 = medidas[producto_id]
+            peso_total += peso_kg * cantidad
+            volumen_total += volumen_m3 * cantidad
+        return {
+            'peso_total': peso_total,
+            'volumen_total': volumen_total,
+            'palets_total': volumen_total / Decimal('2')
+        }
+
+
+class MetricasServidor:
+    """Contadores de peticiones del servidor"""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self._bloqueo = threading.Lock()
+        self._rutas: Dict[str, List[float]] = {}  # ruta -> [peticiones, errores, segundos]
+
+    def registrar(self, ruta: str, segundos: float, error: bool):
+        with self._bloqueo:
+            contadores = self._rutas.setdefault(ruta, [0, 0, 0.0])
+            contadores[0] += 1
+            contadores[1] += error
+            contadores[2] += segundos
+
+    def como_dict(self) -> Dict[str, Any]:
+        with self._bloqueo:
+            return {
+                'activo_segundos': round(time.time() - self.inicio, 1),
+                'rutas': {
+                    ruta: {
+                        'peticiones': peticiones,
+                        'errores': errores,
+                        'tiempo_medio_ms': round(segundos / peticiones * 1000, 3)
+                    }
+                    for ruta, (peticiones, errores, segundos) in sorted(self._rutas.items())
+                }
+            }
+
+
+def cotizacion_a_dict(cotizacion: CotizacionResult) -> Dict[str, Any]:
+    """Representación JSON de una cotización"""
+    return {
+        'transportista_id': cotizacion.transportista_id,
+        'transportista': cotizacion.transportista_nombre,
+        'servicio_id': cotizacion.servicio_id,
+        'tipo_entrega': cotizacion.tipo_entrega,
+        'metodo_calculo': cotizacion.metodo_calculo,
+        'precio_total': float(cotizacion.precio_total),
+        'cantidad_calculada': float(cotizacion.cantidad_calculada),
+        'unidad': cotizacion.unidad,
+        'tarifa_id': cotizacion.tarifa_id,
+        'provincia_tarifa': cotizacion.provincia,
+        'rango_min': float(cotizacion.rango_min),
+        'rango_max': float(cotizacion.rango_max) if cotizacion.rango_max is not None else None,
+        'detalles': cotizacion.detalles
+    }
+
+
+def _es_entero(valor) -> bool:
+    """Indica si un valor JSON es un entero (los booleanos y 1.9 no lo son)"""
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _limite(valor, por_defecto: Optional[int]) -> Optional[int]:
+    """Valida el límite de cotizaciones recibido (None = todas)"""
+    if valor is None:
+        return por_defecto
+    if isinstance(valor, str):
+        valor = int(valor) if valor.isdigit() else -1
+    if not _es_entero(valor) or valor < 1:
+        raise ValueError("El límite debe ser un entero positivo")
+    return valor
+
+
+class ServicioCotizaciones:
+    """Estado compartido del servidor y lógica de cada ruta"""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        recargador: Optional[RecargadorTarifas] = None,
+        ttl_productos: float = TTL_PRODUCTOS,
+        max_micro_lote: int = MAX_MICRO_LOTE,
+        max_espera: float = MAX_ESPERA
+    ):
+        """
+        Args:
+            db_manager: Gestor de la base de datos
+            recargador: Recargador de tarifas. Si no se indica, se crea uno
+                propio que se detiene con detener()
+            ttl_productos: Segundos hasta recargar la caché de productos
+            max_micro_lote: Peticiones de /mejor resueltas juntas como máximo
+            max_espera: Segundos como máximo que una petición de /mejor
+                espera a que lleguen más para resolverlas juntas
+        """
+        self.db_manager = db_manager
+        self.recargador = recargador or RecargadorTarifas(db_manager)
+        self._recargador_propio = recargador is None
+        self.productos = CacheProductos(db_manager, ttl_productos)
+        self.agrupador = AgrupadorCotizaciones(db_manager, self.recargador, max_micro_lote, max_espera)
+        self.metricas = MetricasServidor()
+
+    def iniciar(self):
+        """Compila las tarifas, carga los productos e inicia la recarga en caliente"""
+        self.recargador.iniciar()
+        self.productos.cargar()
+        self.agrupador.iniciar()
+
+    def detener(self):
+        """Detiene el agrupador y la recarga de tarifas (si es propia)"""
+        self.agrupador.detener()
+        if self._recargador_propio:
+            self.recargador.detener()
+
+    def salud(self) -> Dict[str, Any]:
+        """Estado de las cachés y métricas de peticiones"""
+        ultimo_error = self.recargador.ultimo_error
+        return {
+            'estado': 'ok' if ultimo_error is None else 'degradado',
+            'version_tarifas': self.recargador.version,
+            'recargas_tarifas': self.recargador.recargas,
+            'error_recarga': str(ultimo_error) if ultimo_error is not None else None,
+            'productos_en_cache': len(self.productos),
+            'cargas_productos': self.productos.cargas,
+            'micro_lotes': self.agrupador.lotes,
+            'peticiones_por_micro_lote': round(self.agrupador.tamano_medio, 2),
+            **self.metricas.como_dict()
+        }
+
+    def mejor(self, pedido_id: int) -> Dict[str, Any]:
+        """Opción más económica de un pedido (resuelta en micro-lotes con las concurrentes)"""
+        try:
+            cotizaciones = self.agrupador.cotizar(pedido_id, limite=1)
+        except ValueError as e:
+            raise RecursoNoEncontrado(str(e))
+        return {
+            'pedido_id': pedido_id,
+            'mejor_opcion': cotizacion_a_dict(cotizaciones[0]) if cotizaciones else None
+        }
+
+    def comparacion(self, pedido_id: int, limite: Optional[int] = None) -> Dict[str, Any]:
+        """Comparación completa de transportistas de un pedido y coste por tipo de entrega"""
+        tarifas = self.recargador.tarifas
+        with self.db_manager.get_session() as session:
+            try:
+                pedido = datos_pedidos(session, [pedido_id])[pedido_id]
+            except KeyError:
+                raise RecursoNoEncontrado(f"Pedido {pedido_id} no encontrado")
+            tipo_entrega, provincia, totales, _ = pedido
+            por_tipo = tarifas.cotizar_tipos(provincia, totales, limite)
+            comparacion = TransportistaSelector(session).comparar_transportistas(
+                pedido_id, cotizaciones=por_tipo[tipo_entrega]
+            )
+
+        comparacion['pedido_id'] = pedido_id
+        comparacion['mejor_opcion'] = (
+            cotizacion_a_dict(comparacion['mejor_opcion']) if comparacion['mejor_opcion'] else None
+        )
+        comparacion['todas_cotizaciones'] = [cotizacion_a_dict(c) for c in comparacion['todas_cotizaciones']]
+        comparacion['por_tipo_entrega'] = {
+            tipo.value: [cotizacion_a_dict(c) for c in cotizaciones]
+            for tipo, cotizaciones in por_tipo.items()
+        }
+        return comparacion
+
+    def carrito(self, peticion: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cotiza un carrito con los productos de la caché (sin consultas)
+
+        Raises:
+            ValueError: Si la petición no es válida o algún producto no existe
+        """
+        try:
+            lineas = [(producto_id, cantidad) for producto_id, cantidad in peticion['lineas']]
+            tipo_entrega = TipoEntrega(peticion['tipo_entrega'])
+            # Sin conversiones: int() truncaría una cantidad de 1.9 a 1
+            if not all(_es_entero(producto_id) and _es_entero(cantidad) for producto_id, cantidad in lineas):
+                raise ValueError
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(
+                "La petición debe incluir 'lineas' ([[producto_id, cantidad], ...] con enteros) "
+                f"y 'tipo_entrega' ({', '.join(tipo.value for tipo in TipoEntrega)})"
+            )
+        if not lineas or any(cantidad < 1 for _, cantidad in lineas):
+            raise ValueError("El carrito debe tener al menos una línea con cantidad positiva")
+
+        provincia = peticion.get('provincia')
+        if not provincia:
+            codigo_postal = peticion.get('codigo_postal')
+            provincia = provincia_codigo_postal(codigo_postal)
+            if provincia is None:
+                raise ValueError(f"Código postal no válido: {codigo_postal}")
+
+        limite = _limite(peticion.get('limite'), 5)
+        totales = self.productos.calcular_totales(lineas)
+        cotizaciones = self.recargador.tarifas.cotizar(tipo_entrega, provincia, totales, limite)
+        return {
+            'provincia': provincia,
+            'tipo_entrega': tipo_entrega.value,
+            'peso_total_kg': float(totales['peso_total']),
+            'volumen_total_m3': float(totales['volumen_total']),
+            'palets_total': float(totales['palets_total']),
+            'cotizaciones': [cotizacion_a_dict(c) for c in cotizaciones]
+        }
+
+    def lote(self, peticion: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cotiza un lote de pedidos con una consulta por cada 500 pedidos
+
+        Raises:
+            ValueError: Si la petición no es válida
+        """
+        pedido_ids = peticion.get('pedido_ids')
+        if not isinstance(pedido_ids, list) or not all(_es_entero(pedido_id) for pedido_id in pedido_ids):
+            raise ValueError("La petición debe incluir 'pedido_ids' (lista de enteros)")
+        if len(pedido_ids) > MAX_LOTE:
+            raise ValueError(f"Como máximo {MAX_LOTE} pedidos por petición")
+
+        limite = _limite(peticion.get('limite'), 5)
+        tarifas = self.recargador.tarifas
+        with self.db_manager.get_session() as session:
+            lote = cotizar_datos(tarifas, datos_pedidos(session, pedido_ids), limite)
+        encontrados = set(lote.pedido_ids())
+        return {
+            'cotizaciones': {
+                str(pedido_id): [cotizacion_a_dict(c) for c in lote.cotizaciones_pedido(pedido_id)]
+                for pedido_id in lote.pedido_ids()
+            },
+            'no_encontrados': sorted(set(pedido_ids) - encontrados)
+        }
+
+
+_RUTA_PEDIDO = re.compile(r'^/pedidos/(\d+)/(mejor|comparacion)$')
+
+
+class ManejadorCotizaciones(BaseHTTPRequestHandler):
+    """Atiende las peticiones HTTP con el ServicioCotizaciones del servidor"""
+
+    server_version = "Cotizaciones/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Las peticiones se contabilizan en /salud
+
+    def _responder(self, codigo: int, datos: Dict[str, Any]):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _leer_json(self) -> Dict[str, Any]:
+        try:
+            longitud = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            longitud = -1
+        # rfile.read() con una longitud negativa esperaría al cierre de la conexión
+        if longitud < 0:
+            raise ValueError("Content-Length no válido")
+        if longitud > MAX_CUERPO:
+            raise ValueError("Petición demasiado grande")
+        try:
+            peticion = json.loads(self.rfile.read(longitud) or b'{}')
+        except ValueError:
+            raise ValueError("El cuerpo de la petición no es JSON válido")
+        if not isinstance(peticion, dict):
+            raise ValueError("El cuerpo de la petición debe ser un objeto JSON")
+        return peticion
+
+    def _atender(self, metodo: str):
+        servicio: ServicioCotizaciones = self.server.servicio
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip('/') or '/'
+        nombre_ruta = ruta
+        inicio = time.perf_counter()
+        codigo = 200
+        try:
+            coincidencia = _RUTA_PEDIDO.match(ruta)
+            if metodo == 'GET' and ruta == '/salud':
+                datos = servicio.salud()
+            elif metodo == 'GET' and coincidencia:
+                pedido_id, accion = int(coincidencia.group(1)), coincidencia.group(2)
+                nombre_ruta = f'/pedidos/{{id}}/{accion}'
+                if accion == 'mejor':
+                    datos = servicio.mejor(pedido_id)
+                else:
+                    limite = _limite(parse_qs(url.query).get('limite', [None])[0], None)
+                    datos = servicio.comparacion(pedido_id, limite)
+            elif metodo == 'POST' and ruta == '/cotizar/carrito':
+                datos = servicio.carrito(self._leer_json())
+            elif metodo == 'POST' and ruta == '/cotizar/lote':
+                datos = servicio.lote(self._leer_json())
+            else:
+                nombre_ruta = 'otras'
+                raise RecursoNoEncontrado(f"Ruta no encontrada: {metodo} {ruta}")
+        except RecursoNoEncontrado as e:
+            codigo, datos = 404, {'error': str(e)}
+        except ValueError as e:
+            codigo, datos = 400, {'error': str(e)}
+        except Exception as e:
+            codigo, datos = 500, {'error': f"Error interno: {e}"}
+
+        self._responder(codigo, datos)
+        if nombre_ruta != '/salud':
+            servicio.metricas.registrar(
+                f'{metodo} {nombre_ruta}', time.perf_counter() - inicio, codigo >= 400
+            )
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+
+def crear_servidor(servicio: ServicioCotizaciones, host: str = "127.0.0.1", puerto: int = 8080) -> ThreadingHTTPServer:
+    """
+    Crea el servidor HTTP (no lo arranca; usar serve_forever())
+
+    Args:
+        servicio: Estado compartido (ya iniciado o no)
+        host: Dirección en la que escuchar
+        puerto: Puerto (0 = uno libre)
+
+    Returns:
+        ThreadingHTTPServer con el servicio en el atributo `servicio`
+    """
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorCotizaciones)
+    servidor.daemon_threads = True
+    servidor.servicio = servicio
+    return servidor
@@ -0,0 +1,570 @@
+"""
+Tarifas compiladas
+
+Estructura de solo lectura con todo lo que necesita el selector para
+cotizar (servicios activos, zonas y tarifas en el esquema entero), pensada
+para procesos de cotización que no deben consultar la base de datos:
+
+- Los rangos de cada (servicio, clave de provincia o zona) se resuelven al
+  compilar en tramos disjuntos ordenados, cada uno con la tarifa que gana
+  por precedencia (menor ID), de modo que la búsqueda es una bisección.
+- Se guarda en un archivo binario compacto con cabecera (formato y versión
+  de tarifas) y arrays de enteros de 64 bits.
+- Al cargarlo, el archivo se proyecta en memoria con mmap y los arrays se
+  leen sin copiarlos: los procesos hijos (fork) comparten las páginas y
+  solo se crean en cada proceso los índices pequeños (grupos y zonas).
+
+Ejemplo:
+    TarifasCompiladas.compilar(session).guardar("tarifas.bin")
+    tarifas = TarifasCompiladas.cargar("tarifas.bin")
+    cotizaciones = tarifas.cotizar(TipoEntrega.PIE_CALLE, "Madrid", totales)
+"""
+
+from typing import List, Optional, Dict, Tuple, Sequence, Iterable
+from array import array
+from bisect import bisect_right
+from decimal import Decimal
+import heapq
+import mmap
+import os
+import struct
+import sys
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.models import (
+    Transportista, ServicioTransportista, Tarifa, ZonaProvincia, TipoEntrega, MetodoCalculo
+)
+from models.unidades import a_entero, desde_entero, FACTORES_METODO, FACTOR_PRECIO
+from models.provincias import clave_provincia, nombre_provincia, PROVINCIAS, CLAVE_NACIONAL
+from database.versiones import obtener_version
+from services.selector import CotizacionResult
+
+
+MAGICO = b'TARIFCMP'
+FORMATO = 1
+
+# Cabecera: mágico, formato, orden de bytes (1 = little endian), versión de
+# tarifas y tamaños de las secciones
+_CABECERA = struct.Struct('<8sIIq7q')
+
+# Límite superior de los rangos sin máximo
+SIN_LIMITE = 2 ** 63 - 1
+
+# Totales del pedido usados por cada método de cálculo
+_TOTAL_METODO = {
+    MetodoCalculo.PESO: 'peso_total',
+    MetodoCalculo.VOLUMEN: 'volumen_total',
+    MetodoCalculo.PALETS: 'palets_total'
+}
+
+# Campos por fila de las secciones con varias columnas
+_CAMPOS_SERVICIO = 5  # id, transportista_id, nombre del transportista, tipo de entrega, método
+_CAMPOS_GRUPO = 4     # servicio_id, clave de ámbito, primer tramo, fin de tramos
+_CAMPOS_ZONA = 3      # servicio_id, clave de provincia, clave de zona
+
+
+def _tramos(rangos: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """
+    Resuelve rangos que pueden solaparse en tramos disjuntos
+
+    En cada cantidad gana la tarifa de menor ID que la contiene, igual que
+    en el selector. Los tramos contiguos con la misma tarifa se fusionan.
+
+    Args:
+        rangos: Tuplas (tarifa_id, rango_min_ent, rango_max_ent o SIN_LIMITE)
+
+    Returns:
+        Tramos (inicio, fin, tarifa_id) ordenados por inicio
+    """
+    puntos = sorted({r[1] for r in rangos} | {r[2] + 1 for r in rangos if r[2] < SIN_LIMITE})
+    por_minimo = sorted(rangos, key=lambda r: r[1])
+    activos: List[Tuple[int, int]] = []  # Montículo (tarifa_id, rango_max)
+    tramos: List[Tuple[int, int, int]] = []
+    siguiente = 0
+    for posicion, punto in enumerate(puntos):
+        while siguiente < len(por_minimo) and por_minimo[siguiente][1] <= punto:
+            heapq.heappush(activos, (por_minimo[siguiente][0], por_minimo[siguiente][2]))
+            siguiente += 1
+        while activos and activos[0][1] < punto:
+            heapq.heappop(activos)
+        if not activos:
+            continue
+        tarifa_id = activos[0][0]
+        fin = puntos[posicion + 1] - 1 if posicion + 1 < len(puntos) else SIN_LIMITE
+        if tramos and tramos[-1][2] == tarifa_id and tramos[-1][1] + 1 == punto:
+            tramos[-1] = (tramos[-1][0], fin, tarifa_id)
+        else:
+            tramos.append((punto, fin, tarifa_id))
+    return tramos
+
+
+class TarifasCompiladas:
+    """
+    Servicios, zonas y tarifas compilados para cotizar sin base de datos
+
+    Las secciones numéricas son arrays de enteros (array('q') al compilar o
+    vistas de memoria sobre el archivo proyectado al cargar); los textos se
+    guardan una sola vez en una tabla de cadenas.
+    """
+
+    def __init__(self, version: int, secciones: Dict[str, Sequence[int]], cadenas: List[str]):
+        """
+        Inicializa la estructura (usar compilar() o cargar())
+
+        Args:
+            version: Versión de tarifas con la que se compiló
+            secciones: Arrays numéricos por nombre de sección (ver _SECCIONES)
+            cadenas: Tabla de cadenas
+        """
+        self.version = version
+        self._secciones = secciones
+        self._cadenas = cadenas
+        self._mmap: Optional[Tuple[mmap.mmap, memoryview]] = None
+        # Índices creados en la primera consulta
+        self._grupos: Optional[Dict[Tuple[int, str], Tuple[int, int]]] = None
+        self._zonas: Optional[Dict[Tuple[int, str], str]] = None
+        self._servicios: Optional[Dict[TipoEntrega, List[Tuple[int, int, str, MetodoCalculo]]]] = None
+
+    # Orden de las secciones numéricas en el archivo
+    _SECCIONES = (
+        'servicios', 'grupos', 'tramo_inicios', 'tramo_fines', 'tramo_tarifas',
+        'tarifa_ids', 'tarifa_provincias', 'tarifa_minimos', 'tarifa_maximos', 'tarifa_precios',
+        'zonas', 'cadena_posiciones'
+    )
+
+    @classmethod
+    def compilar(cls, session: Session) -> 'TarifasCompiladas':
+        """
+        Compila los servicios activos, sus zonas y sus tarifas
+
+        Args:
+            session: Sesión de base de datos
+
+        Returns:
+            TarifasCompiladas con la versión de tarifas actual
+        """
+        version = obtener_version(session)
+        cadenas: List[str] = []
+        indices: Dict[str, int] = {}
+
+        def cadena(texto: str) -> int:
+            if texto not in indices:
+                indices[texto] = len(cadenas)
+                cadenas.append(texto)
+            return indices[texto]
+
+        secciones = {nombre: array('q') for nombre in cls._SECCIONES}
+
+        servicios = session.execute(
+            select(
+                ServicioTransportista.id, Transportista.id, Transportista.nombre,
+                ServicioTransportista.tipo_entrega, ServicioTransportista.metodo_calculo
+            ).join(Transportista).where(
+                ServicioTransportista.activo == True,
+                Transportista.activo == True
+            ).order_by(ServicioTransportista.id)
+        ).all()
+        activos = set()
+        for servicio_id, transportista_id, nombre, tipo_entrega, metodo in servicios:
+            secciones['servicios'].extend((
+                servicio_id, transportista_id, cadena(nombre), cadena(tipo_entrega.name), cadena(metodo.name)
+            ))
+            activos.add(servicio_id)
+
+        # Rangos por (servicio, ámbito) y datos de cada tarifa
+        rangos: Dict[Tuple[int, str], List[Tuple[int, int, int]]] = {}
+        datos: Dict[int, Tuple[str, int, Optional[int], int]] = {}
+        stmt = select(
+            Tarifa.id, Tarifa.servicio_id, Tarifa.provincia_clave, Tarifa.provincia,
+            Tarifa.rango_min_ent, Tarifa.rango_max_ent, Tarifa.precio_cent
+        )
+        for tarifa_id, servicio_id, ambito, provincia, minimo, maximo, precio in session.execute(stmt):
+            if servicio_id not in activos:
+                continue
+            rangos.setdefault((servicio_id, ambito), []).append(
+                (tarifa_id, minimo, SIN_LIMITE if maximo is None else maximo)
+            )
+            datos[tarifa_id] = (provincia, minimo, maximo, precio)
+
+        posiciones: Dict[int, int] = {}
+        for (servicio_id, ambito) in sorted(rangos):
+            inicio = len(secciones['tramo_inicios'])
+            for tramo_inicio, tramo_fin, tarifa_id in _tramos(rangos[(servicio_id, ambito)]):
+                if tarifa_id not in posiciones:
+                    provincia, minimo, maximo, precio = datos[tarifa_id]
+                    posiciones[tarifa_id] = len(secciones['tarifa_ids'])
+                    secciones['tarifa_ids'].append(tarifa_id)
+                    secciones['tarifa_provincias'].append(cadena(provincia))
+                    secciones['tarifa_minimos'].append(minimo)
+                    secciones['tarifa_maximos'].append(SIN_LIMITE if maximo is None else maximo)
+                    secciones['tarifa_precios'].append(precio)
+                secciones['tramo_inicios'].append(tramo_inicio)
+                secciones['tramo_fines'].append(tramo_fin)
+                secciones['tramo_tarifas'].append(posiciones[tarifa_id])
+            secciones['grupos'].extend((servicio_id, cadena(ambito), inicio, len(secciones['tramo_inicios'])))
+
+        zonas = select(ZonaProvincia.servicio_id, ZonaProvincia.provincia_clave, ZonaProvincia.zona_clave)
+        for servicio_id, provincia_clave, zona_clave in session.execute(zonas):
+            if servicio_id in activos:
+                secciones['zonas'].extend((servicio_id, cadena(provincia_clave), cadena(zona_clave)))
+
+        return cls(version, secciones, cadenas)
+
+    def guardar(self, ruta: str):
+        """
+        Guarda la estructura en un archivo binario
+
+        Se escribe en un archivo temporal que después sustituye al destino,
+        por lo que los procesos que lo estén leyendo no ven un archivo a medias.
+
+        Args:
+            ruta: Ruta del archivo
+        """
+        textos = [texto.encode('utf-8') for texto in self._cadenas]
+        posiciones = array('q', [0])
+        for texto in textos:
+            posiciones.append(posiciones[-1] + len(texto))
+        secciones = dict(self._secciones, cadena_posiciones=posiciones)
+
+        s = secciones
+        cabecera = _CABECERA.pack(
+            MAGICO, FORMATO, 1 if sys.byteorder == 'little' else 0, self.version,
+            len(s['servicios']) // _CAMPOS_SERVICIO, len(s['grupos']) // _CAMPOS_GRUPO,
+            len(s['tramo_inicios']), len(s['tarifa_ids']), len(s['zonas']) // _CAMPOS_ZONA,
+            len(textos), posiciones[-1]
+        )
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'wb') as archivo:
+            archivo.write(cabecera)
+            for nombre in self._SECCIONES:
+                archivo.write(array('q', secciones[nombre]).tobytes())
+            archivo.write(b''.join(textos))
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'TarifasCompiladas':
+        """
+        Carga un archivo de tarifas compiladas proyectándolo en memoria
+
+        Solo se leen la cabecera y la tabla de cadenas; los arrays numéricos
+        se consultan directamente sobre las páginas del archivo.
+
+        Args:
+            ruta: Ruta del archivo generado con guardar()
+
+        Returns:
+            TarifasCompiladas de solo lectura
+
+        Raises:
+            ValueError: Si el archivo no es de tarifas compiladas o es de otro formato
+        """
+        with open(ruta, 'rb') as archivo:
+            datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(datos) < _CABECERA.size:
+            datos.close()
+            raise ValueError(f"Archivo de tarifas compiladas no válido: {ruta}")
+        (magico, formato, little_endian, version, n_servicios, n_grupos,
+         n_tramos, n_tarifas, n_zonas, n_cadenas, tam_texto) = _CABECERA.unpack_from(datos)
+        if magico != MAGICO:
+            datos.close()
+            raise ValueError(f"Archivo de tarifas compiladas no válido: {ruta}")
+        if formato != FORMATO or little_endian != (sys.byteorder == 'little'):
+            datos.close()
+            raise ValueError(f"Formato de tarifas compiladas no compatible: {ruta} (formato {formato})")
+
+        tamanos = {
+            'servicios': n_servicios * _CAMPOS_SERVICIO,
+            'grupos': n_grupos * _CAMPOS_GRUPO,
+            'tramo_inicios': n_tramos, 'tramo_fines': n_tramos, 'tramo_tarifas': n_tramos,
+            'tarifa_ids': n_tarifas, 'tarifa_provincias': n_tarifas, 'tarifa_minimos': n_tarifas,
+            'tarifa_maximos': n_tarifas, 'tarifa_precios': n_tarifas,
+            'zonas': n_zonas * _CAMPOS_ZONA,
+            'cadena_posiciones': n_cadenas + 1
+        }
+        vista = memoryview(datos)
+        secciones = {}
+        desplazamiento = _CABECERA.size
+        for nombre in cls._SECCIONES:
+            fin = desplazamiento + tamanos[nombre] * 8
+            secciones[nombre] = vista[desplazamiento:fin].cast('q')
+            desplazamiento = fin
+
+        posiciones = secciones['cadena_posiciones']
+        texto = datos[desplazamiento:desplazamiento + tam_texto]
+        cadenas = [
+            texto[posiciones[i]:posiciones[i + 1]].decode('utf-8')
+            for i in range(n_cadenas)
+        ]
+
+        compiladas = cls(version, secciones, cadenas)
+        compiladas._mmap = (datos, vista)
+        return compiladas
+
+    def _indice_grupos(self) -> Dict[Tuple[int, str], Tuple[int, int]]:
+        if self._grupos is None:
+            grupos = self._secciones['grupos']
+            self._grupos = {
+                (grupos[i], self._cadenas[grupos[i + 1]]): (grupos[i + 2], grupos[i + 3])
+                for i in range(0, len(grupos), _CAMPOS_GRUPO)
+            }
+        return self._grupos
+
+    def _indice_zonas(self) -> Dict[Tuple[int, str], str]:
+        if self._zonas is None:
+            zonas = self._secciones['zonas']
+            self._zonas = {
+                (zonas[i], self._cadenas[zonas[i + 1]]): self._cadenas[zonas[i + 2]]
+                for i in range(0, len(zonas), _CAMPOS_ZONA)
+            }
+        return self._zonas
+
+    def servicios(self, tipo_entrega: TipoEntrega) -> List[Tuple[int, int, str, MetodoCalculo]]:
+        """
+        Servicios activos de un tipo de entrega, ordenados por ID
+
+        Returns:
+            Tuplas (servicio_id, transportista_id, nombre del transportista, método de cálculo)
+        """
+        if self._servicios is None:
+            servicios = self._secciones['servicios']
+            cadenas = self._cadenas
+            self._servicios = {}
+            for i in range(0, len(servicios), _CAMPOS_SERVICIO):
+                tipo = TipoEntrega[cadenas[servicios[i + 3]]]
+                self._servicios.setdefault(tipo, []).append((
+                    servicios[i], servicios[i + 1], cadenas[servicios[i + 2]],
+                    MetodoCalculo[cadenas[servicios[i + 4]]]
+                ))
+        return self._servicios.get(tipo_entrega, [])
+
+    def zona(self, servicio_id: int, provincia: str) -> Optional[str]:
+        """Clave de la zona de una provincia para el servicio (None si no tiene)"""
+        return self._indice_zonas().get((servicio_id, clave_provincia(provincia)))
+
+    def _posicion_tarifa(self, servicio_id: int, ambito: str, cantidad_ent: int) -> Optional[int]:
+        """Posición de la tarifa de un (servicio, clave de ámbito) cuyo tramo contiene la cantidad"""
+        grupo = self._indice_grupos().get((servicio_id, ambito))
+        if grupo is None:
+            return None
+        inicio, fin = grupo
+        s = self._secciones
+        tramo = bisect_right(s['tramo_inicios'], cantidad_ent, inicio, fin) - 1
+        if tramo >= inicio and cantidad_ent <= s['tramo_fines'][tramo]:
+            return s['tramo_tarifas'][tramo]
+        return None
+
+    def _tarifa(self, posicion: int):
+        """Tupla (id, provincia, rango_min_ent, rango_max_ent, precio_cent) de una posición"""
+        s = self._secciones
+        maximo = s['tarifa_maximos'][posicion]
+        return (
+            s['tarifa_ids'][posicion],
+            self._cadenas[s['tarifa_provincias'][posicion]],
+            s['tarifa_minimos'][posicion],
+            None if maximo == SIN_LIMITE else maximo,
+            s['tarifa_precios'][posicion]
+        )
+
+    def buscar_tarifa(self, servicio_id: int, provincia: str, cantidad_ent: int):
+        """
+        Busca la tarifa aplicable con la misma precedencia que el selector
+
+        Args:
+            servicio_id: ID del servicio
+            provincia: Provincia de entrega
+            cantidad_ent: Cantidad en la unidad entera del método
+
+        Returns:
+            Tupla (id, provincia, rango_min_ent, rango_max_ent, precio_cent) o None
+        """
+        provincia_clave = clave_provincia(provincia)
+        ambitos = [provincia_clave]
+        zona_clave = self._indice_zonas().get((servicio_id, provincia_clave))
+        if zona_clave is not None:
+            ambitos.append(zona_clave)
+        ambitos.append(CLAVE_NACIONAL)
+
+        for ambito in ambitos:
+            posicion = self._posicion_tarifa(servicio_id, ambito, cantidad_ent)
+            if posicion is not None:
+                return self._tarifa(posicion)
+        return None
+
+    def _resultado(
+        self,
+        servicio: Tuple[int, int, str, MetodoCalculo],
+        tipo_entrega: TipoEntrega,
+        cantidad: Decimal,
+        tarifa
+    ) -> CotizacionResult:
+        """Construye la cotización de un servicio con la tarifa encontrada"""
+        servicio_id, transportista_id, nombre, metodo = servicio
+        factor = FACTORES_METODO[metodo]
+        tarifa_id, tarifa_provincia, rango_min_ent, rango_max_ent, precio_cent = tarifa
+        return CotizacionResult(
+            transportista_id=transportista_id,
+            transportista_nombre=nombre,
+            servicio_id=servicio_id,
+            tipo_entrega=tipo_entrega.value,
+            metodo_calculo=metodo.value,
+            precio_total=desde_entero(precio_cent, FACTOR_PRECIO),
+            cantidad_calculada=cantidad,
+            tarifa_id=tarifa_id,
+            provincia=tarifa_provincia,
+            rango_min=desde_entero(rango_min_ent, factor),
+            rango_max=desde_entero(rango_max_ent, factor)
+        )
+
+    def cotizar(
+        self,
+        tipo_entrega: TipoEntrega,
+        provincia: str,
+        totales: Dict[str, Decimal],
+        limite: Optional[int] = None
+    ) -> List[CotizacionResult]:
+        """
+        Cotiza unos totales con los servicios compilados
+
+        Devuelve el mismo ranking que TransportistaSelector con las tarifas
+        de la versión compilada.
+
+        Args:
+            tipo_entrega: Tipo de entrega del pedido
+            provincia: Provincia de entrega
+            totales: Dict con peso_total, volumen_total y palets_total
+            limite: Número máximo de cotizaciones (None = todas)
+
+        Returns:
+            Lista de cotizaciones ordenadas por precio (menor a mayor)
+        """
+        return self.cotizar_tipos(provincia, totales, limite, [tipo_entrega])[tipo_entrega]
+
+    def cotizar_tipos(
+        self,
+        provincia: str,
+        totales: Dict[str, Decimal],
+        limite: Optional[int] = None,
+        tipos_entrega: Optional[Iterable[TipoEntrega]] = None
+    ) -> Dict[TipoEntrega, List[CotizacionResult]]:
+        """
+        Cotiza unos totales en varios tipos de entrega en una sola pasada
+
+        Las cantidades enteras se calculan una vez por método de cálculo y
+        cada servicio se cotiza una sola vez, agrupando el resultado por su
+        tipo de entrega.
+
+        Args:
+            provincia: Provincia de entrega
+            totales: Dict con peso_total, volumen_total y palets_total
+            limite: Número máximo de cotizaciones por tipo (None = todas)
+            tipos_entrega: Tipos de entrega (None = todos)
+
+        Returns:
+            {tipo de entrega: cotizaciones ordenadas por precio}, con una
+            lista vacía para los tipos sin opciones
+        """
+        cantidades = {
+            metodo: (totales[campo], a_entero(totales[campo], FACTORES_METODO[metodo]))
+            for metodo, campo in _TOTAL_METODO.items()
+        }
+        resultado: Dict[TipoEntrega, List[CotizacionResult]] = {}
+        for tipo_entrega in (tipos_entrega if tipos_entrega is not None else TipoEntrega):
+            cotizaciones = []
+            for servicio in self.servicios(tipo_entrega):
+                cantidad, cantidad_ent = cantidades[servicio[3]]
+                tarifa = self.buscar_tarifa(servicio[0], provincia, cantidad_ent)
+                if tarifa is not None:
+                    cotizaciones.append(self._resultado(servicio, tipo_entrega, cantidad, tarifa))
+            cotizaciones.sort(key=lambda x: x.precio_total)
+            resultado[tipo_entrega] = cotizaciones[:limite]
+        return resultado
+
+    def mejores_por_provincia(
+        self,
+        totales: Dict[str, Decimal],
+        provincias: Optional[Iterable[str]] = None,
+        tipos_entrega: Optional[Iterable[TipoEntrega]] = None
+    ) -> Dict[TipoEntrega, Dict[str, Optional[CotizacionResult]]]:
+        """
+        Obtiene la cotización más económica de unos totales en muchas provincias
+
+        Para cada servicio la cantidad se convierte una sola vez y cada
+        ámbito (provincia, zona o NACIONAL) se busca una sola vez para todas
+        las provincias que lo usan; después cada provincia solo compara
+        precios enteros. El resultado coincide con cotizar() provincia a
+        provincia.
+
+        Args:
+            totales: Dict con peso_total, volumen_total y palets_total
+            provincias: Provincias a cotizar (None = todas las provincias)
+            tipos_entrega: Tipos de entrega (None = todos)
+
+        Returns:
+            {tipo de entrega: {provincia: mejor cotización o None}} con las
+            provincias en el orden indicado y por su nombre oficial
+        """
+        nombres = [nombre_provincia(p) for p in (provincias if provincias is not None else PROVINCIAS)]
+        claves = [clave_provincia(nombre) for nombre in nombres]
+        zonas = self._indice_zonas()
+
+        resultado: Dict[TipoEntrega, Dict[str, Optional[CotizacionResult]]] = {}
+        for tipo_entrega in (tipos_entrega if tipos_entrega is not None else TipoEntrega):
+            # Mejor opción de cada provincia: (precio_cent, servicio, cantidad, posición)
+            mejores: List[Optional[tuple]] = [None] * len(claves)
+            for servicio in self.servicios(tipo_entrega):
+                servicio_id, metodo = servicio[0], servicio[3]
+                cantidad = totales[_TOTAL_METODO[metodo]]
+                cantidad_ent = a_entero(cantidad, FACTORES_METODO[metodo])
+                posiciones: Dict[str, Optional[int]] = {}  # Ámbito -> tarifa (una búsqueda por ámbito)
+
+                def posicion_ambito(ambito: str) -> Optional[int]:
+                    if ambito not in posiciones:
+                        posiciones[ambito] = self._posicion_tarifa(servicio_id, ambito, cantidad_ent)
+                    return posiciones[ambito]
+
+                nacional = posicion_ambito(CLAVE_NACIONAL)
+                precios = self._secciones['tarifa_precios']
+                for i, clave in enumerate(claves):
+                    posicion = posicion_ambito(clave)
+                    if posicion is None:
+                        zona = zonas.get((servicio_id, clave))
+                        if zona is not None:
+                            posicion = posicion_ambito(zona)
+                        if posicion is None:
+                            posicion = nacional
+                    if posicion is None:
+                        continue
+                    precio = precios[posicion]
+                    # Servicios en orden de ID: en caso de empate gana el primero, como en cotizar()
+                    if mejores[i] is None or precio < mejores[i][0]:
+                        mejores[i] = (precio, servicio, cantidad, posicion)
+
+            resultado[tipo_entrega] = {
+                nombre: (
+                    self._resultado(mejor[1], tipo_entrega, mejor[2], self._tarifa(mejor[3]))
+                    if mejor is not None else None
+                )
+                for nombre, mejor in zip(nombres, mejores)
+            }
+        return resultado
+
+    def vigente(self, session: Session) -> bool:
+        """Indica si la estructura corresponde a la versión de tarifas actual"""
+        return self.version == obtener_version(session)
+
+    def cerrar(self):
+        """Libera la proyección en memoria del archivo (si se cargó de uno)"""
+        if self._mmap is not None:
+            datos, vista = self._mmap
+            for seccion in self._secciones.values():
+                seccion.release()
+            vista.release()
+            datos.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        """Número de tarifas compiladas"""
+        return len(self._secciones['tarifa_ids'])
@@ -0,0 +1,331 @@
+"""
+Validación de rangos de tarifas
+
+Recorre las tarifas agrupadas por (servicio, clave de provincia) con un
+barrido sobre los rangos ordenados (O(n log n)) y detecta:
+
+- Rangos inválidos (rango_max menor que rango_min)
+- Solapamientos: una cantidad con dos tarifas posibles del mismo grupo
+- Rangos inalcanzables: cubiertos por completo por tarifas con más precedencia
+- Huecos: cantidades sin tarifa (en provincias, solo si NACIONAL no las cubre)
+- Servicios activos sin tarifa NACIONAL de respaldo
+- Tramos NACIONAL ocultos por la tarifa específica de una provincia
+
+Puede validar las tarifas de la base de datos o un lote de importación antes
+de aplicarlo (tarifas actuales + filas nuevas del staging).
+"""
+
+from typing import List, Optional, Dict, Iterable, Tuple
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from enum import Enum
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from models.models import ServicioTransportista, Tarifa, TarifaStaging
+from models.provincias import nombre_provincia, CLAVE_NACIONAL
+
+
+INFINITO = Decimal('Infinity')
+
+# Rango a validar: (servicio_id, clave de provincia, rango_min, rango_max, precedencia, referencia)
+# La precedencia reproduce el desempate del selector (menor ID primero)
+Rango = Tuple[int, str, Decimal, Decimal, int, str]
+
+
+class TipoIncidencia(Enum):
+    """Tipos de incidencia detectados por el validador"""
+    RANGO_INVALIDO = "rango_invalido"
+    SOLAPAMIENTO = "solapamiento"
+    INALCANZABLE = "inalcanzable"
+    HUECO = "hueco"
+    SIN_NACIONAL = "sin_nacional"
+    OCULTA_POR_PROVINCIA = "oculta_por_provincia"
+
+
+# Incidencias que provocan cotizaciones ambiguas o tarifas que nunca se aplican
+TIPOS_ERROR = {TipoIncidencia.RANGO_INVALIDO, TipoIncidencia.SOLAPAMIENTO, TipoIncidencia.INALCANZABLE}
+
+
+@dataclass
+class Incidencia:
+    """Incidencia encontrada en los rangos de un servicio y provincia"""
+    tipo: TipoIncidencia
+    servicio_id: int
+    provincia: Optional[str]
+    mensaje: str
+
+    @property
+    def es_error(self) -> bool:
+        return self.tipo in TIPOS_ERROR
+
+    def __str__(self):
+        provincia = f" / {self.provincia}" if self.provincia else ""
+        return f"Servicio {self.servicio_id}{provincia}: {self.mensaje}"
+
+
+@dataclass
+class ResultadoValidacion:
+    """Resultado de la validación de un conjunto de tarifas"""
+    incidencias: List[Incidencia] = field(default_factory=list)
+    tarifas_revisadas: int = 0
+
+    @property
+    def errores(self) -> List[Incidencia]:
+        return [i for i in self.incidencias if i.es_error]
+
+    @property
+    def avisos(self) -> List[Incidencia]:
+        return [i for i in self.incidencias if not i.es_error]
+
+    def contar_por_tipo(self) -> Dict[TipoIncidencia, int]:
+        return dict(Counter(i.tipo for i in self.incidencias))
+
+
+def _formato(valor: Decimal) -> str:
+    """Representa un extremo de rango (infinito como ∞)"""
+    return "∞" if valor == INFINITO else f"{valor}"
+
+
+def _fusionar(intervalos: Iterable[Tuple[Decimal, Decimal]]) -> Tuple[List[Decimal], List[Decimal]]:
+    """
+    Fusiona intervalos cerrados en una unión ordenada y disjunta
+
+    Los intervalos que se tocan (10-25 y 25-50) se fusionan, ya que ambos
+    extremos son inclusivos.
+
+    Returns:
+        Tupla (mínimos, máximos) ordenada para buscar por bisección
+    """
+    minimos: List[Decimal] = []
+    maximos: List[Decimal] = []
+    for inicio, fin in sorted(intervalos):
+        if minimos and inicio <= maximos[-1]:
+            if fin > maximos[-1]:
+                maximos[-1] = fin
+        else:
+            minimos.append(inicio)
+            maximos.append(fin)
+    return minimos, maximos
+
+
+def _cubierto(union: Tuple[List[Decimal], List[Decimal]], inicio: Decimal, fin: Decimal) -> bool:
+    """Indica si [inicio, fin] está contenido en una unión fusionada"""
+    minimos, maximos = union
+    pos = bisect_right(minimos, inicio) - 1
+    return pos >= 0 and maximos[pos] >= fin
+
+
+class _UnionIntervalos:
+    """Unión de intervalos cerrados que admite inserciones (para el barrido por precedencia)"""
+
+    def __init__(self):
+        self.minimos: List[Decimal] = []
+        self.maximos: List[Decimal] = []
+
+    def contiene(self, inicio: Decimal, fin: Decimal) -> bool:
+        return _cubierto((self.minimos, self.maximos), inicio, fin)
+
+    def agregar(self, inicio: Decimal, fin: Decimal):
+        # Primer intervalo que puede tocar a [inicio, fin] y último que empieza dentro
+        pos = bisect_right(self.minimos, inicio) - 1
+        if pos < 0 or self.maximos[pos] < inicio:
+            pos += 1
+        ultimo = bisect_right(self.minimos, fin)
+        if pos < ultimo:
+            inicio = min(inicio, self.minimos[pos])
+            fin = max(fin, self.maximos[ultimo - 1])
+        self.minimos[pos:ultimo] = [inicio]
+        self.maximos[pos:ultimo] = [fin]
+
+
+class ValidadorTarifas:
+    """Valida los rangos de las tarifas por servicio y provincia"""
+
+    def __init__(self, session: Session):
+        """
+        Inicializa el validador
+
+        Args:
+            session: Sesión de base de datos
+        """
+        self.session = session
+
+    def _rangos_tarifas(self) -> List[Rango]:
+        """Lee los rangos de todas las tarifas de la base de datos"""
+        stmt = select(Tarifa.servicio_id, Tarifa.provincia_clave, Tarifa.rango_min, Tarifa.rango_max, Tarifa.id)
+        return [
+            (servicio_id, provincia, rango_min,
+             INFINITO if rango_max is None else rango_max,
+             tarifa_id, f"tarifa {tarifa_id}")
+            for servicio_id, provincia, rango_min, rango_max, tarifa_id in self.session.execute(stmt)
+        ]
+
+    def _servicios_activos(self) -> List[int]:
+        return list(self.session.execute(
+            select(ServicioTransportista.id).where(ServicioTransportista.activo == True)
+        ).scalars())
+
+    def validar(self) -> ResultadoValidacion:
+        """
+        Valida todas las tarifas de la base de datos
+
+        Returns:
+            ResultadoValidacion con las incidencias encontradas
+        """
+        return self.validar_rangos(self._rangos_tarifas(), self._servicios_activos())
+
+    def validar_lote(self, lote: str) -> ResultadoValidacion:
+        """
+        Valida cómo quedarían las tarifas tras aplicar un lote de importación
+
+        El lote debe estar analizado (ver ImportadorTarifas.analizar): se
+        quitan las tarifas que se dan de baja, las actualizadas toman el
+        servicio, la provincia y el rango de su fila y se añaden las nuevas.
+
+        Args:
+            lote: Identificador del lote en tarifas_staging
+
+        Returns:
+            ResultadoValidacion con las incidencias encontradas
+        """
+        eliminadas = set(self.session.execute(
+            select(TarifaStaging.tarifa_existente_id).where(
+                TarifaStaging.lote == lote, TarifaStaging.accion == 'eliminar'
+            )
+        ).scalars())
+        actualizadas = {
+            tarifa_id: (servicio_id, provincia, rango_min, rango_max, fila)
+            for tarifa_id, servicio_id, provincia, rango_min, rango_max, fila in self.session.execute(
+                select(
+                    TarifaStaging.tarifa_existente_id, TarifaStaging.servicio_id, TarifaStaging.provincia_clave,
+                    TarifaStaging.rango_min, TarifaStaging.rango_max, TarifaStaging.fila
+                ).where(
+                    TarifaStaging.lote == lote, TarifaStaging.accion == 'actualizar'
+                ).order_by(TarifaStaging.fila.desc())  # Se aplica la primera fila de cada tarifa
+            )
+        }
+        rangos = []
+        for rango in self._rangos_tarifas():
+            if rango[4] in eliminadas:
+                continue
+            if rango[4] in actualizadas:
+                servicio_id, provincia, rango_min, rango_max, fila = actualizadas[rango[4]]
+                rango = (servicio_id, provincia, rango_min,
+                         INFINITO if rango_max is None else rango_max,
+                         rango[4], f"{rango[5]} (fila {fila})")
+            rangos.append(rango)
+        # Las tarifas nuevas tendrán IDs posteriores a los actuales
+        siguiente_id = (self.session.execute(select(func.max(Tarifa.id))).scalar() or 0) + 1
+        stmt = select(
+            TarifaStaging.servicio_id, TarifaStaging.provincia_clave,
+            TarifaStaging.rango_min, TarifaStaging.rango_max, TarifaStaging.fila
+        ).where(
+            TarifaStaging.lote == lote, TarifaStaging.accion == 'nueva'
+        ).order_by(TarifaStaging.fila)
+        for posicion, (servicio_id, provincia, rango_min, rango_max, fila) in enumerate(self.session.execute(stmt)):
+            rangos.append((
+                servicio_id, provincia, rango_min,
+                INFINITO if rango_max is None else rango_max,
+                siguiente_id + posicion, f"fila {fila}"
+            ))
+        return self.validar_rangos(rangos, self._servicios_activos())
+
+    def validar_rangos(
+        self,
+        rangos: List[Rango],
+        servicios_activos: Optional[Iterable[int]] = None
+    ) -> ResultadoValidacion:
+        """
+        Valida un conjunto de rangos con un barrido por (servicio, provincia)
+
+        Args:
+            rangos: Rangos a validar (ver Rango)
+            servicios_activos: Servicios que deben tener tarifa NACIONAL
+
+        Returns:
+            ResultadoValidacion con las incidencias encontradas
+        """
+        resultado = ResultadoValidacion(tarifas_revisadas=len(rangos))
+        incidencias = resultado.incidencias
+
+        # Ordenar una sola vez y agrupar por (servicio, provincia)
+        rangos.sort(key=lambda r: (r[0], r[1], r[2], r[3], r[4]))
+        grupos: Dict[Tuple[int, str], List[Rango]] = {}
+        for rango in rangos:
+            grupos.setdefault((rango[0], rango[1]), []).append(rango)
+
+        # Cobertura NACIONAL de cada servicio (para huecos y tramos ocultos)
+        nacional = {
+            servicio_id: _fusionar((r[2], r[3]) for r in grupo if r[3] >= r[2])
+            for (servicio_id, provincia), grupo in grupos.items()
+            if provincia == CLAVE_NACIONAL
+        }
+
+        for (servicio_id, provincia), grupo in grupos.items():
+            es_nacional = provincia == CLAVE_NACIONAL
+            respaldo = nacional.get(servicio_id, ([], []))
+
+            def agregar(tipo: TipoIncidencia, mensaje: str):
+                incidencias.append(Incidencia(tipo, servicio_id, nombre_provincia(provincia), mensaje))
+
+            def hueco(inicio: Decimal, fin: Decimal):
+                if es_nacional or not _cubierto(respaldo, inicio, fin):
+                    agregar(TipoIncidencia.HUECO, f"sin tarifa entre {_formato(inicio)} y {_formato(fin)}")
+
+            validos = []
+            for rango in grupo:
+                if rango[3] < rango[2]:
+                    agregar(TipoIncidencia.RANGO_INVALIDO,
+                            f"{rango[5]}: rango {_formato(rango[2])}-{_formato(rango[3])} con máximo menor que mínimo")
+                else:
+                    validos.append(rango)
+            if not validos:
+                continue
+
+            # Barrido por rango_min: solapamientos y huecos
+            if validos[0][2] > 0:
+                hueco(Decimal(0), validos[0][2])
+            alcance = validos[0]
+            for rango in validos[1:]:
+                if rango[2] < alcance[3]:
+                    agregar(TipoIncidencia.SOLAPAMIENTO,
+                            f"{alcance[5]} ({_formato(alcance[2])}-{_formato(alcance[3])}) y "
+                            f"{rango[5]} ({_formato(rango[2])}-{_formato(rango[3])})")
+                elif rango[2] > alcance[3]:
+                    hueco(alcance[3], rango[2])
+                if rango[3] > alcance[3]:
+                    alcance = rango
+            if alcance[3] != INFINITO:
+                hueco(alcance[3], INFINITO)
+
+            # Barrido por precedencia: rangos cubiertos por tarifas anteriores
+            union = _UnionIntervalos()
+            for rango in sorted(validos, key=lambda r: r[4]):
+                if union.contiene(rango[2], rango[3]):
+                    agregar(TipoIncidencia.INALCANZABLE,
+                            f"{rango[5]} ({_formato(rango[2])}-{_formato(rango[3])}) nunca se aplica")
+                union.agregar(rango[2], rango[3])
+
+            # Tramos NACIONAL que la provincia sustituye por completo
+            if not es_nacional and servicio_id in nacional:
+                propia = _fusionar((r[2], r[3]) for r in validos)
+                ocultos = sum(
+                    1 for r in grupos[(servicio_id, CLAVE_NACIONAL)]
+                    if r[3] >= r[2] and _cubierto(propia, r[2], r[3])
+                )
+                if ocultos:
+                    agregar(TipoIncidencia.OCULTA_POR_PROVINCIA,
+                            f"{ocultos} tramos NACIONAL sustituidos por la tarifa de la provincia")
+
+        if servicios_activos is not None:
+            for servicio_id in sorted(set(servicios_activos) - set(nacional)):
+                incidencias.append(Incidencia(
+                    TipoIncidencia.SIN_NACIONAL, servicio_id, None,
+                    "sin tarifa NACIONAL: los pedidos de provincias sin tarifa propia no se cotizan"
+                ))
+
+        return resultado
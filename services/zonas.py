@@ -0,0 +1,252 @@
+"""
+Zonas de tarifas
+
+Una zona agrupa provincias que un servicio tarifica igual: sus tarifas se
+guardan una sola vez con el nombre de la zona en Tarifa.provincia y la
+asignación provincia -> zona está en la tabla zonas_provincias.
+
+- MapaZonas: diccionario precalculado (servicio, provincia) -> zona que usan
+  el selector y el análisis de impacto
+- AgrupadorZonas: detecta provincias con tablas de tarifas idénticas y las
+  agrupa en zonas (o elimina las que repiten la tarifa NACIONAL)
+"""
+
+from typing import List, Optional, Dict, Tuple
+from dataclasses import dataclass, field
+
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.orm import Session
+
+from models.models import Tarifa, ZonaProvincia
+from models.provincias import clave_provincia, provincia_codigo_postal, CLAVE_NACIONAL
+from database.versiones import incrementar_version
+
+
+class MapaZonas:
+    """
+    Asignación provincia -> zona de todos los servicios, en memoria
+
+    Las provincias y zonas se buscan por su clave normalizada, por lo que
+    acepta cualquier variante del nombre.
+    """
+
+    def __init__(self):
+        # (servicio_id, clave de provincia) -> zona
+        self._zonas: Dict[Tuple[int, str], str] = {}
+        # (servicio_id, clave de zona) -> provincias
+        self._provincias: Dict[Tuple[int, str], List[str]] = {}
+
+    @classmethod
+    def desde_base_datos(cls, session: Session) -> 'MapaZonas':
+        """
+        Carga todas las asignaciones de la tabla zonas_provincias
+
+        Args:
+            session: Sesión de base de datos
+
+        Returns:
+            Mapa con las zonas de todos los servicios
+        """
+        mapa = cls()
+        stmt = select(ZonaProvincia.servicio_id, ZonaProvincia.provincia, ZonaProvincia.zona)
+        for servicio_id, provincia, zona in session.execute(stmt):
+            mapa.agregar(servicio_id, provincia, zona)
+        return mapa
+
+    def agregar(self, servicio_id: int, provincia: str, zona: str):
+        """Asigna una provincia a una zona del servicio"""
+        self._zonas[(servicio_id, clave_provincia(provincia))] = zona
+        self._provincias.setdefault((servicio_id, clave_provincia(zona)), []).append(provincia)
+
+    def zona(self, servicio_id: int, provincia: str) -> Optional[str]:
+        """
+        Obtiene la zona de una provincia para un servicio
+
+        Returns:
+            Nombre de la zona o None si la provincia no pertenece a ninguna
+        """
+        return self._zonas.get((servicio_id, clave_provincia(provincia)))
+
+    def zona_codigo_postal(self, servicio_id: int, codigo_postal) -> Optional[str]:
+        """
+        Obtiene la zona (o, si no tiene, la provincia) de un código postal
+
+        Args:
+            servicio_id: ID del servicio
+            codigo_postal: Código postal como texto o entero
+
+        Returns:
+            Nombre de la zona o de la provincia; None si el código no es válido
+        """
+        provincia = provincia_codigo_postal(codigo_postal)
+        if provincia is None:
+            return None
+        return self.zona(servicio_id, provincia) or provincia
+
+    def es_zona(self, servicio_id: int, nombre: str) -> bool:
+        """Indica si un nombre (columna Tarifa.provincia) es una zona del servicio"""
+        return (servicio_id, clave_provincia(nombre)) in self._provincias
+
+    def provincias(self, servicio_id: int, zona: str) -> List[str]:
+        """Obtiene las provincias de una zona del servicio"""
+        return self._provincias.get((servicio_id, clave_provincia(zona)), [])
+
+    def __len__(self) -> int:
+        return len(self._zonas)
+
+
+@dataclass
+class PropuestaZona:
+    """Provincias de un servicio con la misma tabla de tarifas"""
+    servicio_id: int
+    provincias: List[str]
+    num_tarifas: int  # Tarifas de cada provincia
+    igual_nacional: bool = False  # La tabla coincide con la NACIONAL
+
+    @property
+    def tarifas_eliminadas(self) -> int:
+        """Tarifas que desaparecen al aplicar la propuesta"""
+        if self.igual_nacional:
+            return self.num_tarifas * len(self.provincias)
+        return self.num_tarifas * (len(self.provincias) - 1)
+
+
+@dataclass
+class ResultadoAgrupacion:
+    """Resultado de aplicar propuestas de zonas"""
+    zonas_creadas: List[Tuple[int, str]] = field(default_factory=list)
+    provincias_agrupadas: int = 0
+    tarifas_eliminadas: int = 0
+
+
+class AgrupadorZonas:
+    """Detecta y agrupa provincias con tarifas idénticas"""
+
+    def __init__(self, session: Session):
+        """
+        Inicializa el agrupador
+
+        Args:
+            session: Sesión de base de datos
+        """
+        self.session = session
+
+    def detectar(self, min_provincias: int = 2) -> List[PropuestaZona]:
+        """
+        Busca provincias cuya tabla de tarifas (rangos y precios) es idéntica
+
+        No se consideran las provincias que ya pertenecen a una zona ni las
+        propias zonas.
+
+        Args:
+            min_provincias: Número mínimo de provincias para proponer una zona
+
+        Returns:
+            Propuestas ordenadas por tarifas eliminadas (mayor primero)
+        """
+        mapa = MapaZonas.desde_base_datos(self.session)
+        stmt = select(
+            Tarifa.servicio_id, Tarifa.provincia_clave, Tarifa.provincia,
+            Tarifa.rango_min, Tarifa.rango_max, Tarifa.precio_fijo
+        ).order_by(
+            Tarifa.servicio_id, Tarifa.provincia_clave, Tarifa.rango_min, Tarifa.rango_max, Tarifa.id
+        )
+
+        # (servicio_id, clave de provincia) -> tabla de tarifas
+        tablas: Dict[Tuple[int, str], List[tuple]] = {}
+        nombres: Dict[str, str] = {}
+        for servicio_id, clave, provincia, rango_min, rango_max, precio in self.session.execute(stmt):
+            tablas.setdefault((servicio_id, clave), []).append((rango_min, rango_max, precio))
+            nombres.setdefault(clave, provincia)
+
+        # servicio_id -> tabla -> provincias
+        grupos: Dict[int, Dict[tuple, List[str]]] = {}
+        for (servicio_id, clave), tabla in tablas.items():
+            if clave == CLAVE_NACIONAL or mapa.es_zona(servicio_id, clave):
+                continue
+            if mapa.zona(servicio_id, clave) is not None:
+                continue
+            grupos.setdefault(servicio_id, {}).setdefault(tuple(tabla), []).append(nombres[clave])
+
+        propuestas = []
+        for servicio_id, por_tabla in grupos.items():
+            nacional = tuple(tablas.get((servicio_id, CLAVE_NACIONAL), ()))
+            for tabla, provincias in por_tabla.items():
+                if tabla == nacional:
+                    propuestas.append(PropuestaZona(servicio_id, provincias, len(tabla), igual_nacional=True))
+                elif len(provincias) >= min_provincias:
+                    propuestas.append(PropuestaZona(servicio_id, provincias, len(tabla)))
+        propuestas.sort(key=lambda p: (-p.tarifas_eliminadas, p.servicio_id))
+        return propuestas
+
+    def _nombre_zona(self, usados: set) -> str:
+        """Genera un nombre de zona libre para el servicio"""
+        numero = 1
+        while f"Zona {numero}" in usados:
+            numero += 1
+        nombre = f"Zona {numero}"
+        usados.add(nombre)
+        return nombre
+
+    def aplicar(self, propuestas: List[PropuestaZona]) -> ResultadoAgrupacion:
+        """
+        Crea las zonas propuestas y sustituye las tarifas de sus provincias
+
+        Las tarifas de la primera provincia se copian con el nombre de la zona
+        (mismo orden de ID) y se eliminan las de todas las provincias
+        agrupadas. El llamador debe hacer commit al terminar.
+
+        Args:
+            propuestas: Propuestas obtenidas con detectar()
+
+        Returns:
+            ResultadoAgrupacion con las zonas creadas
+        """
+        resultado = ResultadoAgrupacion()
+        tarifas = Tarifa.__table__
+        usados: Dict[int, set] = {}
+        for servicio_id, zona in self.session.execute(
+            select(ZonaProvincia.servicio_id, ZonaProvincia.zona).distinct()
+        ):
+            usados.setdefault(servicio_id, set()).add(zona)
+
+        for propuesta in propuestas:
+            if not propuesta.igual_nacional:
+                zona = self._nombre_zona(usados.setdefault(propuesta.servicio_id, set()))
+                self.session.execute(insert(ZonaProvincia), [
+                    {
+                        'servicio_id': propuesta.servicio_id,
+                        'provincia': provincia,
+                        'zona': zona,
+                        'provincia_clave': clave_provincia(provincia),
+                        'zona_clave': clave_provincia(zona)
+                    }
+                    for provincia in propuesta.provincias
+                ])
+                columnas = ['rango_min', 'rango_max', 'precio_fijo', 'rango_min_ent', 'rango_max_ent', 'precio_cent']
+                self.session.execute(
+                    insert(tarifas).from_select(
+                        ['servicio_id', 'provincia', 'provincia_clave', *columnas],
+                        select(
+                            tarifas.c.servicio_id, literal(zona), literal(clave_provincia(zona)),
+                            *(tarifas.c[c] for c in columnas)
+                        ).where(
+                            tarifas.c.servicio_id == propuesta.servicio_id,
+                            tarifas.c.provincia_clave == clave_provincia(propuesta.provincias[0])
+                        ).order_by(tarifas.c.id)
+                    )
+                )
+                resultado.zonas_creadas.append((propuesta.servicio_id, zona))
+
+            self.session.execute(
+                delete(tarifas).where(
+                    tarifas.c.servicio_id == propuesta.servicio_id,
+                    tarifas.c.provincia_clave.in_([clave_provincia(p) for p in propuesta.provincias])
+                )
+            )
+            resultado.provincias_agrupadas += len(propuesta.provincias)
+            resultado.tarifas_eliminadas += propuesta.tarifas_eliminadas
+
+        if propuestas:
+            incrementar_version(self.session)
+        return resultado
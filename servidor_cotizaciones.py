@@ -0,0 +1,50 @@
+"""
+Servidor HTTP de cotizaciones
+
+Mantiene en memoria las tarifas compiladas (con recarga en caliente) y el
+catálogo de productos, y atiende peticiones JSON de cotización (ver
+services/servidor_cotizaciones.py).
+
+Uso:
+    python servidor_cotizaciones.py [puerto] [host]   (por defecto, 8080 en 127.0.0.1)
+"""
+
+import sys
+from pathlib import Path
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import get_db_manager
+from services.servidor_cotizaciones import ServicioCotizaciones, crear_servidor
+
+
+def main():
+    """Arranca el servidor de cotizaciones hasta que se interrumpe con Ctrl+C"""
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    host = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1"
+    db_manager = get_db_manager()
+    
+    if not Path(db_manager.db_path).exists():
+        print("\n⚠️  La base de datos no existe.")
+        print("Por favor, ejecuta primero: python init_db.py\n")
+        sys.exit(1)
+    
+    servicio = ServicioCotizaciones(db_manager)
+    servicio.iniciar()
+    servidor = crear_servidor(servicio, host, puerto)
+    
+    print(f"✓ Tarifas compiladas (versión {servicio.recargador.version})")
+    print(f"✓ {len(servicio.productos)} productos en caché")
+    print(f"🚚 Servidor de cotizaciones en http://{host}:{servidor.server_port} (Ctrl+C para detener)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Deteniendo el servidor...")
+    finally:
+        servidor.server_close()
+        servicio.detener()
+
+
+if __name__ == "__main__":
+    main()
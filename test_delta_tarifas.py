@@ -0,0 +1,110 @@
+"""Script de prueba para importar un archivo de cambios de tarifas en otra base de datos"""
+import sys
+import io
+import tempfile
+import contextlib
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import DatabaseManager, ultima_secuencia
+from data import cargar_datos_ejemplo
+from models.models import Tarifa
+from services.delta_tarifas import cambios_tarifas
+from services.importacion_tarifas import ImportadorTarifas, OPERACION_MODIFICACION
+
+
+def crear_base(ruta: Path) -> DatabaseManager:
+    """Crea una base de datos con los datos de ejemplo"""
+    db_manager = DatabaseManager(str(ruta))
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_manager.create_tables()
+        with db_manager.get_session() as session:
+            cargar_datos_ejemplo(session)
+    return db_manager
+
+
+def datos_tarifa(tarifa: Tarifa) -> tuple:
+    return (tarifa.servicio_id, tarifa.provincia, tarifa.rango_min, tarifa.rango_max, tarifa.precio_fijo)
+
+
+def comprobar(condicion: bool, mensaje: str) -> bool:
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PRUEBA DE CAMBIOS DE TARIFAS ENTRE BASES DE DATOS")
+    print("=" * 60)
+
+    correcto = True
+    with tempfile.TemporaryDirectory() as directorio:
+        origen = crear_base(Path(directorio) / "origen.db")
+        destino = crear_base(Path(directorio) / "destino.db")
+
+        # En el destino se crea antes otra tarifa, de modo que los IDs de las
+        # nuevas tarifas del origen corresponden a tarifas distintas
+        with destino.get_session() as session:
+            ultima = session.query(Tarifa).order_by(Tarifa.id.desc()).first()
+            local = Tarifa(
+                servicio_id=ultima.servicio_id, provincia="NACIONAL",
+                rango_min=Decimal("5000"), rango_max=Decimal("6000"), precio_fijo=Decimal("1")
+            )
+            session.add(local)
+            session.commit()
+            local_id, datos_local = local.id, datos_tarifa(local)
+
+        with origen.get_session() as session:
+            secuencia = ultima_secuencia(session)
+            otra = session.query(Tarifa).filter(Tarifa.servicio_id != datos_local[0]).first()
+            alta = Tarifa(
+                servicio_id=otra.servicio_id, provincia="Barcelona",
+                rango_min=Decimal("9000"), rango_max=None, precio_fijo=Decimal("55")
+            )
+            modificada = session.get(Tarifa, 1)
+            modificada.precio_fijo += Decimal("1.25")
+            session.add(alta)
+            session.commit()
+            correcto &= comprobar(alta.id == local_id, f"El alta del origen tiene el ID {alta.id} de una tarifa local")
+            filas = cambios_tarifas(session, secuencia).filas
+            esperado = {datos_tarifa(alta), datos_tarifa(modificada)}
+
+        print(f"\nImportando {len(filas)} cambios en la segunda base de datos...")
+        with destino.get_session() as session:
+            importador = ImportadorTarifas(session)
+            lote = importador.cargar(enumerate(filas, 2))
+            resumen = importador.analizar(lote)
+            correcto &= comprobar(
+                (resumen.nuevas, resumen.actualizadas, resumen.errores) == (1, 1, []),
+                f"Análisis: {resumen.nuevas} nuevas, {resumen.actualizadas} actualizadas, "
+                f"{len(resumen.errores)} errores"
+            )
+            importador.aplicar(lote)
+            session.commit()
+
+            correcto &= comprobar(
+                datos_tarifa(session.get(Tarifa, local_id)) == datos_local,
+                f"La tarifa local {local_id} no se modifica"
+            )
+            correcto &= comprobar(
+                esperado <= {datos_tarifa(t) for t in session.query(Tarifa)},
+                "Las tarifas del destino incluyen los cambios del origen"
+            )
+
+        # Una modificación con el ID de una tarifa local de otro servicio se rechaza
+        fila = next(f for f in filas if f[0] == local_id)[:-1] + (OPERACION_MODIFICACION,)
+        with destino.get_session() as session:
+            importador = ImportadorTarifas(session)
+            resumen = importador.analizar(importador.cargar([(2, fila)]))
+            correcto &= comprobar(
+                resumen.actualizadas == 0 and len(resumen.errores) == 1,
+                "La modificación con el ID de otra tarifa se rechaza"
+            )
+
+    print("=" * 60)
+    if not correcto:
+        print("❌ La prueba ha fallado")
+        sys.exit(1)
+    print("✅ Prueba completada")
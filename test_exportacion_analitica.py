@@ -0,0 +1,66 @@
+"""Script de prueba para la exportación analítica en Parquet"""
+import sys
+import io
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import DatabaseManager
+from data import cargar_datos_ejemplo
+from models.models import Pedido
+from services.selector import TransportistaSelector
+from services.exportacion_analitica import exportar_dataset, PARQUET_DISPONIBLE
+
+
+def comprobar(condicion: bool, mensaje: str) -> bool:
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+if __name__ == "__main__":
+    if not PARQUET_DISPONIBLE:
+        print("\n❌ ERROR: La librería pyarrow no está instalada.")
+        print("Instala con: pip install pyarrow")
+        sys.exit(1)
+
+    import pyarrow.dataset as ds
+
+    print("=" * 60)
+    print("PRUEBA DE EXPORTACIÓN ANALÍTICA")
+    print("=" * 60)
+
+    correcto = True
+    with tempfile.TemporaryDirectory() as directorio:
+        db_manager = DatabaseManager(str(Path(directorio) / "pedidos.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager.create_tables()
+            with db_manager.get_session() as session:
+                cargar_datos_ejemplo(session)
+
+        destino = str(Path(directorio) / "analitica")
+        with db_manager.get_session() as session:
+            filas = exportar_dataset(session, destino, limite=1)
+            selector = TransportistaSelector(session)
+            mejores = {}
+            for (pedido_id,) in session.query(Pedido.id):
+                mejor = selector.seleccionar_mejor_transportista(pedido_id)
+                mejores[pedido_id] = mejor.precio_total if mejor else None
+
+        tabla = ds.dataset(destino, format='parquet', partitioning='hive').to_table().to_pylist()
+        correcto &= comprobar(len(tabla) == filas, f"{filas} filas escritas y {len(tabla)} leídas")
+        correcto &= comprobar(
+            {fila['pedido_id'] for fila in tabla} == set(mejores),
+            f"El dataset contiene los {len(mejores)} pedidos"
+        )
+        correcto &= comprobar(
+            all(fila['precio_total'] == mejores[fila['pedido_id']] for fila in tabla),
+            "La cotización exportada de cada pedido es la más económica"
+        )
+
+    print("=" * 60)
+    if not correcto:
+        print("❌ La prueba ha fallado")
+        sys.exit(1)
+    print("✅ Prueba completada")
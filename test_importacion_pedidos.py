@@ -0,0 +1,117 @@
+"""Script de prueba para la importación masiva de pedidos (CSV y JSONL)"""
+import sys
+import io
+import json
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import DatabaseManager
+from data import cargar_datos_ejemplo
+from models.models import Pedido, Producto
+from services.importacion_pedidos import ImportadorPedidos, leer_pedidos, COLUMNAS_PEDIDOS
+
+
+def comprobar(condicion: bool, mensaje: str) -> bool:
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+def lineas_pedido(session, numero: str) -> list:
+    pedido = session.query(Pedido).filter(Pedido.numero_pedido == numero).one_or_none()
+    if pedido is None:
+        return []
+    return sorted((linea.producto.codigo, linea.cantidad) for linea in pedido.productos)
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PRUEBA DE IMPORTACIÓN DE PEDIDOS")
+    print("=" * 60)
+
+    correcto = True
+    with tempfile.TemporaryDirectory() as directorio:
+        directorio = Path(directorio)
+        db_manager = DatabaseManager(str(directorio / "pedidos.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager.create_tables()
+            with db_manager.get_session() as session:
+                cargar_datos_ejemplo(session)
+
+        with db_manager.get_session() as session:
+            codigo, otro = [p.codigo for p in session.query(Producto).order_by(Producto.id).limit(2)]
+
+            # 1. CSV: las filas sin número continúan el pedido anterior
+            print("\n1. CSV con varias líneas por pedido...")
+            ruta = directorio / "pedidos.csv"
+            ruta.write_text("\n".join([
+                ",".join(COLUMNAS_PEDIDOS),
+                f"C-1,Madrid,,pie_calle,{codigo},2",
+                f",,,,{otro},1",
+                f"C-2,,08001,pie_calle,{codigo},3.0",
+            ]) + "\n", encoding="utf-8")
+            resumen = ImportadorPedidos(session).importar(leer_pedidos(str(ruta)))
+            correcto &= comprobar(
+                (resumen.pedidos, resumen.lineas, resumen.rechazados) == (2, 3, 0),
+                f"{resumen.pedidos} pedidos y {resumen.lineas} líneas importados"
+            )
+            correcto &= comprobar(
+                lineas_pedido(session, "C-1") == sorted([(codigo, 2), (otro, 1)]),
+                "Las filas sin número forman parte del pedido C-1"
+            )
+
+            # 2. JSONL: cada línea es un pedido independiente
+            print("\n2. JSONL con números vacíos y repetidos...")
+
+            def pedido_json(numero, cantidad=1):
+                return json.dumps({
+                    "numero_pedido": numero, "provincia": "Madrid", "tipo_entrega": "pie_calle",
+                    "lineas": [{"producto": codigo, "cantidad": cantidad}]
+                })
+
+            ruta = directorio / "pedidos.jsonl"
+            ruta.write_text("\n".join([
+                pedido_json("J-1", 2),
+                pedido_json(None),
+                pedido_json("J-1", 5),
+                pedido_json(""),
+                pedido_json("J-2"),
+            ]) + "\n", encoding="utf-8")
+            resumen = ImportadorPedidos(session).importar(leer_pedidos(str(ruta)))
+            correcto &= comprobar(
+                (resumen.pedidos, resumen.rechazados) == (2, 3),
+                f"{resumen.pedidos} pedidos importados y {resumen.rechazados} rechazados"
+            )
+            correcto &= comprobar(
+                lineas_pedido(session, "J-1") == [(codigo, 2)],
+                "Las líneas sin número o repetidas no se añaden al pedido anterior"
+            )
+            correcto &= comprobar(
+                sum("Falta el número de pedido" in error for error in resumen.errores) == 2 and
+                sum("Pedido repetido" in error for error in resumen.errores) == 1,
+                "Se rechazan los pedidos sin número y el repetido"
+            )
+
+            # 3. Cantidades no válidas: se rechaza el pedido sin detener la importación
+            print("\n3. Cantidades no válidas...")
+            cantidades = ["inf", "1e400", "NaN", "1.5", "0", "-2", "x", "10000000000", float("inf"), 2.5]
+            ruta = directorio / "cantidades.jsonl"
+            ruta.write_text("\n".join(
+                [pedido_json(f"Q-{i}", cantidad) for i, cantidad in enumerate(cantidades)] +
+                [pedido_json("Q-OK", "4")]
+            ) + "\n", encoding="utf-8")
+            resumen = ImportadorPedidos(session).importar(leer_pedidos(str(ruta)))
+            correcto &= comprobar(
+                (resumen.pedidos, resumen.rechazados) == (1, len(cantidades)) and
+                all("Cantidad" in error for error in resumen.errores),
+                f"{resumen.rechazados} cantidades rechazadas: {', '.join(map(str, cantidades))}"
+            )
+            correcto &= comprobar(lineas_pedido(session, "Q-OK") == [(codigo, 4)], "El pedido válido se importa")
+
+    print("=" * 60)
+    if not correcto:
+        print("❌ La prueba ha fallado")
+        sys.exit(1)
+    print("✅ Prueba completada")
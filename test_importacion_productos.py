@@ -0,0 +1,89 @@
+"""Script de prueba para la importación del catálogo de productos"""
+import sys
+import io
+import tempfile
+import contextlib
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import DatabaseManager
+from data import cargar_datos_ejemplo
+from models.models import Producto, Pedido
+from services.importacion_productos import ImportadorProductos, leer_productos, COLUMNAS_PRODUCTOS
+
+
+def comprobar(condicion: bool, mensaje: str) -> bool:
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PRUEBA DE IMPORTACIÓN DEL CATÁLOGO DE PRODUCTOS")
+    print("=" * 60)
+
+    correcto = True
+    with tempfile.TemporaryDirectory() as directorio:
+        directorio = Path(directorio)
+        db_manager = DatabaseManager(str(directorio / "productos.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            db_manager.create_tables()
+            with db_manager.get_session() as session:
+                cargar_datos_ejemplo(session)
+
+        with db_manager.get_session() as session:
+            producto = session.query(Producto).filter(Producto.pedidos.any()).first()
+            codigo, nombre = producto.codigo, producto.nombre
+            peso_total = {p.id: p.peso_total for p in session.query(Pedido)}
+
+            # Celdas numéricas no válidas: se rechaza la fila sin detener la importación
+            invalidos = [
+                ("nan", "0.1"), ("inf", "0.1"), ("1e400", "0.1"), ("-inf", "0.1"),
+                ("1", "NaN"), ("1", "1e400"), ("100000000", "0.1"), ("1", "1000000"), ("x", "0.1"),
+            ]
+            filas = [",".join(COLUMNAS_PRODUCTOS)]
+            filas += [f"MAL{i},Producto {i},{peso},{volumen}" for i, (peso, volumen) in enumerate(invalidos)]
+            filas.append(f"{codigo},{nombre},{producto.peso_kg + Decimal('1')},{producto.volumen_m3}")
+            filas.append("NUEVO1,Producto nuevo,2.5,0.125")
+            ruta = directorio / "catalogo.csv"
+            ruta.write_text("\n".join(filas) + "\n", encoding="utf-8")
+
+            print("\nImportando el catálogo con celdas numéricas no válidas...")
+            resumen = ImportadorProductos(session).importar(leer_productos(str(ruta)))
+            session.commit()
+            correcto &= comprobar(
+                len(resumen.errores) == len(invalidos) and
+                all("Valores numéricos inválidos" in error for error in resumen.errores),
+                f"{len(resumen.errores)} filas rechazadas como valores numéricos inválidos"
+            )
+            correcto &= comprobar(
+                (resumen.nuevos, resumen.actualizados) == (1, 1),
+                f"{resumen.nuevos} producto nuevo y {resumen.actualizados} actualizado"
+            )
+            correcto &= comprobar(
+                session.query(Producto).filter(Producto.codigo.like("MAL%")).count() == 0,
+                "Los productos con valores no válidos no se guardan"
+            )
+            afectados = {
+                p.id: p.peso_total
+                for p in session.query(Pedido).filter(Pedido.id.in_(resumen.pedidos_afectados))
+            }
+            correcto &= comprobar(
+                bool(afectados) and all(afectados[i] > peso_total[i] for i in afectados),
+                f"Se recalculan los totales de {len(afectados)} pedidos afectados"
+            )
+
+            # Volver a importar el mismo archivo no cambia nada
+            resumen = ImportadorProductos(session).importar(leer_productos(str(ruta)))
+            correcto &= comprobar(
+                (resumen.nuevos, resumen.actualizados, resumen.sin_cambios) == (0, 0, 2),
+                "Reimportar el catálogo no produce cambios"
+            )
+
+    print("=" * 60)
+    if not correcto:
+        print("❌ La prueba ha fallado")
+        sys.exit(1)
+    print("✅ Prueba completada")
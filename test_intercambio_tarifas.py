@@ -0,0 +1,114 @@
+"""Script de prueba para exportar e importar tarifas en CSV y Parquet"""
+import sys
+import io
+import tempfile
+import contextlib
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import DatabaseManager, ultima_secuencia
+from data import cargar_datos_ejemplo
+from models.models import Tarifa
+from services.delta_tarifas import cambios_tarifas
+from services.importacion_tarifas import ImportadorTarifas, COLUMNAS_TARIFAS, COLUMNAS_DELTA
+from services.intercambio_tarifas import (
+    filas_tarifas, exportar_csv, leer_csv, exportar_parquet, leer_parquet, PARQUET_DISPONIBLE
+)
+
+
+def crear_base(ruta: Path) -> DatabaseManager:
+    """Crea una base de datos con los datos de ejemplo"""
+    db_manager = DatabaseManager(str(ruta))
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_manager.create_tables()
+        with db_manager.get_session() as session:
+            cargar_datos_ejemplo(session)
+    return db_manager
+
+
+def estado_tarifas(session) -> list:
+    return sorted(
+        (t.servicio_id, t.provincia, t.rango_min, t.rango_max, t.precio_fijo,
+         t.rango_min_ent, t.rango_max_ent, t.precio_cent)
+        for t in session.query(Tarifa)
+    )
+
+
+def comprobar(condicion: bool, mensaje: str) -> bool:
+    print(f"{'✅' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("PRUEBA DE INTERCAMBIO DE TARIFAS EN CSV Y PARQUET")
+    print("=" * 60)
+
+    formatos = [("csv", exportar_csv, leer_csv)]
+    if PARQUET_DISPONIBLE:
+        formatos.append(("parquet", exportar_parquet, leer_parquet))
+    else:
+        print("⚠️  pyarrow no está instalado: se omite el formato Parquet")
+
+    correcto = True
+    with tempfile.TemporaryDirectory() as directorio:
+        directorio = Path(directorio)
+        origen = crear_base(directorio / "origen.db")
+
+        # 1. Exportar e importar en la misma base de datos no cambia nada
+        print("\n1. Importando la exportación completa en la misma base de datos...")
+        with origen.get_session() as session:
+            total = session.query(Tarifa).count()
+            for extension, exportar, leer in formatos:
+                ruta = str(directorio / f"tarifas.{extension}")
+                escritas = exportar(ruta, filas_tarifas(session))
+                importador = ImportadorTarifas(session)
+                lote = importador.cargar(leer(ruta))
+                resumen = importador.analizar(lote)
+                importador.descartar(lote)
+                correcto &= comprobar(
+                    escritas == total and resumen.sin_cambios == total and not resumen.errores,
+                    f"{extension}: {escritas} tarifas exportadas, {resumen.sin_cambios} sin cambios"
+                )
+
+        # 2. Los cambios del origen se trasladan a otra base de datos
+        with origen.get_session() as session:
+            secuencia = ultima_secuencia(session)
+            tarifas = session.query(Tarifa).order_by(Tarifa.id).all()
+            tarifas[0].precio_fijo = Decimal("12.34")
+            tarifas[1].rango_min += Decimal("0.5")
+            eliminada_id = tarifas[2].id
+            session.delete(tarifas[2])
+            session.commit()
+            esperado = estado_tarifas(session)
+            completo = list(filas_tarifas(session))
+            cambios = cambios_tarifas(session, secuencia).filas
+
+        print("\n2. Importando los cambios en otra base de datos...")
+        for extension, exportar, leer in formatos:
+            for nombre, filas, columnas in (
+                ("completo", completo, COLUMNAS_TARIFAS), ("cambios", cambios, COLUMNAS_DELTA)
+            ):
+                ruta = str(directorio / f"{nombre}.{extension}")
+                exportar(ruta, filas, columnas)
+                destino = crear_base(directorio / f"destino_{nombre}_{extension}.db")
+                with destino.get_session() as session:
+                    importador = ImportadorTarifas(session)
+                    resumen, _ = importador.aplicar(importador.cargar(leer(ruta)))
+                    if nombre == "completo":
+                        # La importación completa no elimina: se borra la tarifa que falta
+                        session.query(Tarifa).filter(Tarifa.id == eliminada_id).delete()
+                    session.commit()
+                    correcto &= comprobar(
+                        estado_tarifas(session) == esperado and not resumen.errores,
+                        f"{extension} ({nombre}): {resumen.actualizadas} actualizadas, "
+                        f"{resumen.eliminadas} eliminadas"
+                    )
+
+    print("=" * 60)
+    if not correcto:
+        print("❌ La prueba ha fallado")
+        sys.exit(1)
+    print("✅ Prueba completada")